@@ -1,5 +1,4 @@
 import os
-import re
 from io import BytesIO
 from datetime import datetime
 from typing import List, Tuple, Dict
@@ -10,18 +9,16 @@ import docx
 from fastapi import APIRouter, UploadFile, File
 from fastapi.responses import JSONResponse
 
+from Common.keyword_matcher import KeywordMatcher, matcher_for
+from Common.document_model import get_document, load_document
+
 router = APIRouter()
 
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
     try:
         reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        out = ""
-        for p in reader.pages:
-            t = p.extract_text()
-            if t:
-                out += t + "\n"
-        return out
+        return load_document([p.extract_text() for p in reader.pages], sep="", page_end="\n").text
     except Exception:
         enc = chardet.detect(file_bytes).get("encoding") or "utf-8"
         try:
@@ -104,14 +101,18 @@ BENEFIT_CATEGORIES = {
 }
 
 
+# keyword -> categories it belongs to, and one automaton over all of them
+KEYWORD_CATEGORIES: Dict[str, List[str]] = {}
+for _cat_key, _meta in BENEFIT_CATEGORIES.items():
+    for _kw in _meta.get("keywords", []):
+        KEYWORD_CATEGORIES.setdefault(_kw.lower(), []).append(_cat_key)
+BENEFIT_MATCHER = KeywordMatcher(KEYWORD_CATEGORIES)
+
+
 def text_matches_keywords(text: str, keywords: List[str]) -> int:
-    t = (text or "").lower()
-    count = 0
-    for kw in keywords:
-        # allow multi-word keywords
-        if kw in t:
-            count += 1
-    return count
+    # allow multi-word keywords
+    found = matcher_for(keywords).find(text or "")
+    return sum(1 for kw in keywords if kw in found)
 
 
 def compute_benefit_score(full_text: str) -> Tuple[int, dict]:
@@ -122,10 +123,12 @@ def compute_benefit_score(full_text: str) -> Tuple[int, dict]:
     # also compute keyword counts for finer-grain score
     total_keyword_matches = 0
     total_possible_keywords = 0
+    # single pass over the (shared, already lowercased) text for every category
+    found = BENEFIT_MATCHER.find(get_document(full_text).lower, lowered=True)
     for k, meta in BENEFIT_CATEGORIES.items():
         kws = meta.get("keywords", [])
         total_possible_keywords += max(1, len(kws))
-        c = text_matches_keywords(full_text, kws)
+        c = sum(1 for kw in kws if kw in found)
         matches[k] = {"label": meta.get("label"), "keyword_matches": c, "matched": c > 0}
         if c > 0:
             matched_categories += 1
@@ -167,42 +170,24 @@ def build_formatted_comment(score: int, summary: str, missing_categories: List[s
 def extract_benefit_lines(full_text: str, max_results: int = 20) -> List[Dict]:
     """Scan the text for sentences/lines that contain benefit-related keywords.
 
-    Returns a list of dicts with: `line_number`, `text`, `matched_categories`, `matched_keywords`, `match_count`.
+    Returns a list of dicts with: `line_number`, `page`, `text`, `matched_categories`, `matched_keywords`, `match_count`.
     """
     if not full_text:
         return []
 
-    # Split into sentences (fallback to lines if sentences are not found)
-    sents = re.split(r'(?<=[.!?])\s+', full_text)
-    if not sents or len(sents) < 2:
-        sents = [ln.strip() for ln in full_text.splitlines() if ln.strip()]
-
     results: List[Dict] = []
-    for sent in sents:
-        txt = sent.strip()
-        if not txt:
+    for sent in get_document(full_text).sentences_or_lines:
+        txt = sent.text
+        found = BENEFIT_MATCHER.find(sent.lower, lowered=True)
+        if not found:
             continue
-        lower = txt.lower()
-        matched_cats = []
-        matched_keywords = []
-        for cat_key, meta in BENEFIT_CATEGORIES.items():
-            kws = meta.get("keywords", [])
-            found = [kw for kw in kws if kw in lower]
-            if found:
-                matched_cats.append(cat_key)
-                matched_keywords.extend(found)
+        cats = {cat for kw in found for cat in KEYWORD_CATEGORIES[kw]}
+        matched_cats = [cat_key for cat_key in BENEFIT_CATEGORIES if cat_key in cats]
+        matched_keywords = [kw for kw in found for _ in KEYWORD_CATEGORIES[kw]]
         if matched_cats:
-            # approximate line number by locating sentence in full_text
-            line_number = None
-            try:
-                pos = full_text.find(txt)
-                if pos >= 0:
-                    line_number = full_text[:pos].count("\n") + 1
-            except Exception:
-                line_number = None
-
             results.append({
-                "line_number": line_number,
+                "line_number": sent.line,
+                "page": sent.page,
                 "text": txt[:500].strip(),
                 "matched_categories": matched_cats,
                 "matched_keywords": sorted(list(set(matched_keywords))),
@@ -6,10 +6,15 @@ from io import BytesIO
 from datetime import datetime
 from typing import Dict, Any
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
 import numpy as np
 import joblib
 
+from Common.document_model import get_document, load_document
+from Common.llm_client import llm
+from Common.prompt_cache import assemble, static_prefix
+
 # Optional/soft imports - guard heavy or environment-specific libraries
 try:
     from sentence_transformers import SentenceTransformer
@@ -935,7 +940,7 @@ def get_similar_projects(query_text, top_k=5):
 def extract_pdf_text(bts):
     try:
         reader = PyPDF2.PdfReader(BytesIO(bts))
-        return "\n".join([page.extract_text() or "" for page in reader.pages])
+        return load_document([page.extract_text() for page in reader.pages], sep="\n", skip_empty=False).text
     except:
         enc = chardet.detect(bts)["encoding"] or "utf-8"
         return bts.decode(enc, errors="ignore")
@@ -962,29 +967,17 @@ def extract_text(filename, bts):
 # ===============================================================
 
 def chunk_text(text, min_lines=60):
-    lines = [l for l in text.splitlines() if l.strip()]
-    return ["\n".join(lines[i:i + min_lines])
-            for i in range(0, len(lines), min_lines)]
+    # non-empty lines from the shared document model, `min_lines` per chunk
+    return [chunk.text for chunk in get_document(text).line_chunks(min_lines)]
 
 
 # ===============================================================
 #                 LLM PROMPT WITH HISTORICAL DATA
 # ===============================================================
 
-def llm_cost_prompt(new_context, similar_projects):
-
-    sim_block = ""
-    for p in similar_projects:
-        sim_block += f"""
-PAST PROJECT ABSTRACT:
-{p['abstract']}
-
-FINANCIAL YEAR: {p['year']}
-FINAL APPROVED COST (Lakhs): {p['cost']}
----------------------------------------------------------
-"""
-
-    return f"""
+# S&T cost norms and the output format are the same for every call: they go
+# first as a cacheable prefix, the per-request benchmarks and abstract after
+COST_PROMPT_NORMS = static_prefix("cost-norms", """
 You are a senior Government of India R&D Cost Estimation Officer.
 
 Your job is to estimate project cost STRICTLY in **Indian Rupees (Lakhs)** 
@@ -997,16 +990,6 @@ Your estimate MUST be realistic and comply with:
 • Typical R&D funding scales (10–500 Lakhs range for normal projects)  
 • No exaggerated or inflated numbers  
 
-=========================================================
-HISTORICAL COMPLETED PROJECTS (Reference Benchmarks)
-=========================================================
-{sim_block}
-
-=========================================================
-NEW PROJECT ABSTRACT
-=========================================================
-{new_context}
-
 =========================================================
 STRICT COSTING RULES (MANDATORY)
 =========================================================
@@ -1037,9 +1020,9 @@ STRICT COSTING RULES (MANDATORY)
 =========================================================
 REQUIRED OUTPUT FORMAT (STRICT JSON ONLY)
 =========================================================
-{{
+{
   "estimated_cost": 0,
-  "breakdown": {{
+  "breakdown": {
     "equipment": 0,
     "software_and_tools": 0,
     "manpower": 0,
@@ -1049,19 +1032,48 @@ REQUIRED OUTPUT FORMAT (STRICT JSON ONLY)
     "maintenance_and_operations": 0,
     "consumables": 0,
     "contingency": 0
-  }},
+  },
   "confidence": 0.0
-}}
+}
+""")
 
-Return ONLY the JSON object. No explanations. No text outside JSON.
+
+def llm_cost_prompt(new_context, similar_projects):
+
+    sim_block = ""
+    for p in similar_projects:
+        sim_block += f"""
+PAST PROJECT ABSTRACT:
+{p['abstract']}
+
+FINANCIAL YEAR: {p['year']}
+FINAL APPROVED COST (Lakhs): {p['cost']}
+---------------------------------------------------------
 """
 
+    # benchmarks come before the abstract so chunks of one proposal share a longer prefix
+    return assemble(COST_PROMPT_NORMS, f"""
+=========================================================
+HISTORICAL COMPLETED PROJECTS (Reference Benchmarks)
+=========================================================
+{sim_block}
+
+=========================================================
+NEW PROJECT ABSTRACT
+=========================================================
+{new_context}
+
+Return ONLY the JSON object. No explanations. No text outside JSON.
+""")
+
 
 
 def call_gemini(prompt):
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    resp = model.generate_content(prompt)
-    return resp.text or ""
+    return llm.generate_sync(prompt, model="gemini-2.5-flash", route="cost").text
+
+
+async def call_gemini_async(prompt):
+    return (await llm.generate(prompt, model="gemini-2.5-flash", route="cost")).text
 
 
 def parse_json(text):
@@ -1173,9 +1185,7 @@ item.Separate capital vs operational expenses and
 include lifecycle maintenance cost estimates.Clarify contingencies and explain assumptions
 behind unit costs to reduce budget uncertainty
 """
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        resp = model.generate_content(prompt)
-        raw = resp.text or ""
+        raw = llm.generate_sync(prompt, model="gemini-2.5-flash-lite", route="cost").text
         # normalize output to five non-empty lines
         lines = [ln.strip() for ln in raw.splitlines() if ln.strip()]
         if len(lines) >= 5:
@@ -1651,17 +1661,10 @@ def extract_json_from_text(content: str) -> dict:
         {content}
         """
         
-        response = genai.GenerativeModel("gemini-2.5-flash").generate_content(extraction_prompt)
-        extracted_json = response.text.strip()
-        
-        # Clean the response to ensure it's valid JSON
-        if extracted_json.startswith('```json'):
-            extracted_json = extracted_json[7:]
-        if extracted_json.endswith('```'):
-            extracted_json = extracted_json[:-3]
-        
-        extracted_data = json.loads(extracted_json)
-        return extracted_data
+        result = llm.generate_sync(extraction_prompt, model="gemini-2.5-flash", route="cost-extraction", json_output=True)
+        if not isinstance(result.data, dict):
+            raise ValueError("response is not a JSON object")
+        return result.data
         
     except Exception as e:
         print(f"Error in AI JSON extraction: {str(e)}")
@@ -2312,7 +2315,7 @@ Top budget allocations (top 4):\n"""
                 prompt += f"- {k}: {v} lakhs\n"
             prompt += "\nRespond ONLY with the plain text comment block exactly in the format above. No JSON, no extra explanation."
 
-            raw_comments = call_gemini(prompt) if 'call_gemini' in globals() else ""
+            raw_comments = await call_gemini_async(prompt)
             cost_comments = (raw_comments or "").strip()
             if cost_comments.startswith('```') and cost_comments.endswith('```'):
                 cost_comments = cost_comments.strip('`\n ')
@@ -2401,7 +2404,7 @@ async def _process_and_estimate_impl(file):
             return {"success": False, "error": "Unable to extract meaningful text content from the file"}
 
         # Step 2: Extract structured JSON data using AI (similar to existing extraction logic)
-        json_structure = extract_json_from_text(extracted_text)
+        json_structure = await run_in_threadpool(extract_json_from_text, extracted_text)
 
         # Strict check: ensure extraction is meaningful before proceeding.
         if not _is_meaningful_extraction(json_structure, extracted_text):
@@ -2523,7 +2526,7 @@ Top budget allocations (top 4):\n"""
                 prompt += f"- {k}: {v} lakhs\n"
             prompt += "\nRespond ONLY with the plain text comment block exactly in the format above. No JSON, no extra explanation."
 
-            raw_comments = call_gemini(prompt) if 'call_gemini' in globals() else ""
+            raw_comments = await call_gemini_async(prompt)
             cost_comments = (raw_comments or "").strip()
             if cost_comments.startswith('```') and cost_comments.endswith('```'):
                 cost_comments = cost_comments.strip('`\n ')
@@ -2607,7 +2610,7 @@ async def process_and_estimate(file: UploadFile = File(...)):
         return {"error": "Unable to extract meaningful text"}
 
     # --- EXTRACT JSON STRUCTURE FIRST ---
-    json_structure = extract_json_from_text(text)
+    json_structure = await run_in_threadpool(extract_json_from_text, text)
 
     # If extraction is not meaningful, abort and inform user (avoid dummy estimates)
     if not _is_meaningful_extraction(json_structure, text):
@@ -2699,7 +2702,7 @@ Top budget allocations (top 4):\n"""
 
         prompt += "\nRespond ONLY with the plain text comment block exactly in the format above. No JSON, no extra explanation."
 
-        raw_comments = call_gemini(prompt) if 'call_gemini' in globals() else ""
+        raw_comments = await call_gemini_async(prompt)
         cost_comments = (raw_comments or "").strip()
         # strip fences if present
         if cost_comments.startswith('```') and cost_comments.endswith('```'):
@@ -16,6 +16,8 @@ from fastapi import APIRouter, UploadFile, File, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from Common.keyword_matcher import KeywordMatcher
+
 router = APIRouter()
 
 
@@ -35,6 +37,15 @@ if _GEMINI_AVAILABLE and GEMINI_API_KEY:
     except Exception:
         pass
 
+# Budget line keywords, matched in one pass per line
+BUDGET_MANPOWER_KEYWORDS = {"manpower", "salary", "salaries"}
+BUDGET_CAPITAL_KEYWORDS = {"capital", "capital equipment", "equipment", "land", "building"}
+BUDGET_LAKH_KEYWORDS = {"lakh", "lakhs"}
+BUDGET_INR_KEYWORDS = {"rs", "rupee", "inr"}
+BUDGET_LINE_MATCHER = KeywordMatcher(
+    BUDGET_MANPOWER_KEYWORDS | BUDGET_CAPITAL_KEYWORDS | BUDGET_LAKH_KEYWORDS | BUDGET_INR_KEYWORDS
+)
+
 
 class DeliverableFeasibilityAgent:
     """
@@ -367,9 +378,9 @@ class DeliverableFeasibilityAgent:
         number_pattern = re.compile(r"([\d,]+\.?\d*)")
         
         for line in lines:
-            line_lower = line.lower()
+            found = BUDGET_LINE_MATCHER.find(line)
             
-            if "manpower" in line_lower or "salary" in line_lower or "salaries" in line_lower:
+            if found & BUDGET_MANPOWER_KEYWORDS:
                 match = number_pattern.search(line.replace('rs.', '').replace('rs', ''))
                 if match:
                     try:
@@ -378,7 +389,7 @@ class DeliverableFeasibilityAgent:
                     except Exception:
                         pass
             
-            if any(keyword in line_lower for keyword in ["capital", "capital equipment", "equipment", "land", "building"]):
+            if found & BUDGET_CAPITAL_KEYWORDS:
                 match = number_pattern.search(line.replace('rs.', '').replace('rs', ''))
                 if match:
                     try:
@@ -388,9 +399,9 @@ class DeliverableFeasibilityAgent:
                         pass
             
             # Detect currency units
-            if any(keyword in line_lower for keyword in ["lakh", "lakhs"]):
+            if found & BUDGET_LAKH_KEYWORDS:
                 budget["currency_unit"] = "lakhs"
-            if any(keyword in line_lower for keyword in ["rs", "rupee", "inr"]):
+            if found & BUDGET_INR_KEYWORDS:
                 budget["currency_unit"] = "INR"
         
         return budget
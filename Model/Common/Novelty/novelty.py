@@ -44,10 +44,13 @@ import torch.nn as nn
 import PyPDF2
 
 from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from sentence_transformers import SentenceTransformer
+
+from Common.llm_client import llm
 # Try to import the exact extraction module provided by the user
 try:
     from Model.Json_extraction.ocr_extraction import (
@@ -95,16 +98,14 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 embedder = SentenceTransformer(EMBED_MODEL)
 
-# Gemini configuration
+# Gemini configuration (calls go through the shared llm client)
 GENAI_AVAILABLE = False
-gemini_model = None
 GEMINI_KEY = os.getenv("NOVELTY_ANALYSIS_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 if GEMINI_KEY:
     try:
         import google.generativeai as genai
         genai.configure(api_key=GEMINI_KEY)
-        gemini_model = genai.GenerativeModel(GEMINI_MODEL)
         GENAI_AVAILABLE = True
         logger.info("Gemini configured.")
     except Exception as e:
@@ -188,7 +189,7 @@ def gemini_extract_method_obj(raw_text: str) -> Dict[str, str]:
         f"{json.dumps(EXTRACTION_KEYS, indent=2)}\n\nDocument:\n" + raw_text[:14000]
     )
     try:
-        resp = gemini_model.generate_content(prompt)
+        resp = llm.generate_sync(prompt, model=GEMINI_MODEL, route="novelty")
         txt = resp.text.strip()
         if txt.startswith("```"):
             txt = txt.split("```", 1)[-1]
@@ -224,7 +225,7 @@ def heuristic_extract_method_obj(raw_text: str) -> Dict[str, str]:
     return res
 
 def extract_methodology_objectives(raw_text: str) -> Dict[str, str]:
-    if GENAI_AVAILABLE and gemini_model:
+    if GENAI_AVAILABLE:
         try:
             out = gemini_extract_method_obj(raw_text)
             if any(out.values()):
@@ -236,13 +237,13 @@ def extract_methodology_objectives(raw_text: str) -> Dict[str, str]:
 def summarize_idea(text: str, max_chars: int = 300) -> str:
     if not text:
         return ""
-    if GENAI_AVAILABLE and gemini_model:
+    if GENAI_AVAILABLE:
         try:
             prompt = (
                 "Summarize the core research IDEA from the text in one concise sentence. Return only the sentence.\n\n"
                 f"Text:\n{text[:7000]}"
             )
-            resp = gemini_model.generate_content(prompt)
+            resp = llm.generate_sync(prompt, model=GEMINI_MODEL, route="novelty")
             idea = resp.text.strip()
             if idea.startswith("```"):
                 idea = idea.strip("`")
@@ -505,9 +506,9 @@ Proposal Content:
 Provide thorough analysis with clear evidence for each element.
 """
 
-    if GENAI_AVAILABLE and gemini_model:
+    if GENAI_AVAILABLE:
         try:
-            response = gemini_model.generate_content(prompt)
+            response = llm.generate_sync(prompt, model=GEMINI_MODEL, route="novelty")
             return response.text
         except Exception as e:
             logger.error(f"Gemini SCAMPER analysis failed: {e}")
@@ -785,9 +786,9 @@ Rules:
 - Return only JSON (no extra commentary). Numeric fields must be integers 0-100.
 """
 
-    if GENAI_AVAILABLE and gemini_model:
+    if GENAI_AVAILABLE:
         try:
-            resp = gemini_model.generate_content(prompt)
+            resp = llm.generate_sync(prompt, model=GEMINI_MODEL, route="novelty")
             txt = resp.text.strip()
             if txt.startswith("```"):
                 txt = txt.split("```", 1)[-1]
@@ -890,7 +891,7 @@ async def analyze_novelty(file: UploadFile = File(...)):
             logger.warning(f"Supabase upload failed: {e}")
 
         # Extract methodology & objectives
-        parsed = extract_methodology_objectives(raw_text)
+        parsed = await run_in_threadpool(extract_methodology_objectives, raw_text)
         methodology = (parsed.get("methodology") or "").strip()
         objectives = (parsed.get("objectives") or "").strip()
 
@@ -906,7 +907,7 @@ async def analyze_novelty(file: UploadFile = File(...)):
                 objectives = snippet
 
         combined = (methodology + "\n" + objectives).strip() if (methodology or objectives) else raw_text[:3000]
-        idea = summarize_idea(combined)
+        idea = await run_in_threadpool(summarize_idea, combined)
 
         # Upload extracted JSON (best-effort)
         extracted_json_url = None
@@ -946,7 +947,7 @@ async def analyze_novelty(file: UploadFile = File(...)):
                 pcombo = (pmeth + "\n" + pobj).strip()
             if not pcombo:
                 continue
-            pidea = summarize_idea(pcombo)
+            pidea = await run_in_threadpool(summarize_idea, pcombo)
             if pidea:
                 past_ideas.append(pidea)
                 past_filenames.append(p.get("filename", "unknown"))
@@ -985,7 +986,7 @@ async def analyze_novelty(file: UploadFile = File(...)):
         # SCAMPER Analysis: ALWAYS perform to check for innovation elements
         # If ANY SCAMPER element is detected, novelty score will be boosted to minimum 70
         logger.info(f"Performing SCAMPER analysis (similarity: {max_sim:.4f})...")
-        scamper_result = analyze_scamper_for_similarity(objectives, methodology, raw_text)
+        scamper_result = await run_in_threadpool(analyze_scamper_for_similarity, objectives, methodology, raw_text)
         
         if scamper_result.get("scamper_available") and scamper_result.get("scamper_count", 0) > 0:
             logger.info(f"✓ SCAMPER elements detected: {scamper_result.get('scamper_count')}/7 - Novelty boost will be applied")
@@ -1011,7 +1012,7 @@ async def analyze_novelty(file: UploadFile = File(...)):
             
             # Generate uniqueness snippet using Gemini for top citations
             uniqueness_snippet = ""
-            if GENAI_AVAILABLE and gemini_model and i < 8:  # Generate for top 8 citations
+            if GENAI_AVAILABLE and i < 8:  # Generate for top 8 citations
                 try:
                     uniqueness_prompt = f"""
 Compare the NEW proposal with this EXTERNAL work and explain in 1-2 sentences what makes the NEW proposal unique/different.
@@ -1027,7 +1028,7 @@ Snippet: {hit.get('snippet', 'No snippet')[:400]}
 
 Return ONLY 1-2 sentences explaining the key unique aspects of the NEW proposal compared to this external work.
 """
-                    resp = gemini_model.generate_content(uniqueness_prompt)
+                    resp = await llm.generate(uniqueness_prompt, model=GEMINI_MODEL, route="novelty")
                     uniqueness_snippet = resp.text.strip()
                     if uniqueness_snippet.startswith("```"):
                         uniqueness_snippet = uniqueness_snippet.strip("`")
@@ -1067,7 +1068,10 @@ Return ONLY 1-2 sentences explaining the key unique aspects of the NEW proposal
         external_matches_for_llm = external_evidence
 
         # Use Gemini to compute uniqueness/advantage/significance and optionally a direct novelty percentage
-        comp_result = gemini_score_components(idea, internal_matches_for_llm, external_evidence, gnn_score=gnn_score, methodology=methodology, objectives=objectives)
+        comp_result = await run_in_threadpool(
+            gemini_score_components, idea, internal_matches_for_llm, external_evidence,
+            gnn_score=gnn_score, methodology=methodology, objectives=objectives,
+        )
         uniqueness = comp_result.get("uniqueness", 0)
         advantage = comp_result.get("advantage", 0)
         significance = comp_result.get("significance", 0)
@@ -1076,7 +1080,7 @@ Return ONLY 1-2 sentences explaining the key unique aspects of the NEW proposal
         
         # Build uniqueness comparison against internal proposals with detailed similarity/uniqueness analysis
         uniqueness_comparisons = []
-        if GENAI_AVAILABLE and gemini_model and flagged_internal:
+        if GENAI_AVAILABLE and flagged_internal:
             logger.info("Generating detailed uniqueness comparisons with internal proposals...")
             for idx, internal_match in enumerate(flagged_internal[:5]):  # Top 5 similar proposals
                 try:
@@ -1114,7 +1118,7 @@ UNIQUENESS:
 SIMILARITY_SCORE: [0-100]%
 UNIQUENESS_SCORE: [0-100]%
 """
-                    resp = gemini_model.generate_content(detailed_comparison_prompt)
+                    resp = await llm.generate(detailed_comparison_prompt, model=GEMINI_MODEL, route="novelty")
                     analysis_text = resp.text.strip()
                     if analysis_text.startswith("```"):
                         analysis_text = analysis_text.strip("`")
@@ -1238,7 +1242,7 @@ UNIQUENESS_SCORE: [0-100]%
             citation_lines.append(f"[{i}] {t}\n    {u}")
         citations_block = "\n".join(citation_lines) if citation_lines else "No external references found."
 
-        if GENAI_AVAILABLE and gemini_model:
+        if GENAI_AVAILABLE:
             # Ask Gemini to render a concise (3-4 lines) reviewer comment + trailing JSON summary
             comment_prompt = f"""
 You are an expert reviewer. Produce a concise 3-4 line novelty comment that explains why the idea is low/moderate/high novelty. After the brief comment, on its own line append a single JSON object with these exact keys: `novelty_percentage`, `uniqueness_score`, `advantage_score`, `significance_score`, `gnn_score`, `comment`.
@@ -1257,7 +1261,7 @@ Internal top matches summary:
 {json.dumps(internal_matches_for_llm[:6], indent=2)}
 """
             try:
-                resp = gemini_model.generate_content(comment_prompt)
+                resp = await llm.generate(comment_prompt, model=GEMINI_MODEL, route="novelty")
                 llm_comment = resp.text.strip()
                 if llm_comment.startswith("```"):
                     llm_comment = llm_comment.strip("`")
@@ -1,10 +1,15 @@
 import os
 import PyPDF2
 from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from Common.SWOT.thrust_index import THRUST_AREAS_PATH, ThrustAreaIndex
+from Common.llm_client import llm
+from Common.prompt_cache import assemble, static_prefix
+
 load_dotenv()
 
 # --------------------------------------------
@@ -12,6 +17,7 @@ load_dotenv()
 # --------------------------------------------
 api_key = os.getenv("SWOT_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+SWOT_TIMEOUT = float(os.getenv("SWOT_TIMEOUT", "120"))
 if not api_key:
     raise ValueError("ERROR: Set SWOT_KEY in environment variables.")
 
@@ -23,33 +29,29 @@ genai.configure(api_key=api_key)
 router = APIRouter()
 
 # --------------------------------------------
-# 3. Load Thrust Areas Document ONCE (Agent Memory)
+# 3. Load Thrust Areas Index ONCE (Agent Memory)
 # --------------------------------------------
-def extract_pdf_text_from_path(path: str):
-    text = ""
-    with open(path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t:
-                text += t + "\n"
-    return text
-
-# Get the absolute path to the data_files directory
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.dirname(os.path.dirname(CURRENT_DIR))
-THRUST_AREAS_PATH = os.path.join(MODEL_DIR, "data_files", "Thrust_Areas_2020.pdf")
+# The PDF is chunked per thrust item and embedded once (cached next to the
+# PDF); each request only gets the items relevant to its proposal.
+THRUST_UNAVAILABLE = "[Thrust Areas document not available]"
 
 try:
     if not os.path.exists(THRUST_AREAS_PATH):
         print(f"⚠ Warning: Thrust Areas PDF not found at {THRUST_AREAS_PATH}")
-        THRUST_TEXT = "[Thrust Areas document not available]"
+        THRUST_INDEX = None
     else:
-        THRUST_TEXT = extract_pdf_text_from_path(THRUST_AREAS_PATH)
-        print("✔ Agent Memory Loaded: MoC Thrust Areas")
+        THRUST_INDEX = ThrustAreaIndex.load(THRUST_AREAS_PATH)
+        print(f"✔ Agent Memory Loaded: MoC Thrust Areas ({len(THRUST_INDEX.chunks)} sections)")
 except Exception as e:
     print(f"⚠ Warning: Failed to load Thrust Areas: {e}")
-    THRUST_TEXT = "[Thrust Areas document not available]"
+    THRUST_INDEX = None
+
+
+def thrust_context(form_text: str):
+    """Thrust-area sections for this proposal (within THRUST_TOKEN_BUDGET) and retrieval stats."""
+    if THRUST_INDEX is None or not THRUST_INDEX.chunks:
+        return THRUST_UNAVAILABLE, {}
+    return THRUST_INDEX.context(form_text)
 
 # --------------------------------------------
 # 4. Helper to Extract Text from Uploaded PDF
@@ -71,8 +73,8 @@ def extract_pdf_text(upload_file: UploadFile) -> str:
 # --------------------------------------------
 # 5. Agent Prompt: Intelligent MoC Reasoner
 # --------------------------------------------
-def build_agent_prompt(form_text: str):
-    return f"""
+# Same text on every call, so it is sent first and served from the prompt cache
+SWOT_AGENT_INSTRUCTIONS = static_prefix("swot-agent", """
 You are **MoC-SWOT-Agent**, an expert evaluator for the Ministry of Coal (MoC), India.
 
 You have long-term memory containing:
@@ -135,14 +137,18 @@ Strict Rules for Output:
 - Opportunities & Threats MUST come from MoC thrust areas + external risks.
 - Bullets must be concise, technical, and MoC-review ready.
 
---------------- AGENT MEMORY (THRUST AREAS) ---------------
-{THRUST_TEXT}
+""")
+
+
+def build_agent_prompt(form_text: str, thrust_text: str):
+    return assemble(SWOT_AGENT_INSTRUCTIONS, f"""--------------- AGENT MEMORY (THRUST AREAS RELEVANT TO THIS PROPOSAL) ---------------
+{thrust_text}
 
 --------------- FORM-I PROPOSAL BEING ANALYZED ---------------
 {form_text}
 
 Now perform your task and return ONLY the SWOT.
-"""
+""")
 
 
 # --------------------------------------------
@@ -159,16 +165,14 @@ async def swot_agent(form1_pdf: UploadFile = File(...)):
         if not form_text.strip():
             raise HTTPException(status_code=400, detail="Error: PDF appears to be empty or unreadable.")
 
-        prompt = build_agent_prompt(form_text)
+        thrust_text, thrust_stats = await run_in_threadpool(thrust_context, form_text)
+        prompt = build_agent_prompt(form_text, thrust_text)
+        usage = {}
 
         try:
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            response = model.generate_content(prompt)
-            
-            if not response or not hasattr(response, 'text'):
-                raise Exception("Invalid response from Gemini API")
-                
-            swot_output = response.text
+            result = await llm.generate(prompt, model=GEMINI_MODEL, route="swot", timeout=SWOT_TIMEOUT)
+            usage = result.usage
+            swot_output = result.text
             
             if not swot_output or not swot_output.strip():
                 raise Exception("Empty response from Gemini API")
@@ -199,7 +203,7 @@ T — Threats
 
 Note: Automated SWOT analysis temporarily unavailable. Manual review recommended."""
 
-        return JSONResponse(content={"swot": swot_output, "status": "success"})
+        return JSONResponse(content={"swot": swot_output, "status": "success", "thrust_context": thrust_stats, "usage": usage})
         
     except HTTPException:
         raise
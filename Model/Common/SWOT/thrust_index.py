@@ -0,0 +1,226 @@
+"""
+Thrust Areas index for the SWOT agent.
+
+The MoC Thrust Areas PDF is split into one chunk per thrust item
+("1. <area>" / "a) <item>" in the document) and each chunk is embedded.
+Per SWOT request only the chunks closest to the proposal are put in the
+prompt, up to THRUST_TOKEN_BUDGET tokens, instead of the whole document.
+
+Chunks and embeddings are stored next to the PDF (`<pdf>.index.json`) and
+reused while the PDF, the embedding model and the segmenter are unchanged.
+Build it ahead of deployment with
+
+    python -m Common.SWOT.thrust_index [path/to/Thrust_Areas.pdf]
+
+(run from the Model/ directory); otherwise it is built on first load.
+Without sentence-transformers, chunks are ranked by IDF-weighted word overlap.
+"""
+
+import os
+import re
+import sys
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import PyPDF2
+
+from Common.document_model import SEGMENTER_VERSION, get_document, load_document
+from Common.tokens import estimate_tokens
+
+try:
+    from sentence_transformers import SentenceTransformer
+except Exception:
+    SentenceTransformer = None
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.dirname(os.path.dirname(CURRENT_DIR))
+THRUST_AREAS_PATH = os.path.join(MODEL_DIR, "data_files", "Thrust_Areas_2020.pdf")
+
+THRUST_TOP_K = int(os.getenv("THRUST_TOP_K", "6"))
+THRUST_TOKEN_BUDGET = int(os.getenv("THRUST_TOKEN_BUDGET", "900"))
+# Proposal segments used as queries (the Form-I sections that matter come first)
+THRUST_QUERY_SEGMENTS = int(os.getenv("THRUST_QUERY_SEGMENTS", "24"))
+THRUST_EMBED_MODEL = os.getenv("THRUST_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+THRUST_INDEX_PATH = os.getenv("THRUST_INDEX_PATH")
+
+_AREA_RE = re.compile(r"^(\d{1,2})\.\s+(\S.*)$")
+_ITEM_RE = re.compile(r"^([a-z])\)\s*(\S.*)$")
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+
+@lru_cache(maxsize=1)
+def _embedding_model():
+    if SentenceTransformer is None:
+        return None
+    try:
+        return SentenceTransformer(THRUST_EMBED_MODEL)
+    except Exception as e:
+        print(f"⚠ Warning: Could not load {THRUST_EMBED_MODEL} for thrust-area retrieval: {e}")
+        return None
+
+
+def _embed(texts: List[str]) -> Optional[np.ndarray]:
+    model = _embedding_model()
+    if model is None or not texts:
+        return None
+    vectors = np.asarray(model.encode(texts, show_progress_bar=False), dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+
+
+def read_pdf_text(path: str) -> str:
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return load_document([p.extract_text() for p in reader.pages], sep="", page_end="\n").text
+
+
+def chunk_thrust_areas(text: str) -> List[Dict[str, Any]]:
+    """One chunk per lettered thrust item, labelled with its numbered area."""
+    doc = get_document(text)
+    chunks: List[Dict[str, Any]] = []
+    area_no, area_title, in_title = None, [], False
+    for line in doc.lines:
+        clean = " ".join(line.text.split())
+        area = _AREA_RE.match(clean)
+        item = _ITEM_RE.match(clean)
+        if area:
+            area_no, area_title, in_title = area.group(1), [area.group(2)], True
+        elif item and area_no:
+            in_title = False
+            chunks.append({
+                "id": f"{area_no}.{item.group(1)}",
+                "area": " ".join(area_title),
+                "text": clean,
+                "page": line.page,
+            })
+        elif in_title:
+            area_title.append(clean)
+        elif chunks and area_no:
+            chunks[-1]["text"] += " " + clean
+
+    if not chunks:
+        # Unstructured document: fall back to plain paragraph segments
+        for i, seg in enumerate(doc.segments(min_chars=400, max_chars=1200)):
+            chunks.append({"id": str(i + 1), "area": "", "text": " ".join(seg.text.split()), "page": seg.page})
+    return chunks
+
+
+def render_chunk(chunk: Dict[str, Any]) -> str:
+    heading = f"[{chunk['id']}] {chunk['area']}".rstrip()
+    return f"{heading}\n{chunk['text']}"
+
+
+class ThrustAreaIndex:
+    def __init__(self, chunks: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.rendered = [render_chunk(c) for c in chunks]
+        self.tokens = [estimate_tokens(r) for r in self.rendered]
+        # IDF over chunks for the lexical fallback
+        self.words = [set(_WORD_RE.findall(r.lower())) for r in self.rendered]
+        df: Dict[str, int] = {}
+        for words in self.words:
+            for w in words:
+                df[w] = df.get(w, 0) + 1
+        self.idf = {w: float(np.log(1 + len(chunks) / n)) for w, n in df.items()}
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens)
+
+    # -------------------- build / load --------------------
+
+    @classmethod
+    def build(cls, text: str) -> "ThrustAreaIndex":
+        chunks = chunk_thrust_areas(text)
+        return cls(chunks, _embed([render_chunk(c) for c in chunks]))
+
+    def save(self, path: str, source_stat: os.stat_result):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({
+                "size": source_stat.st_size,
+                "mtime": source_stat.st_mtime,
+                "segmenter": SEGMENTER_VERSION,
+                "model": THRUST_EMBED_MODEL if self.embeddings is not None else None,
+                "chunks": self.chunks,
+                "embeddings": self.embeddings.tolist() if self.embeddings is not None else None,
+            }, fh)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, pdf_path: str = THRUST_AREAS_PATH) -> "ThrustAreaIndex":
+        """Index from the artifact next to the PDF if it is current, else built (and saved)."""
+        stat = os.stat(pdf_path)
+        artifact = THRUST_INDEX_PATH or os.path.splitext(pdf_path)[0] + ".index.json"
+        try:
+            with open(artifact, encoding="utf-8") as fh:
+                data = json.load(fh)
+            fresh = (data.get("size") == stat.st_size and data.get("mtime") == stat.st_mtime
+                     and data.get("segmenter") == SEGMENTER_VERSION)
+            # An artifact built without embeddings is rebuilt once the model is available
+            if fresh and (data.get("model") == THRUST_EMBED_MODEL or SentenceTransformer is None):
+                embeddings = data.get("embeddings")
+                return cls(data["chunks"], np.asarray(embeddings, dtype=np.float32) if embeddings else None)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(read_pdf_text(pdf_path))
+        try:
+            index.save(artifact, stat)
+            print(f"✔ Thrust Areas index written to {artifact} ({len(index.chunks)} chunks)")
+        except OSError as e:
+            print(f"⚠ Warning: Could not write Thrust Areas index {artifact}: {e}")
+        return index
+
+    # -------------------- retrieval --------------------
+
+    def _scores(self, proposal_text: str) -> np.ndarray:
+        segments = [s.text for s in get_document(proposal_text).segments(min_chars=300, max_chars=1000)]
+        segments = segments[:THRUST_QUERY_SEGMENTS]
+        if self.embeddings is not None and segments:
+            queries = _embed(segments)
+            if queries is not None:
+                # a thrust item is relevant if any part of the proposal is close to it
+                return (self.embeddings @ queries.T).max(axis=1)
+
+        words = set(_WORD_RE.findall(proposal_text.lower()))
+        scores = []
+        for chunk_words in self.words:
+            norm = np.sqrt(sum(self.idf[w] for w in chunk_words)) or 1.0
+            scores.append(sum(self.idf[w] for w in chunk_words & words) / norm)
+        return np.asarray(scores, dtype=np.float32)
+
+    def select(self, proposal_text: str, top_k: int = THRUST_TOP_K, token_budget: int = THRUST_TOKEN_BUDGET) -> List[int]:
+        """Ids (positions) of the most relevant chunks within the budget, in document order."""
+        if not self.chunks:
+            return []
+        chosen, used = [], 0
+        for i in np.argsort(-self._scores(proposal_text), kind="stable"):
+            if len(chosen) == top_k:
+                break
+            if used + self.tokens[i] > token_budget:
+                continue
+            chosen.append(int(i))
+            used += self.tokens[i]
+        return sorted(chosen)
+
+    def context(self, proposal_text: str, top_k: int = THRUST_TOP_K, token_budget: int = THRUST_TOKEN_BUDGET) -> Tuple[str, Dict[str, Any]]:
+        """Prompt text for the selected thrust items, plus what was used."""
+        chosen = self.select(proposal_text, top_k, token_budget)
+        text = "\n\n".join(self.rendered[i] for i in chosen)
+        stats = {
+            "thrust_areas": [self.chunks[i]["id"] for i in chosen],
+            "thrust_tokens": sum(self.tokens[i] for i in chosen),
+            "thrust_tokens_full": self.total_tokens,
+            "retrieval": "embedding" if self.embeddings is not None and _embedding_model() is not None else "lexical",
+        }
+        return text, stats
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else THRUST_AREAS_PATH
+    index = ThrustAreaIndex.load(path)
+    print(f"{len(index.chunks)} chunks, {index.total_tokens} tokens, "
+          f"embeddings: {'yes' if index.embeddings is not None else 'no'}")
@@ -10,16 +10,14 @@ import docx
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 
+from Common.keyword_matcher import KeywordMatcher
+from Common.document_model import get_document, load_document
+
 
 def extract_text_from_pdf_bytes(file_bytes: bytes) -> str:
     try:
         reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        out = []
-        for p in reader.pages:
-            t = p.extract_text()
-            if t:
-                out.append(t)
-        return "\n".join(out)
+        return load_document([p.extract_text() for p in reader.pages], sep="\n").text
     except Exception:
         enc = chardet.detect(file_bytes).get("encoding") or "utf-8"
         try:
@@ -189,14 +187,23 @@ CHECKLIST = [
 ]
 
 
+# keyword -> checklist topic, plus timeline/budget terms used for flagged lines
+FEASIBILITY_TOPICS = {}
+for _item in CHECKLIST:
+    for _kw in _item.get('keywords', []):
+        FEASIBILITY_TOPICS[_kw.lower()] = _item['id']
+for _kw in ['budget', 'cost', 'capital', 'manpower', 'fte', 'timeline', 'milestone', 'gantt', 'pilot', 'prototype', 'schedule', 'kpi', 'risk']:
+    FEASIBILITY_TOPICS.setdefault(_kw.lower(), 'other')
+
+# One automaton over every checklist/topic keyword (CHECKLIST keywords are a subset)
+FEASIBILITY_MATCHER = KeywordMatcher(FEASIBILITY_TOPICS)
+
+
 def match_checklist(full_text: str) -> List[Dict]:
-    t = full_text.lower()
+    found = FEASIBILITY_MATCHER.find(get_document(full_text).lower, lowered=True)
     results = []
     for item in CHECKLIST:
-        kw_found = []
-        for kw in item['keywords']:
-            if kw in t:
-                kw_found.append(kw)
+        kw_found = [kw for kw in item['keywords'] if kw in found]
         # simple rules: >=2 keywords -> satisfied, 1 keyword -> partial, 0 -> missing
         if len(kw_found) >= 2:
             status = 'Satisfied'
@@ -239,38 +246,19 @@ def extract_feasibility_lines(full_text: str, max_results: int = 25) -> List[Dic
     """Extract lines/sentences relevant to technical feasibility.
 
     The function searches for checklist keywords, budget mentions, and timeline/duration phrases.
-    Returns list of {line_number, text, matched_topics, matched_keywords, match_count} sorted by match_count.
+    Returns list of {line_number, page, text, matched_topics, matched_keywords, match_count} sorted by match_count.
     """
     if not full_text:
         return []
 
-    # Prepare sentence list
-    sents = re.split(r'(?<=[.!?])\s+', full_text)
-    if not sents or len(sents) < 2:
-        sents = [ln.strip() for ln in full_text.splitlines() if ln.strip()]
-
-    # aggregate keywords from CHECKLIST plus timeline and budget keywords
-    topic_map = {}
-    for item in CHECKLIST:
-        for kw in item.get('keywords', []):
-            topic_map[kw.lower()] = item['id']
-
-    extra_kws = ['budget', 'cost', 'capital', 'manpower', 'fte', 'timeline', 'milestone', 'gantt', 'pilot', 'prototype', 'schedule', 'kpi', 'risk']
-    for kw in extra_kws:
-        topic_map.setdefault(kw.lower(), 'other')
-
     results = []
-    for sent in sents:
-        txt = sent.strip()
-        if not txt or len(txt) < 20:
+    for sent in get_document(full_text).sentences_or_lines:
+        txt = sent.text
+        if len(txt) < 20:
             continue
-        low = txt.lower()
-        matched_topics = set()
-        matched_keywords = []
-        for kw, topic in topic_map.items():
-            if kw in low:
-                matched_topics.add(topic)
-                matched_keywords.append(kw)
+        low = sent.lower
+        matched_keywords = sorted(FEASIBILITY_MATCHER.find(low, lowered=True))
+        matched_topics = {FEASIBILITY_TOPICS[kw] for kw in matched_keywords}
 
         # Also check for explicit numeric durations or budget mentions
         if re.search(r'\b(\d+[\d,]*\.?\d*)\s*(years?|months?|weeks?|days?|lakh|lakhs|rs\b|inr)\b', low):
@@ -281,17 +269,9 @@ def extract_feasibility_lines(full_text: str, max_results: int = 25) -> List[Dic
             matched_keywords.append('amount')
 
         if matched_topics:
-            # approximate line number
-            line_number = None
-            try:
-                pos = full_text.find(txt)
-                if pos >= 0:
-                    line_number = full_text[:pos].count('\n') + 1
-            except Exception:
-                line_number = None
-
             results.append({
-                'line_number': line_number,
+                'line_number': sent.line,
+                'page': sent.page,
                 'text': txt[:400].strip(),
                 'matched_topics': sorted(list(matched_topics)),
                 'matched_keywords': sorted(list(set(matched_keywords))),
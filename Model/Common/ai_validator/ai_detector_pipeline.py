@@ -1,5 +1,6 @@
 import os
 import re
+import asyncio
 import json
 import math
 import hashlib
@@ -15,12 +16,16 @@ import chardet
 import docx
 import google.generativeai as genai
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import joblib
 import traceback
 
+from Common.document_model import Document, get_document, load_document
+from Common.llm_client import llm
+
 # --- Optional detector libs (not required) ---
 try:
     import importlib
@@ -244,8 +249,7 @@ Respond with ONLY a JSON object:
 }}"""
 
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(prompt)
+        response = llm.generate_sync(prompt, model=MODEL_NAME, route="ai-detector")
         response_text = response.text.strip()
         
         # Clean and parse JSON
@@ -362,8 +366,7 @@ Respond with ONLY a JSON object:
 }}"""
 
         try:
-            model = genai.GenerativeModel(MODEL_NAME)
-            response = model.generate_content(planning_prompt)
+            response = llm.generate_sync(planning_prompt, model=MODEL_NAME, route="ai-detector")
             response_text = response.text.strip()
             
             if response_text.startswith('```json'):
@@ -805,7 +808,7 @@ async def detect_ai_only(file: UploadFile = File(...)):
         agent = AIDetectionAgent(agent_state)
         
         # 5) Run the agent analysis loop
-        final_report = agent.run_analysis()
+        final_report = await run_in_threadpool(agent.run_analysis)
         
         # 6) Store file in raw bucket
         uploaded_name = filename_raw
@@ -962,12 +965,7 @@ def safe_json_parse(text: str) -> Optional[Dict[str, Any]]:
 def text_from_pdf_bytes(b: bytes) -> str:
     try:
         reader = PyPDF2.PdfReader(BytesIO(b))
-        out = []
-        for p in reader.pages:
-            t = p.extract_text()
-            if t:
-                out.append(t)
-        return "\n\n".join(out).strip()
+        return load_document([p.extract_text() for p in reader.pages], sep="\n\n", strip=True).text
     except Exception:
         enc = chardet.detect(b).get("encoding") or "utf-8"
         try:
@@ -998,46 +996,11 @@ def extract_text(filename: str, data: bytes) -> str:
 
 # -------------------- Segmentation --------------------
 def segment_text_by_paragraphs(text: str, min_chars: int = 300) -> List[str]:
-    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    if not paras:
-        paras = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    segments = []
-    cur = ""
-    for p in paras:
-        if not cur:
-            cur = p
-        elif len(cur) + len(p) + 2 <= min_chars:
-            cur += "\n\n" + p
-        else:
-            if len(cur) < min_chars:
-                cur += "\n\n" + p
-            else:
-                segments.append(cur)
-                cur = p
-    if cur:
-        segments.append(cur)
-    out = []
-    for s in segments:
-        if len(s) <= 1200:
-            out.append(s)
-        else:
-            sents = re.split(r'(?<=[.!?])\s+', s)
-            chunk = ""
-            for sent in sents:
-                if not chunk:
-                    chunk = sent
-                elif len(chunk) + len(sent) < 900:
-                    chunk += " " + sent
-                else:
-                    out.append(chunk.strip())
-                    chunk = sent
-            if chunk:
-                out.append(chunk.strip())
-    return out
+    return [seg.text for seg in get_document(text).segments(min_chars=min_chars, max_chars=1200)]
 
 def split_sentences(segment: str) -> List[str]:
-    sents = re.split(r'(?<=[.!?])\s+', segment.strip())
-    sents = [s.strip() for s in sents if s.strip()]
+    # standalone segments only; the upload endpoint passes sentences from the shared document
+    sents = [s.text for s in Document(segment.strip()).sentences]
     return sents if sents else [segment.strip()]
 
 # -------------------- Local detector (worker-safe) --------------------
@@ -1082,7 +1045,7 @@ def _perplexity_score_gpt2_local(text: str, cache: Dict) -> float:
     except Exception:
         return 0.0
 
-def detect_segment_and_sentences_local(segment: str, cache: Dict) -> Dict[str, Any]:
+def detect_segment_and_sentences_local(segment: str, cache: Dict, sentences: Optional[List[str]] = None) -> Dict[str, Any]:
     # compute a segment-level score
     seg_score = 0.0
     if TYPETRUTH_AVAILABLE:
@@ -1103,7 +1066,7 @@ def detect_segment_and_sentences_local(segment: str, cache: Dict) -> Dict[str, A
             seg_score = round(min(0.99, heur * (len(segment) / 1000)), 6)
 
     # sentence-level scores
-    sentences = split_sentences(segment)
+    sentences = sentences or split_sentences(segment)
     sentence_scores = []
     for s in sentences:
         s_score = 0.0
@@ -1160,13 +1123,15 @@ def detect_segment_and_sentences_local(segment: str, cache: Dict) -> Dict[str, A
     return {"segment_ai_prob": float(round(seg_score, 6)), "sentences": sentence_scores}
 
 # -------------------- Worker wrapper (picklable) --------------------
-def worker_detect(args: Tuple[int, str]):
-    idx, segment = args
+def worker_detect(args: Tuple):
+    # (idx, segment) or (idx, segment, sentences) when the caller already split it
+    idx, segment = args[0], args[1]
+    sentences = args[2] if len(args) > 2 else None
     # per-process cache stored as function attribute
     if not hasattr(worker_detect, "_cache"):
         worker_detect._cache = {}
     cache = worker_detect._cache
-    res = detect_segment_and_sentences_local(segment, cache)
+    res = detect_segment_and_sentences_local(segment, cache, sentences)
     return {
         "segment_index": int(idx),
         "segment_text": segment,
@@ -1213,11 +1178,10 @@ Past previews:
 """
     return prompt
 
-def call_gemini_validate_sentence(sentence: str, ai_prob: float, past_reports_sample: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def call_gemini_validate_sentence(sentence: str, ai_prob: float, past_reports_sample: List[Dict[str, Any]]) -> Dict[str, Any]:
     try:
         prompt = build_gemini_sentence_validation_prompt(sentence, ai_prob, past_reports_sample)
-        model = genai.GenerativeModel(MODEL_NAME)
-        resp = model.generate_content(prompt)
+        resp = await llm.generate(prompt, model=MODEL_NAME, route="ai-detector")
         raw = resp.text or ""
         parsed = safe_json_parse(raw)
         if isinstance(parsed, dict):
@@ -1516,15 +1480,27 @@ async def detect_ai_and_validate(file: UploadFile = File(...)):
             return JSONResponse({"error": "Could not extract usable text from file"}, status_code=400)
 
         # 3) segmentation
-        segments = segment_text_by_paragraphs(text, min_chars=300)
+        doc = get_document(text)
+        spans = doc.segments(min_chars=300, max_chars=1200)
+        segments = [seg.text for seg in spans]
+        # sentences come from the same segmentation, so workers don't re-split
+        seg_sentences = [doc.sentences_in(seg.start, seg.end) for seg in spans]
         if not segments:
             segments = [text]
 
         # 4) run detector workers in multiprocessing pool
-        args = [(i, segments[i]) for i in range(len(segments))]
+        if spans:
+            args = [(i, segments[i], [s.text for s in seg_sentences[i]]) for i in range(len(segments))]
+        else:
+            args = [(i, segments[i]) for i in range(len(segments))]
         workers = min(WORKER_COUNT, max(1, len(args)))
         with Pool(processes=workers) as pool:
             detector_results = pool.map(worker_detect, args)
+        # page/line of each segment and sentence in the uploaded file
+        for seg, span, sents in zip(detector_results, spans, seg_sentences):
+            seg.update(span.location())
+            for s, sent in zip(seg["sentences"], sents):
+                s.update(sent.location())
 
         # 5) assemble suspicious sentences list for Gemini validation
         suspicious = []
@@ -1540,10 +1516,12 @@ async def detect_ai_and_validate(file: UploadFile = File(...)):
         except Exception:
             past_reports = []
 
-        # 7) validate suspicious sentences with Gemini (main process)
-        validations = {}
-        for seg_idx, sent_idx, sent_text, s_prob in suspicious:
-            validations[(seg_idx, sent_idx)] = call_gemini_validate_sentence(sent_text, s_prob, past_reports)
+        # 7) validate suspicious sentences with Gemini (concurrently, within the route's limit)
+        checked = await asyncio.gather(*[
+            call_gemini_validate_sentence(sent_text, s_prob, past_reports)
+            for _, _, sent_text, s_prob in suspicious
+        ])
+        validations = {(seg_idx, sent_idx): v for (seg_idx, sent_idx, _, _), v in zip(suspicious, checked)}
 
         # 8) attach gemini validations back to results; auto-decide for others
         for seg in detector_results:
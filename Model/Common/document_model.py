@@ -0,0 +1,307 @@
+"""
+Document Model
+
+One segmentation of an uploaded proposal, shared by every analyzer. A
+`Document` holds the text, a lowercase view with the same offsets, and
+paragraph / sentence / line spans computed once (lazily) with character
+offsets, so any result can be mapped back to its page and line with a
+bisect instead of searching the text again.
+
+Extractors build documents with `load_document(pages)`, which keeps the
+page boundaries; analyzers that only receive the extracted string call
+`get_document(text)` and get the same (cached) document back, so a file
+sent to several checkers is segmented once.
+
+Splitting rules are the ones the analyzers used before:
+    paragraphs  text between blank lines (`\\n\\s*\\n`)
+    sentences   text between `(?<=[.!?])\\s+` breaks
+    lines       non-empty lines (same separators as `str.splitlines`)
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bump when the splitting rules change, so persisted segmentations are rebuilt
+SEGMENTER_VERSION = 1
+
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "16"))
+
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+_LINE_RE = re.compile(r'[^\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]+')
+
+
+class Span:
+    """A range of a document; `text` defaults to the slice it covers."""
+
+    __slots__ = ("doc", "start", "end", "_text")
+
+    def __init__(self, doc: "Document", start: int, end: int, text: Optional[str] = None):
+        self.doc = doc
+        self.start = start
+        self.end = end
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        return self.doc.text[self.start:self.end] if self._text is None else self._text
+
+    @property
+    def lower(self) -> str:
+        return self.doc.lower[self.start:self.end] if self._text is None else self._text.lower()
+
+    @property
+    def line(self) -> int:
+        return self.doc.line_of(self.start)
+
+    @property
+    def page(self) -> Optional[int]:
+        return self.doc.page_of(self.start)
+
+    def location(self) -> Dict[str, Optional[int]]:
+        return {"page": self.page, "line": self.line}
+
+    def __len__(self) -> int:
+        return len(self.text) if self._text is not None else self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"Span({self.start}, {self.end}, {self.text[:40]!r})"
+
+
+def _lowercase(text: str) -> str:
+    low = text.lower()
+    if len(low) == len(text):
+        return low
+    # A few characters (e.g. 'İ') lower to two; keep those as-is so offsets line up
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _strip(text: str, start: int, end: int) -> Tuple[int, int]:
+    segment = text[start:end]
+    stripped = segment.strip()
+    if not stripped:
+        return start, start
+    start += len(segment) - len(segment.lstrip())
+    return start, start + len(stripped)
+
+
+class Document:
+    def __init__(self, text: str, page_starts: Optional[List[int]] = None, page_numbers: Optional[List[int]] = None):
+        """
+        `page_starts` are the offsets where each page's text begins and
+        `page_numbers` their 1-based page numbers (pages without text are
+        skipped by some extractors, so the two can differ).
+        """
+        self.text = text or ""
+        self.page_starts = page_starts
+        self.page_numbers = page_numbers or (list(range(1, len(page_starts) + 1)) if page_starts else None)
+        self._segments: Dict[tuple, List[Span]] = {}
+
+    @classmethod
+    def from_pages(
+        cls,
+        pages: Iterable[Optional[str]],
+        sep: str = "\n",
+        page_end: str = "",
+        skip_empty: bool = True,
+        strip: bool = False,
+    ) -> "Document":
+        """
+        Join page texts the way an extractor does (`sep` between pages,
+        `page_end` after each one) and remember where each page starts.
+        """
+        parts, starts, numbers, pos = [], [], [], 0
+        for number, page in enumerate(pages, start=1):
+            page = page or ""
+            if skip_empty and not page:
+                continue
+            if parts:
+                parts.append(sep)
+                pos += len(sep)
+            starts.append(pos)
+            numbers.append(number)
+            parts.append(page + page_end)
+            pos += len(page) + len(page_end)
+        text = "".join(parts)
+        if strip:
+            lead = len(text) - len(text.lstrip())
+            text = text.strip()
+            starts = [max(0, s - lead) for s in starts]
+        return cls(text, starts, numbers)
+
+    # -------------------- views --------------------
+
+    @cached_property
+    def lower(self) -> str:
+        return _lowercase(self.text)
+
+    @cached_property
+    def _newlines(self) -> List[int]:
+        return [m.start() for m in re.finditer("\n", self.text)]
+
+    @cached_property
+    def _sentence_breaks(self) -> List[Tuple[int, int]]:
+        return [m.span() for m in _SENTENCE_BREAK_RE.finditer(self.text)]
+
+    def _pieces(self, breaks: List[Tuple[int, int]], start: int, end: int) -> List[Span]:
+        """Stripped, non-empty spans of [start, end) between `breaks`."""
+        spans, pos = [], start
+        for b_start, b_end in breaks:
+            spans.append(_strip(self.text, pos, b_start))
+            pos = b_end
+        spans.append(_strip(self.text, pos, end))
+        return [Span(self, s, e) for s, e in spans if e > s]
+
+    @cached_property
+    def paragraphs(self) -> List[Span]:
+        breaks = [m.span() for m in _PARAGRAPH_BREAK_RE.finditer(self.text)]
+        return self._pieces(breaks, 0, len(self.text))
+
+    @cached_property
+    def sentences(self) -> List[Span]:
+        return self._pieces(self._sentence_breaks, 0, len(self.text))
+
+    @cached_property
+    def lines(self) -> List[Span]:
+        """Lines with any non-whitespace, unstripped."""
+        return [Span(self, m.start(), m.end()) for m in _LINE_RE.finditer(self.text) if m.group().strip()]
+
+    @cached_property
+    def sentences_or_lines(self) -> List[Span]:
+        """Sentences, or stripped lines when the text has no sentence breaks at all."""
+        if self._sentence_breaks:
+            return self.sentences
+        return [Span(self, *_strip(self.text, line.start, line.end)) for line in self.lines]
+
+    @cached_property
+    def paragraph_sentences(self) -> List[Span]:
+        """Sentences that also end at paragraph breaks (for headings and lists without full stops)."""
+        breaks = sorted(self._sentence_breaks + [m.span() for m in _PARAGRAPH_BREAK_RE.finditer(self.text)])
+        merged: List[Tuple[int, int]] = []
+        for b_start, b_end in breaks:
+            if merged and b_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], b_end))
+            else:
+                merged.append((b_start, b_end))
+        return self._pieces(merged, 0, len(self.text))
+
+    def sentences_in(self, start: int, end: int) -> List[Span]:
+        """Sentences of the range [start, end), cut at its ends."""
+        breaks = self._sentence_breaks
+        lo = bisect_right(breaks, (start, len(self.text) + 1))
+        hi = bisect_left(breaks, (end, -1))
+        inside = [(s, e) for s, e in breaks[lo:hi] if s > start and e < end]
+        return self._pieces(inside, start, end)
+
+    # -------------------- positions --------------------
+
+    def line_of(self, pos: int) -> int:
+        """1-based line number of a character offset."""
+        return bisect_left(self._newlines, pos) + 1
+
+    def page_of(self, pos: int) -> Optional[int]:
+        """1-based page number of a character offset (None if pages are unknown)."""
+        if not self.page_starts:
+            return None
+        return self.page_numbers[max(0, bisect_right(self.page_starts, pos) - 1)]
+
+    # -------------------- analyzer units --------------------
+
+    def segments(self, min_chars: int = 300, max_chars: int = 1000, chunk_chars: int = 900) -> List[Span]:
+        """
+        Paragraphs packed into segments of at least `min_chars`; segments over
+        `max_chars` are re-cut into sentence chunks under `chunk_chars`.
+        Segment text joins paragraphs with a blank line and sentences with a space.
+        """
+        key = (min_chars, max_chars, chunk_chars)
+        if key in self._segments:
+            return self._segments[key]
+
+        groups, cur, cur_len = [], [], 0
+        for p in self.paragraphs:
+            if not cur:
+                cur, cur_len = [p], len(p)
+            elif cur_len + len(p) + 2 <= min_chars or cur_len < min_chars:
+                cur.append(p)
+                cur_len += len(p) + 2
+            else:
+                groups.append(cur)
+                cur, cur_len = [p], len(p)
+        if cur:
+            groups.append(cur)
+
+        out = []
+        for group in groups:
+            start, end = group[0].start, group[-1].end
+            text = "\n\n".join(p.text for p in group)
+            if len(text) <= max_chars:
+                out.append(Span(self, start, end, text))
+                continue
+            chunk: List[Span] = []
+            chunk_len = 0
+            for sent in self.sentences_in(start, end):
+                if len(group) > 1:
+                    # a sentence running over a paragraph break reads as in the joined segment text
+                    sent = Span(self, sent.start, sent.end, "\n\n".join(
+                        self.text[max(p.start, sent.start):min(p.end, sent.end)]
+                        for p in group if p.start < sent.end and p.end > sent.start))
+                if chunk and chunk_len + len(sent) >= chunk_chars:
+                    out.append(Span(self, chunk[0].start, chunk[-1].end, " ".join(s.text for s in chunk)))
+                    chunk, chunk_len = [], 0
+                chunk_len += len(sent) + (1 if chunk else 0)
+                chunk.append(sent)
+            if chunk:
+                out.append(Span(self, chunk[0].start, chunk[-1].end, " ".join(s.text for s in chunk)))
+        self._segments[key] = out
+        return out
+
+    def line_chunks(self, size: int) -> List[Span]:
+        """Consecutive groups of `size` non-empty lines."""
+        lines = self.lines
+        return [
+            Span(self, lines[i].start, lines[min(i + size, len(lines)) - 1].end,
+                 "\n".join(line.text for line in lines[i:i + size]))
+            for i in range(0, len(lines), size)
+        ]
+
+
+# -------------------- per-upload cache --------------------
+
+_documents: "OrderedDict[str, Document]" = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def _remember(doc: Document) -> Document:
+    with _documents_lock:
+        _documents[doc.text] = doc
+        _documents.move_to_end(doc.text)
+        while len(_documents) > DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+    return doc
+
+
+def load_document(pages: Iterable[Optional[str]], **join) -> Document:
+    """
+    Document for extracted page texts (see `Document.from_pages`), cached for later analyzers.
+
+    Extractors return `load_document(...).text`; the page boundaries stay with
+    the cached document, so the segments, sentences and lines an analyzer later
+    gets from `get_document(text)` report their page and line.
+    """
+    return _remember(Document.from_pages(pages, **join))
+
+
+def get_document(text: str) -> Document:
+    """The cached document for `text` (page-aware if an extractor loaded it), else a new one."""
+    text = text or ""
+    with _documents_lock:
+        doc = _documents.get(text)
+        if doc is not None:
+            _documents.move_to_end(text)
+            return doc
+    return _remember(Document(text))
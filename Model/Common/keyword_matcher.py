@@ -0,0 +1,53 @@
+"""
+Keyword Matcher
+
+Shared multi-keyword scanning for the feasibility, benefit and deliverable
+checkers. All keywords are compiled into one Aho-Corasick automaton, so a
+text is scanned once no matter how many keywords there are. Matching is
+case-insensitive substring matching (the same as `kw in text.lower()`).
+
+The automaton comes from pyahocorasick; without it, keywords are checked
+one by one with `in` (the old behaviour, still correct, just not one pass).
+Sentence/line positions come from `Common.document_model`.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(dict.fromkeys(kw.lower() for kw in keywords if kw))
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for kw in self.keywords:
+                self._automaton.add_word(kw, kw)
+            if self.keywords:
+                self._automaton.make_automaton()
+        else:
+            self._automaton = None
+
+    def find(self, text: str, lowered: bool = False) -> Set[str]:
+        """Keywords occurring anywhere in `text` (pass `lowered=True` for an already-lowercased view)."""
+        if not self.keywords or not text:
+            return set()
+        low = text if lowered else text.lower()
+        if self._automaton is None:
+            return {kw for kw in self.keywords if kw in low}
+        # one pass; the automaton yields (end offset, keyword) for every occurrence
+        return {kw for _, kw in self._automaton.iter(low)}
+
+
+@lru_cache(maxsize=64)
+def _matcher_for(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def matcher_for(keywords: Iterable[str]) -> KeywordMatcher:
+    """Compiled matcher for an ad-hoc keyword list (cached per list)."""
+    return _matcher_for(tuple(keywords))
@@ -0,0 +1,435 @@
+"""
+LLM Client
+
+One Gemini client shared by every route. Calls go through `llm`, which
+
+  - reuses one GenerativeModel per (model, settings) instead of building
+    one per call (see `Common.prompt_cache.get_model`)
+  - bounds the calls in flight: LLM_MAX_CONCURRENCY overall, and
+    LLM_ROUTE_CONCURRENCY per route (override with `set_route_limit`)
+  - gives every call its own timeout (LLM_TIMEOUT, or `timeout=`) and
+    retries 429 / 5xx responses with exponential backoff and jitter
+  - parses JSON answers (`json_output=True` -> `result.data`)
+  - records latency, retries and token usage per route (`llm_metrics()`)
+
+Prompts are plain strings or `AssembledPrompt`s; the latter keep their
+static prefix served from Gemini's cache.
+
+Async code awaits `llm.generate(...)` / iterates `llm.stream(...)`.
+Synchronous code (worker threads, multiprocessing pools) calls
+`llm.generate_sync(...)`, which has its own limits in each process and
+relies on the request deadline for its timeout.
+
+With LLM_BACKEND=stub, or `llm.set_backend(StubBackend(...))`, no request
+leaves the process: answers come from the stub, for offline tests.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    _RETRYABLE = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.GatewayTimeout,
+    )
+    _DEADLINE = (google_exceptions.DeadlineExceeded,)
+except Exception:
+    _RETRYABLE = ()
+    _DEADLINE = ()
+
+from Common.prompt_cache import AssembledPrompt, generate, generate_async, get_model, usage_report
+from Common.tokens import estimate_tokens
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gemini-2.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_ROUTE_CONCURRENCY = int(os.getenv("LLM_ROUTE_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_STUB_RESPONSE = os.getenv("LLM_STUB_RESPONSE", "{}")
+
+PromptLike = Union[AssembledPrompt, str]
+
+
+class LLMTimeout(TimeoutError):
+    """A call did not finish within its timeout."""
+
+
+def is_retryable(e: Exception) -> bool:
+    """Rate limits (429) and server errors (5xx)."""
+    if isinstance(e, _RETRYABLE):
+        return True
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) failed attempt."""
+    delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay * (0.5 + random.random() / 2)
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+
+def parse_json_output(text: Optional[str]) -> Any:
+    """The JSON object/array in a model answer (fenced or surrounded by prose), or None."""
+    if not text:
+        return None
+    text = text.strip()
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # outermost object or array; the longer one if both parse (prose may cite "[1]")
+    best = None
+    for o, c in (("{", "}"), ("[", "]")):
+        start, end = text.find(o), text.rfind(c)
+        if start == -1 or end <= start:
+            continue
+        try:
+            value = json.loads(text[start:end + 1])
+        except ValueError:
+            continue
+        if best is None or end - start > best[0]:
+            best = (end - start, value)
+    return best[1] if best else None
+
+
+def prompt_text(prompt: PromptLike) -> str:
+    return prompt.text if isinstance(prompt, AssembledPrompt) else prompt
+
+
+@dataclass
+class LLMResult:
+    text: str
+    response: Any
+    model: str
+    route: str
+    latency: float
+    queued: float
+    attempts: int
+    usage: Dict[str, int]
+    data: Any = None
+
+
+# ================================================================
+# ------------------ BACKENDS -------------------------------------
+# ================================================================
+
+class GeminiBackend:
+    name = "gemini"
+
+    def generate(self, model: str, prompt: PromptLike, model_kwargs: dict, timeout: float, **kwargs):
+        return generate(model, prompt, model_kwargs, request_options={"timeout": timeout}, **kwargs)
+
+    async def generate_async(self, model: str, prompt: PromptLike, model_kwargs: dict, timeout: float, **kwargs):
+        return await generate_async(model, prompt, model_kwargs, request_options={"timeout": timeout}, **kwargs)
+
+    async def stream(self, model: str, prompt: PromptLike, model_kwargs: dict, timeout: float, **kwargs):
+        response = await get_model(model, **model_kwargs).generate_content_async(
+            prompt_text(prompt), stream=True, request_options={"timeout": timeout}, **kwargs)
+        async for chunk in response:
+            yield chunk
+
+
+class StubBackend:
+    """
+    Local stand-in for Gemini: `respond(prompt_text)` returns the answer
+    (default LLM_STUB_RESPONSE). Every prompt is kept in `calls`.
+    """
+
+    name = "stub"
+
+    def __init__(self, respond: Optional[Callable[[str], str]] = None, delay: float = 0.0):
+        self.respond = respond or (lambda _prompt: LLM_STUB_RESPONSE)
+        self.delay = delay
+        self.calls: List[str] = []
+
+    def _response(self, prompt: PromptLike):
+        text = prompt_text(prompt)
+        self.calls.append(text)
+        answer = self.respond(text)
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(text), cached_content_token_count=0,
+                                candidates_token_count=estimate_tokens(answer))
+        return SimpleNamespace(text=answer, usage_metadata=usage)
+
+    def generate(self, model, prompt, model_kwargs, timeout, **kwargs):
+        time.sleep(self.delay)
+        return self._response(prompt)
+
+    async def generate_async(self, model, prompt, model_kwargs, timeout, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._response(prompt)
+
+    async def stream(self, model, prompt, model_kwargs, timeout, **kwargs):
+        response = await self.generate_async(model, prompt, model_kwargs, timeout)
+        for word in re.findall(r"\S+\s*", response.text):
+            yield SimpleNamespace(text=word, usage_metadata=response.usage_metadata)
+
+
+# ================================================================
+# ------------------ CLIENT ---------------------------------------
+# ================================================================
+
+@dataclass
+class _RouteMetrics:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    retries: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    queued_total: float = 0.0
+    tokens: Dict[str, int] = field(default_factory=lambda: {"prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+
+
+class LLMClient:
+    def __init__(
+        self,
+        backend=None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        route_concurrency: int = LLM_ROUTE_CONCURRENCY,
+    ):
+        self.backend = backend or (StubBackend() if LLM_BACKEND == "stub" else GeminiBackend())
+        self.max_concurrency = max_concurrency
+        self.route_concurrency = route_concurrency
+        self.route_limits: Dict[str, int] = {}
+        # asyncio semaphores belong to one event loop; keep a set per loop
+        self._async_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._sync_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _RouteMetrics] = {}
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def set_route_limit(self, route: str, limit: int):
+        """At most `limit` calls of `route` in flight (applies to calls not yet waiting)."""
+        with self._lock:
+            self.route_limits[route] = limit
+            self._sync_limits.pop(route, None)
+            for limits in self._async_limits.values():
+                limits.pop(route, None)
+
+    def _limit(self, key: str) -> int:
+        if key == "*":
+            return self.max_concurrency
+        return self.route_limits.get(key, self.route_concurrency)
+
+    @asynccontextmanager
+    async def _async_slot(self, route: str):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            limits = self._async_limits.setdefault(loop, {})
+            route_sem = limits.setdefault(route, asyncio.Semaphore(self._limit(route)))
+            global_sem = limits.setdefault("*", asyncio.Semaphore(self._limit("*")))
+        # route first, so a busy route does not hold global slots while it queues
+        async with route_sem, global_sem:
+            yield
+
+    @contextmanager
+    def _sync_slot(self, route: str):
+        with self._lock:
+            route_sem = self._sync_limits.setdefault(route, threading.BoundedSemaphore(self._limit(route)))
+            global_sem = self._sync_limits.setdefault("*", threading.BoundedSemaphore(self._limit("*")))
+        with route_sem, global_sem:
+            yield
+
+    # -------------------- metrics --------------------
+
+    def _route_metrics(self, route: str) -> _RouteMetrics:
+        with self._lock:
+            return self._metrics.setdefault(route, _RouteMetrics())
+
+    def _finish(self, route, model, response, started, queued, attempts, json_output) -> LLMResult:
+        latency = time.monotonic() - started - queued
+        usage = usage_report(response)
+        m = self._route_metrics(route)
+        with self._lock:
+            m.calls += 1
+            m.retries += attempts - 1
+            m.latency_total += latency
+            m.latency_max = max(m.latency_max, latency)
+            m.queued_total += queued
+            for k in m.tokens:
+                m.tokens[k] += usage[k]
+        print(f"⏱️ [{route}] {model} {latency:.2f}s (queued {queued:.2f}s, {attempts} attempt(s)), "
+              f"{usage['prompt_tokens']} in / {usage['output_tokens']} out tokens")
+        text = getattr(response, "text", "") or ""
+        return LLMResult(text, response, model, route, latency, queued, attempts, usage,
+                         parse_json_output(text) if json_output else None)
+
+    def _failed(self, route: str, attempts: int, error: Exception, timed_out: bool = False):
+        m = self._route_metrics(route)
+        with self._lock:
+            m.errors += 1
+            m.timeouts += int(timed_out)
+            m.retries += attempts - 1
+        print(f"❌ [{route}] LLM call failed after {attempts} attempt(s): {type(error).__name__}: {error}")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                route: {
+                    "calls": m.calls,
+                    "errors": m.errors,
+                    "timeouts": m.timeouts,
+                    "retries": m.retries,
+                    "avg_latency": round(m.latency_total / m.calls, 3) if m.calls else 0.0,
+                    "max_latency": round(m.latency_max, 3),
+                    "avg_queued": round(m.queued_total / m.calls, 3) if m.calls else 0.0,
+                    **m.tokens,
+                }
+                for route, m in self._metrics.items()
+            }
+
+    # -------------------- calls --------------------
+
+    @staticmethod
+    def _request_kwargs(json_output: bool, kwargs: dict) -> dict:
+        if json_output and "generation_config" not in kwargs:
+            kwargs["generation_config"] = {"response_mime_type": "application/json"}
+        return kwargs
+
+    async def generate(
+        self,
+        prompt: PromptLike,
+        *,
+        model: str = LLM_DEFAULT_MODEL,
+        route: str = "default",
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        json_output: bool = False,
+        model_kwargs: Optional[dict] = None,
+        **kwargs,
+    ) -> LLMResult:
+        """One completion; raises LLMTimeout, or the last error once retries are used up."""
+        timeout = LLM_TIMEOUT if timeout is None else timeout
+        retries = LLM_MAX_RETRIES if retries is None else retries
+        kwargs = self._request_kwargs(json_output, kwargs)
+        started = time.monotonic()
+        async with self._async_slot(route):
+            queued = time.monotonic() - started
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    response = await asyncio.wait_for(
+                        self.backend.generate_async(model, prompt, model_kwargs or {}, timeout, **kwargs), timeout)
+                    break
+                except (asyncio.TimeoutError, *_DEADLINE) as e:
+                    self._failed(route, attempt, e, timed_out=True)
+                    raise LLMTimeout(f"{route}: no answer from {model} within {timeout:g}s") from e
+                except Exception as e:
+                    if attempt > retries or not is_retryable(e):
+                        self._failed(route, attempt, e)
+                        raise
+                    delay = backoff_delay(attempt)
+                    print(f"🔁 [{route}] {type(e).__name__}, retrying in {delay:.1f}s ({attempt}/{retries})")
+                    await asyncio.sleep(delay)
+        return self._finish(route, model, response, started, queued, attempt, json_output)
+
+    async def generate_json(self, prompt: PromptLike, **kwargs) -> LLMResult:
+        """`generate` with a JSON response; the parsed value is `result.data` (None if unparseable)."""
+        return await self.generate(prompt, json_output=True, **kwargs)
+
+    def generate_sync(
+        self,
+        prompt: PromptLike,
+        *,
+        model: str = LLM_DEFAULT_MODEL,
+        route: str = "default",
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        json_output: bool = False,
+        model_kwargs: Optional[dict] = None,
+        **kwargs,
+    ) -> LLMResult:
+        """Blocking `generate` for threads and worker processes (never call it on the event loop)."""
+        timeout = LLM_TIMEOUT if timeout is None else timeout
+        retries = LLM_MAX_RETRIES if retries is None else retries
+        kwargs = self._request_kwargs(json_output, kwargs)
+        started = time.monotonic()
+        with self._sync_slot(route):
+            queued = time.monotonic() - started
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    response = self.backend.generate(model, prompt, model_kwargs or {}, timeout, **kwargs)
+                    break
+                except _DEADLINE as e:
+                    self._failed(route, attempt, e, timed_out=True)
+                    raise LLMTimeout(f"{route}: no answer from {model} within {timeout:g}s") from e
+                except Exception as e:
+                    if attempt > retries or not is_retryable(e):
+                        self._failed(route, attempt, e)
+                        raise
+                    delay = backoff_delay(attempt)
+                    print(f"🔁 [{route}] {type(e).__name__}, retrying in {delay:.1f}s ({attempt}/{retries})")
+                    time.sleep(delay)
+        return self._finish(route, model, response, started, queued, attempt, json_output)
+
+    async def stream(
+        self,
+        prompt: PromptLike,
+        *,
+        model: str = LLM_DEFAULT_MODEL,
+        route: str = "default",
+        timeout: Optional[float] = None,
+        model_kwargs: Optional[dict] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """
+        Answer text as it is generated. The call holds its slots until the
+        stream ends or is closed; it is not retried (text may already be out).
+        """
+        timeout = LLM_TIMEOUT if timeout is None else timeout
+        started = time.monotonic()
+        async with self._async_slot(route):
+            queued = time.monotonic() - started
+            last = None
+            try:
+                async for chunk in self.backend.stream(model, prompt, model_kwargs or {}, timeout, **kwargs):
+                    last = chunk
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety/finish metadata)
+                        continue
+                    if text:
+                        yield text
+            except Exception as e:
+                self._failed(route, 1, e, timed_out=isinstance(e, _DEADLINE))
+                raise
+        # usage metadata of the last chunk covers the whole answer
+        self._finish(route, model, SimpleNamespace(text="", usage_metadata=getattr(last, "usage_metadata", None)),
+                     started, queued, 1, False)
+
+
+llm = LLMClient()
+
+
+def llm_metrics() -> Dict[str, Dict[str, Any]]:
+    return llm.metrics()
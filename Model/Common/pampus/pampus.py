@@ -5,6 +5,8 @@ from fastapi.responses import JSONResponse
 import pdfplumber
 import google.generativeai as genai
 
+from Common.llm_client import llm
+
 # -------------------- CONFIG -------------------- #
 
 GEMINI_API_KEY = os.getenv("PAMPERS_KEY")
@@ -66,7 +68,7 @@ def parse_form_sections(full_text: str):
 
 # -------------------- SEMANTIC SCAMPER ANALYSIS USING GEMINI -------------------- #
 
-def semantic_scamper_check(objectives: str, methodology: str):
+async def semantic_scamper_check(objectives: str, methodology: str):
     content = f"""
 Objectives:
 {objectives}
@@ -135,9 +137,7 @@ Proposal Content:
 {content}
 """
 
-    model = genai.GenerativeModel(GEMINI_MODEL)
-
-    response = model.generate_content(prompt)
+    response = await llm.generate(prompt, model=GEMINI_MODEL, route="scamper")
 
     return response.text   # Gemini returns raw text
 
@@ -157,6 +157,6 @@ async def analyze_scamper_semantic(file: UploadFile = File(...)):
     objectives, methodology, _ = parse_form_sections(full_text)
 
     # Semantic SCAMPER with Gemini
-    result_json = semantic_scamper_check(objectives, methodology)
+    result_json = await semantic_scamper_check(objectives, methodology)
 
     return JSONResponse(content={"scamper_semantic_result": result_json})
@@ -0,0 +1,284 @@
+"""
+Prompt Cache
+
+Prompts are assembled as a static prefix (instructions, rules, reference
+material that is the same on every call) followed by the dynamic part of
+the request. Keeping the prefix first and byte-identical lets Gemini's
+implicit prefix caching bill it at the cached rate.
+
+Prefixes long enough for explicit caching (PROMPT_CACHE_MIN_TOKENS) are
+also registered as Gemini cached content: the prefix is uploaded once per
+model and TTL, and calls send only the dynamic part. Cached contents are
+found again by display name, so every worker process reuses the same one.
+If caching is not available (old SDK, quota, prefix too short) the full
+prompt is sent as usual.
+
+Models are built once per (model, settings, cached content) and reused.
+Every call logs and records prompt tokens split into cached / uncached
+(from the response's usage metadata); `prompt_cache_stats()` has the totals.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Optional, Union
+
+try:
+    import google.generativeai as genai
+except Exception:
+    genai = None
+
+try:
+    from google.generativeai import caching
+except Exception:
+    caching = None
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    # The cached content was deleted/expired server-side: resend the prompt inline
+    _CACHE_GONE = (google_exceptions.NotFound, google_exceptions.PermissionDenied)
+except Exception:
+    _CACHE_GONE = ()
+
+from Common.tokens import estimate_tokens
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") == "1"
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+# Gemini rejects cached contents below a per-model minimum (1024 tokens for Flash)
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+# After a failed create, wait this long before trying that prefix again
+PROMPT_CACHE_RETRY_AFTER = int(os.getenv("PROMPT_CACHE_RETRY_AFTER", "600"))
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "32"))
+
+
+class StaticPrefix:
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self.tokens_estimate = estimate_tokens(text)
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.name}-{self.digest}"[:128]
+
+
+_prefixes: Dict[tuple, StaticPrefix] = {}
+
+
+def static_prefix(name: str, text: str) -> StaticPrefix:
+    """The registered prefix for `text` (one object per distinct text)."""
+    key = (name, text)
+    prefix = _prefixes.get(key)
+    if prefix is None:
+        prefix = _prefixes[key] = StaticPrefix(name, text)
+    return prefix
+
+
+@dataclass
+class AssembledPrompt:
+    prefix: StaticPrefix
+    dynamic: str
+
+    @property
+    def text(self) -> str:
+        return self.prefix.text + self.dynamic
+
+
+def assemble(prefix: StaticPrefix, dynamic: str) -> AssembledPrompt:
+    return AssembledPrompt(prefix, dynamic)
+
+
+# ================================================================
+# ------------------ EXPLICIT CACHED CONTENT ----------------------
+# ================================================================
+
+@dataclass
+class _CacheEntry:
+    content: Any = None
+    expires: float = 0.0
+    failed_until: float = 0.0
+    # held across the list/create network calls, so only callers of the same prefix wait
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_caches: Dict[tuple, _CacheEntry] = {}
+_caches_lock = threading.Lock()  # guards the dict only
+
+
+def _model_id(model_name: str) -> str:
+    return model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+
+def _expiry(content) -> float:
+    expire_time = getattr(content, "expire_time", None)
+    try:
+        return expire_time.timestamp()
+    except Exception:
+        return time.time() + PROMPT_CACHE_TTL
+
+
+def _find_existing(model_name: str, prefix: StaticPrefix):
+    """A live cached content for this prefix created by another process, if any."""
+    for content in caching.CachedContent.list():
+        if (getattr(content, "display_name", None) == prefix.display_name
+                and getattr(content, "model", None) == _model_id(model_name)
+                and _expiry(content) > time.time() + 60):
+            return content
+    return None
+
+
+def _cached_content(model_name: str, prefix: StaticPrefix):
+    if not PROMPT_CACHE_ENABLED or caching is None or prefix.tokens_estimate < PROMPT_CACHE_MIN_TOKENS:
+        return None
+    key = (model_name, prefix.digest)
+    with _caches_lock:
+        entry = _caches.setdefault(key, _CacheEntry())
+    with entry.lock:
+        now = time.time()
+        if entry.content is not None and entry.expires > now + 60:
+            return entry.content
+        if entry.failed_until > now:
+            return None
+        try:
+            content = _find_existing(model_name, prefix)
+            if content is None:
+                content = caching.CachedContent.create(
+                    model=_model_id(model_name),
+                    display_name=prefix.display_name,
+                    contents=[prefix.text],
+                    ttl=timedelta(seconds=PROMPT_CACHE_TTL),
+                )
+                print(f"🗄️ Cached prompt prefix '{prefix.name}' (~{prefix.tokens_estimate} tokens) for {model_name}")
+            entry.content, entry.expires = content, _expiry(content)
+            return content
+        except Exception as e:
+            print(f"⚠️ Prompt prefix '{prefix.name}' not cached, sending it inline: {e}")
+            entry.content, entry.failed_until = None, now + PROMPT_CACHE_RETRY_AFTER
+            return None
+
+
+def _drop_cached_content(model_name: str, prefix: StaticPrefix):
+    with _caches_lock:
+        _caches.pop((model_name, prefix.digest), None)
+
+
+# ================================================================
+# ------------------ MODEL REUSE ----------------------------------
+# ================================================================
+
+_models: "OrderedDict[tuple, Any]" = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def get_model(model_name: str, cached_content=None, **model_kwargs):
+    """The shared GenerativeModel for these settings (built once, not per call)."""
+    key = (model_name, getattr(cached_content, "name", None), repr(sorted(model_kwargs.items())))
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+        if cached_content is not None:
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content, **model_kwargs)
+        else:
+            model = genai.GenerativeModel(model_name, **model_kwargs)
+        _models[key] = model
+        # cached contents are replaced every TTL, drop models bound to old ones
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+        return model
+
+
+def _model_and_contents(model_name: str, prompt: Union[AssembledPrompt, str], **model_kwargs):
+    if isinstance(prompt, AssembledPrompt):
+        content = _cached_content(model_name, prompt.prefix)
+        if content is not None:
+            return get_model(model_name, content, **model_kwargs), prompt.dynamic, True
+        return get_model(model_name, **model_kwargs), prompt.text, False
+    return get_model(model_name, **model_kwargs), prompt, False
+
+
+# ================================================================
+# ------------------ USAGE ACCOUNTING -----------------------------
+# ================================================================
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def usage_report(response) -> Dict[str, int]:
+    """Prompt tokens split into cached / uncached, plus output tokens, from a Gemini response."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = int(getattr(usage, "prompt_token_count", 0) or 0)
+    cached_tokens = int(getattr(usage, "cached_content_token_count", 0) or 0)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "uncached_tokens": max(0, prompt_tokens - cached_tokens),
+        "output_tokens": int(getattr(usage, "candidates_token_count", 0) or 0),
+    }
+
+
+def _record(name: str, response, explicit: bool) -> Dict[str, int]:
+    report = usage_report(response)
+    with _stats_lock:
+        stats = _stats.setdefault(name, {"calls": 0, "explicit_cache_calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+        stats["calls"] += 1
+        stats["explicit_cache_calls"] += int(explicit)
+        for k in ("prompt_tokens", "cached_tokens", "output_tokens"):
+            stats[k] += report[k]
+    if report["prompt_tokens"]:
+        print(f"🧾 [{name}] prompt {report['prompt_tokens']} tokens "
+              f"({report['cached_tokens']} cached, {report['uncached_tokens']} uncached)")
+    return report
+
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {name: dict(s) for name, s in _stats.items()}
+
+
+# ================================================================
+# ------------------ GENERATION -----------------------------------
+# ================================================================
+
+def _name_of(prompt: Union[AssembledPrompt, str]) -> str:
+    return prompt.prefix.name if isinstance(prompt, AssembledPrompt) else "uncached"
+
+
+def generate(model_name: str, prompt: Union[AssembledPrompt, str], model_kwargs: Optional[dict] = None, **kwargs):
+    """`generate_content` with the prompt's static prefix served from cache when possible."""
+    model, contents, explicit = _model_and_contents(model_name, prompt, **(model_kwargs or {}))
+    try:
+        response = model.generate_content(contents, **kwargs)
+    except _CACHE_GONE:
+        if not explicit:
+            raise
+        # The cached content expired early or was deleted; retry inline once
+        _drop_cached_content(model_name, prompt.prefix)
+        model, contents, explicit = get_model(model_name, **(model_kwargs or {})), prompt.text, False
+        response = model.generate_content(contents, **kwargs)
+    _record(_name_of(prompt), response, explicit)
+    return response
+
+
+async def generate_async(model_name: str, prompt: Union[AssembledPrompt, str], model_kwargs: Optional[dict] = None, **kwargs):
+    """Async `generate_content_async` counterpart of `generate`."""
+    # creating the cached content is a blocking call, keep it off the event loop
+    model, contents, explicit = await asyncio.to_thread(_model_and_contents, model_name, prompt, **(model_kwargs or {}))
+    try:
+        response = await model.generate_content_async(contents, **kwargs)
+    except _CACHE_GONE:
+        if not explicit:
+            raise
+        _drop_cached_content(model_name, prompt.prefix)
+        model, contents, explicit = get_model(model_name, **(model_kwargs or {})), prompt.text, False
+        response = await model.generate_content_async(contents, **kwargs)
+    _record(_name_of(prompt), response, explicit)
+    return response
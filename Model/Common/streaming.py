@@ -0,0 +1,80 @@
+"""
+Streaming helpers for the BIRBAL chat endpoints.
+
+A streamed answer is a sequence of events:
+    sources  retrieved documents, sent before generation starts
+    token    a piece of the answer, in the order Gemini produced it
+    done     end of the answer (optionally with stats about the request)
+    error    generation failed part-way (the stream ends after it)
+
+With `format=sse` (default) each event is a Server-Sent Event
+(`event: <type>` / `data: <json>`); with `format=ndjson` each event is one
+JSON line `{"event": <type>, "data": ...}`. If the client disconnects the
+generator is cancelled, which also cancels the in-flight Gemini request.
+Answer tokens come from `llm.stream(...)` (Common.llm_client).
+"""
+
+import json
+from typing import Any, AsyncIterator, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_event(event: str, data: Any, fmt: str = "sse") -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    if fmt == "ndjson":
+        return f'{{"event": "{event}", "data": {payload}}}\n'
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def answer_events(
+    request: Request,
+    sources: Any,
+    tokens: AsyncIterator[str],
+    fmt: str = "sse",
+    done: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """Sources first, then answer tokens, then done (or error)."""
+    yield encode_event("sources", sources, fmt)
+    try:
+        async for text in tokens:
+            if await request.is_disconnected():
+                print("⚠️ Client disconnected, stopping generation")
+                break
+            yield encode_event("token", {"text": text}, fmt)
+        else:
+            yield encode_event("done", done or {}, fmt)
+    except Exception as e:
+        print(f"Error while streaming answer: {str(e)}")
+        yield encode_event("error", {"detail": str(e)}, fmt)
+    finally:
+        await tokens.aclose()
+
+
+async def static_tokens(texts: Iterable[str]) -> AsyncIterator[str]:
+    """Token stream for answers that do not come from the LLM (fallbacks)."""
+    for text in texts:
+        yield text
+
+
+def stream_answer(
+    request: Request,
+    sources: Any,
+    tokens: AsyncIterator[str],
+    fmt: str = "sse",
+    done: Optional[dict] = None,
+) -> StreamingResponse:
+    if fmt not in MEDIA_TYPES:
+        fmt = "sse"
+    return StreamingResponse(
+        answer_events(request, sources, tokens, fmt, done),
+        media_type=MEDIA_TYPES[fmt],
+        # Stop nginx/proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
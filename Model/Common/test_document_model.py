@@ -0,0 +1,174 @@
+"""
+Tests for the shared document segmentation (Common.document_model)
+
+Run with: python -m pytest Common/test_document_model.py
+"""
+
+import random
+import re
+import sys
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Common.document_model import Document, _lowercase
+
+SEEDS = range(300)
+
+
+def old_segment_text(text: str, min_chars: int = 300) -> List[str]:
+    """RAG/plag.py segment_text before the document model, kept as the reference."""
+    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    segs = []
+    cur = ""
+    for p in paras:
+        if not cur:
+            cur = p
+        elif len(cur) + len(p) + 2 <= min_chars:
+            cur += "\n\n" + p
+        else:
+            if len(cur) < min_chars:
+                cur += "\n\n" + p
+            else:
+                segs.append(cur)
+                cur = p
+    if cur:
+        segs.append(cur)
+    # split long segments by sentences
+    out = []
+    for s in segs:
+        if len(s) <= 1000:
+            out.append(s)
+        else:
+            sents = re.split(r'(?<=[.!?])\s+', s)
+            chunk = ""
+            for sent in sents:
+                if not chunk:
+                    chunk = sent
+                elif len(chunk) + len(sent) < 900:
+                    chunk += " " + sent
+                else:
+                    out.append(chunk.strip())
+                    chunk = sent
+            if chunk:
+                out.append(chunk.strip())
+    return out
+
+
+WORDS = "coal mine seam gas methane safety research drilling yield study".split()
+SPACES = [" ", " ", " ", "  ", "\t", "\xa0"]
+BREAKS = ["\n", "\n\n", "\n \n", "\n\n\n", "\r\n\r\n", " \n\t\n "]
+
+
+def random_text(rng: random.Random) -> str:
+    parts = [rng.choice(["", " ", "\n\n"])]
+    for _ in range(rng.randint(0, 120)):
+        parts.append(rng.choice(WORDS))
+        roll = rng.random()
+        if roll < 0.15:
+            parts.append(rng.choice(".!?") + rng.choice(SPACES))
+        elif roll < 0.22:
+            parts.append(rng.choice(["", "."]) + rng.choice(BREAKS))
+        else:
+            parts.append(rng.choice(SPACES))
+    if rng.random() < 0.3:
+        # one long paragraph, so the sentence re-cut path runs
+        parts.append("\n\n" + " ".join(f"{rng.choice(WORDS)} {rng.choice(WORDS)}." for _ in range(rng.randint(60, 200))))
+    return "".join(parts)
+
+
+def test_segments_match_old_segment_text():
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        text = random_text(rng)
+        min_chars = rng.choice([50, 120, 300])
+        got = [s.text for s in Document(text).segments(min_chars=min_chars)]
+        assert got == old_segment_text(text, min_chars), f"seed {seed}"
+
+
+def test_segment_spans_cover_their_text():
+    for seed in SEEDS:
+        text = random_text(random.Random(seed))
+        for seg in Document(text).segments(min_chars=120):
+            assert text[seg.start:seg.end].strip() == text[seg.start:seg.end]
+            # segment text only differs from its slice by whitespace
+            assert seg.text.split() == text[seg.start:seg.end].split()
+
+
+def test_sentences_in_matches_splitting_the_slice():
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        text = random_text(rng)
+        doc = Document(text)
+        for _ in range(5):
+            start = rng.randint(0, len(text))
+            end = rng.randint(start, len(text))
+            expected = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text[start:end]) if s.strip()]
+            assert [s.text for s in doc.sentences_in(start, end)] == expected, f"seed {seed} [{start}:{end}]"
+
+
+def test_sentences_in_whole_text_is_sentences():
+    doc = Document("First one. Second one!  Third?\nstill third")
+    assert [s.text for s in doc.sentences_in(0, len(doc.text))] == [s.text for s in doc.sentences]
+    assert [s.text for s in doc.sentences_in(4, 17)] == ["t one.", "Second"]
+
+
+def expected_pages(pages, sep, page_end):
+    """Page number of every character of the joined (unstripped) text."""
+    labels = []
+    for number, page in enumerate(pages, start=1):
+        if not page:
+            continue
+        if labels:
+            labels.extend([labels[-1]] * len(sep))
+        labels.extend([number] * len(page + page_end))
+    return labels
+
+
+def test_page_and_line_with_strip():
+    pages = ["  \n Title page\nsecond line", None, "Page three.\nMore", "", "\n last page  \n"]
+    doc = Document.from_pages(pages, sep="\n", strip=True)
+
+    assert doc.text.startswith("Title page")
+    assert doc.page_of(doc.text.index("Title")) == 1
+    assert doc.page_of(doc.text.index("Page three")) == 3
+    assert doc.page_of(doc.text.index("last page")) == 5
+    assert doc.line_of(doc.text.index("Title")) == 1
+    assert doc.line_of(doc.text.index("More")) == 4
+    assert doc.sentences[1].location() == {"page": 3, "line": 4}
+
+
+def test_page_and_line_random_pages():
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        pages = [rng.choice([None, "", "  \n", random_text(rng)[:rng.randint(0, 200)]]) for _ in range(rng.randint(1, 6))]
+        sep, page_end = rng.choice(["\n", "\n\n", " "]), rng.choice(["", "\n"])
+        doc = Document.from_pages(pages, sep=sep, page_end=page_end, strip=True)
+
+        joined = sep.join(p + page_end for p in pages if p)
+        lead = len(joined) - len(joined.lstrip())
+        labels = expected_pages(pages, sep, page_end)[lead:lead + len(doc.text)]
+        assert doc.text == joined.strip()
+        for pos in range(len(doc.text)):
+            assert doc.page_of(pos) == labels[pos], f"seed {seed} pos {pos}"
+            assert doc.line_of(pos) == doc.text.count("\n", 0, pos) + 1
+
+
+def test_lowercase_keeps_offsets():
+    text = "İSTANBUL Coal Study: Ölçüm ΑΣ and ẞ-Analysis İİ done."
+    low = _lowercase(text)
+    assert len(low) == len(text)
+    for word in ("Coal", "Study", "Analysis", "done"):
+        assert low.index(word.lower()) == text.index(word)
+
+    doc = Document(text)
+    for span in doc.sentences + doc.lines:
+        assert len(span.lower) == len(span.text)
+        assert span.lower == _lowercase(span.text)
+
+
+def test_lowercase_plain_text_is_str_lower():
+    text = "Mixed CASE text, Ünïcödé"
+    assert _lowercase(text) == text.lower()
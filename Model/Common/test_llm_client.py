@@ -0,0 +1,224 @@
+"""
+Tests for the shared LLM client (Common.llm_client), run against the stub backend
+
+Run with: python -m pytest Common/test_llm_client.py
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Common import llm_client
+from Common.llm_client import LLMClient, LLMTimeout, StubBackend, parse_json_output
+
+
+class HTTPError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FailingBackend(StubBackend):
+    """Raises HTTPError(code) for the first `failures` calls, then answers."""
+
+    def __init__(self, code: int, failures: int):
+        super().__init__(respond=lambda _prompt: '{"ok": true}')
+        self.code = code
+        self.failures = failures
+        self.attempts = 0
+
+    def _fail(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise HTTPError(self.code)
+
+    def generate(self, *args, **kwargs):
+        self._fail()
+        return super().generate(*args, **kwargs)
+
+    async def generate_async(self, *args, **kwargs):
+        self._fail()
+        return await super().generate_async(*args, **kwargs)
+
+
+class CountingBackend(StubBackend):
+    """Tracks the most calls in flight at once."""
+
+    def __init__(self, delay: float = 0.02):
+        super().__init__(delay=delay)
+        self.in_flight = 0
+        self.peak = 0
+        self._count_lock = threading.Lock()
+
+    def _enter(self):
+        with self._count_lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def _exit(self):
+        with self._count_lock:
+            self.in_flight -= 1
+
+    def generate(self, *args, **kwargs):
+        self._enter()
+        try:
+            return super().generate(*args, **kwargs)
+        finally:
+            self._exit()
+
+    async def generate_async(self, *args, **kwargs):
+        self._enter()
+        try:
+            return await super().generate_async(*args, **kwargs)
+        finally:
+            self._exit()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0.001)
+
+
+# ------------------------- JSON parsing -------------------------
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    ('Here is the result: {"a": {"b": [1, 2]}} Hope this helps.', {"a": {"b": [1, 2]}}),
+    ('Items:\n[{"a": 1}, {"b": 2}]\nDone.', [{"a": 1}, {"b": 2}]),
+    ('Note [1]: {"a": 1}', {"a": 1}),
+])
+def test_parse_json_output(text, expected):
+    assert parse_json_output(text) == expected
+
+
+@pytest.mark.parametrize("text", [None, "", "no json here", '{"a": 1', "```json\n{oops}\n```"])
+def test_parse_json_output_invalid(text):
+    assert parse_json_output(text) is None
+
+
+def test_generate_json_sets_data():
+    client = LLMClient(backend=StubBackend(respond=lambda _p: 'Sure!\n```json\n{"score": 7}\n```'))
+    result = asyncio.run(client.generate_json("p"))
+    assert result.data == {"score": 7}
+
+
+# ------------------------- retries -------------------------
+
+def test_retries_429_then_succeeds():
+    backend = FailingBackend(429, failures=2)
+    client = LLMClient(backend=backend)
+
+    result = asyncio.run(client.generate("p", route="r", retries=3))
+    assert backend.attempts == 3 and result.attempts == 3
+    assert client.metrics()["r"]["retries"] == 2
+
+
+def test_retries_429_sync():
+    backend = FailingBackend(429, failures=1)
+    result = LLMClient(backend=backend).generate_sync("p", retries=3)
+    assert backend.attempts == 2 and result.attempts == 2
+
+
+def test_gives_up_after_retries():
+    backend = FailingBackend(503, failures=10)
+    with pytest.raises(HTTPError):
+        asyncio.run(LLMClient(backend=backend).generate("p", retries=2))
+    assert backend.attempts == 3
+
+
+@pytest.mark.parametrize("sync", [False, True])
+def test_400_is_not_retried(sync):
+    backend = FailingBackend(400, failures=1)
+    client = LLMClient(backend=backend)
+    with pytest.raises(HTTPError):
+        if sync:
+            client.generate_sync("p", route="r", retries=3)
+        else:
+            asyncio.run(client.generate("p", route="r", retries=3))
+    assert backend.attempts == 1
+    assert client.metrics()["r"]["errors"] == 1
+
+
+# ------------------------- timeouts -------------------------
+
+def test_timeout_raises_llm_timeout_without_retry():
+    client = LLMClient(backend=StubBackend(delay=1.0))
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        asyncio.run(client.generate("p", route="slow", timeout=0.05, retries=3))
+    assert time.monotonic() - started < 0.5
+    assert client.metrics()["slow"]["timeouts"] == 1
+    assert isinstance(LLMTimeout("x"), TimeoutError)
+
+
+# ------------------------- concurrency -------------------------
+
+def test_route_limit_bounds_calls_in_flight():
+    backend = CountingBackend()
+    client = LLMClient(backend=backend, max_concurrency=16, route_concurrency=8)
+    client.set_route_limit("narrow", 2)
+
+    async def run():
+        await asyncio.gather(*[client.generate("p", route="narrow") for _ in range(10)])
+
+    asyncio.run(run())
+    assert backend.peak == 2
+
+
+def test_global_limit_applies_across_routes():
+    backend = CountingBackend()
+    client = LLMClient(backend=backend, max_concurrency=3, route_concurrency=10)
+
+    async def run():
+        await asyncio.gather(*[client.generate("p", route=f"r{i % 4}") for i in range(12)])
+
+    asyncio.run(run())
+    assert backend.peak == 3
+
+
+def test_route_limit_bounds_sync_calls():
+    backend = CountingBackend()
+    client = LLMClient(backend=backend)
+    client.set_route_limit("narrow", 2)
+
+    threads = [threading.Thread(target=client.generate_sync, args=("p",), kwargs={"route": "narrow"}) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.peak == 2
+
+
+# ------------------------- streaming -------------------------
+
+def test_stream_yields_answer():
+    client = LLMClient(backend=StubBackend(respond=lambda _p: "one two three"))
+
+    async def run():
+        return [text async for text in client.stream("p", route="s")]
+
+    assert "".join(asyncio.run(run())) == "one two three"
+    assert client.metrics()["s"]["calls"] == 1
+
+
+def test_stream_closed_early_releases_its_slot():
+    client = LLMClient(backend=StubBackend(respond=lambda _p: "a b c d e f"))
+    client.set_route_limit("s", 1)
+
+    async def run():
+        tokens = client.stream("p", route="s")
+        assert await tokens.__anext__() == "a "
+        await tokens.aclose()
+        # the only slot of the route is free again
+        return await asyncio.wait_for(client.generate("p", route="s"), 1.0)
+
+    assert asyncio.run(run()).text == "a b c d e f"
@@ -0,0 +1,19 @@
+"""
+Token estimates
+
+Cheap prompt-size estimates shared by the prompt builders, the prompt
+cache and the LLM client (no tokenizer round-trip); Gemini's own count is
+available afterwards from `response.usage_metadata`.
+"""
+
+import re
+
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for Latin text; Indic scripts tokenize much finer."""
+    if not text:
+        return 0
+    non_ascii = len(_NON_ASCII_RE.findall(text))
+    return int((len(text) - non_ascii) / 4 + non_ascii / 1.5) + 1
@@ -17,6 +17,9 @@ from fastapi.responses import JSONResponse
 from supabase import create_client, Client
 from io import BytesIO
 
+from Common.llm_client import llm
+from Common.prompt_cache import assemble, static_prefix
+
 router = APIRouter()
 
 # Environment variables
@@ -33,26 +36,10 @@ GEMINI_API_KEY = os.getenv("PROCESS_FILE_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 genai.configure(api_key=GEMINI_API_KEY)
 
-# Monkey patch to increase timeout globally
-import google.api_core.gapic_v1.method
-import functools
-
-original_wrap_method = google.api_core.gapic_v1.method.wrap_method
-
-def custom_wrap_method(func, default_retry=None, default_timeout=None, client_info=None):
-    # Override default timeout to 600 seconds (10 minutes)
-    custom_timeout = 600.0
-    return original_wrap_method(func, default_retry=default_retry, default_timeout=custom_timeout, client_info=client_info)
-
-google.api_core.gapic_v1.method.wrap_method = custom_wrap_method
-
-# Configure model with generation settings
-model = genai.GenerativeModel(
-    GEMINI_MODEL,
-    generation_config=genai.GenerationConfig(
-        temperature=0.7,
-    )
-)
+# Extracting a whole Form-I is one long answer, so this call gets a long
+# timeout of its own instead of raising the default for every request
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "600"))
+GENERATION_SETTINGS = {"generation_config": genai.GenerationConfig(temperature=0.7)}
 
 
 # ----------------------------------------------------
@@ -132,7 +119,7 @@ def store_output_cache(file_hash: str, output_data: dict) -> bool:
 # ----------------------------------------------------
 # JSON GENERATION
 # ----------------------------------------------------
-def generate_json(content):
+async def generate_json(content):
     prompt = """Extract the following details from the Form-I proposal content and return ONLY a valid JSON structure. For all long-text fields (definition_of_issue, objectives, justification_subject_area, project_benefits, work_plan, methodology, organization_of_work, time_schedule, foreign_exchange_details, fund_phasing, land_building_justification, equipment_justification, consumables_outlay_notes, cv_details, past_experience, other_details) return their value as a Slate.js nodes array (an array of objects where each object is a Slate block node, e.g. {"type":"paragraph","children":[{"text":"..."}]}).
 
 Values not present should be returned as empty strings or empty arrays.
@@ -1379,8 +1366,13 @@ Return ONLY this format rather then this dont need anything and the extraction n
 
 Populate the above structure with the extracted text. Return ONLY the valid JSON array.
 """
-    response = model.generate_content([prompt, content])
-    raw = response.text.strip()
+    # the instructions and template are the cacheable prefix, the document follows them
+    result = await llm.generate(
+        assemble(static_prefix("form1-extraction", prompt), content),
+        model=GEMINI_MODEL, route="extraction", timeout=EXTRACTION_TIMEOUT,
+        model_kwargs=GENERATION_SETTINGS,
+    )
+    raw = result.text.strip()
 
     # Match JSON array or object
     m = re.search(r"(\[.*\]|\{.*\})", raw, re.DOTALL)
@@ -1435,7 +1427,7 @@ async def process_file(file: UploadFile = File(...)):
 
         # Process file if not cached
         text = extract_text(filename, file_bytes)
-        structured = generate_json(text)
+        structured = await generate_json(text)
 
         # Store result in cache
         cache_stored = store_output_cache(file_hash, structured)
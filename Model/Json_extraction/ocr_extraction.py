@@ -9,12 +9,15 @@ import docx
 import chardet
 import google.generativeai as genai
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from supabase import create_client, Client
 from io import BytesIO
 from dotenv import load_dotenv
 import traceback
 
+from Common.llm_client import llm
+
 load_dotenv()
 
 router = APIRouter()
@@ -36,7 +39,7 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Initialize Gemini AI
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "600"))
 
 # Storage buckets
 UPLOAD_BUCKET = "Coal-research-files"
@@ -156,17 +159,11 @@ def extract_form_data_with_ai(content: str) -> Dict[str, Any]:
     """ + content
     
     try:
-        response = model.generate_content(extraction_prompt)
-        extracted_json = response.text.strip()
-        
-        # Clean the response to ensure it's valid JSON
-        if extracted_json.startswith('```json'):
-            extracted_json = extracted_json[7:]
-        if extracted_json.endswith('```'):
-            extracted_json = extracted_json[:-3]
-        
-        extracted_data = json.loads(extracted_json)
-        return extracted_data
+        result = llm.generate_sync(extraction_prompt, model=GEMINI_MODEL, route="ocr-extraction",
+                                   timeout=EXTRACTION_TIMEOUT, json_output=True)
+        if not isinstance(result.data, dict):
+            raise ValueError("response is not a JSON object")
+        return result.data
         
     except Exception as e:
         print(f"Error in AI extraction: {str(e)}")
@@ -425,7 +422,7 @@ async def extract_form1_proposal(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
         
         # Extract structured data using AI
-        proposal_data = extract_form_data_with_ai(extracted_text)
+        proposal_data = await run_in_threadpool(extract_form_data_with_ai, extracted_text)
         
         # Construct simple JSON structure
         json_structure = construct_simple_json_structure(proposal_data)
@@ -482,12 +479,15 @@ import docx
 import chardet
 import google.generativeai as genai
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from supabase import create_client, Client
 from io import BytesIO
 from dotenv import load_dotenv
 import traceback
 
+from Common.llm_client import llm
+
 load_dotenv()
 
 router = APIRouter()
@@ -509,7 +509,7 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # Initialize Gemini AI
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "600"))
 
 # Storage buckets
 UPLOAD_BUCKET = "Coal-research-files"
@@ -629,17 +629,11 @@ def extract_form_data_with_ai(content: str) -> Dict[str, Any]:
     """ + content
     
     try:
-        response = model.generate_content(extraction_prompt)
-        extracted_json = response.text.strip()
-        
-        # Clean the response to ensure it's valid JSON
-        if extracted_json.startswith('```json'):
-            extracted_json = extracted_json[7:]
-        if extracted_json.endswith('```'):
-            extracted_json = extracted_json[:-3]
-        
-        extracted_data = json.loads(extracted_json)
-        return extracted_data
+        result = llm.generate_sync(extraction_prompt, model=GEMINI_MODEL, route="ocr-extraction",
+                                   timeout=EXTRACTION_TIMEOUT, json_output=True)
+        if not isinstance(result.data, dict):
+            raise ValueError("response is not a JSON object")
+        return result.data
         
     except Exception as e:
         print(f"Error in AI extraction: {str(e)}")
@@ -898,7 +892,7 @@ async def extract_form1_proposal(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
         
         # Extract structured data using AI
-        proposal_data = extract_form_data_with_ai(extracted_text)
+        proposal_data = await run_in_threadpool(extract_form_data_with_ai, extracted_text)
         
         # Construct simple JSON structure
         json_structure = construct_simple_json_structure(proposal_data)
@@ -17,6 +17,10 @@ from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from Common.document_model import get_document, load_document
+from Common.llm_client import llm
+from Common.prompt_cache import AssembledPrompt, assemble, static_prefix
+
 load_dotenv()
 
 # -------------------------
@@ -57,35 +61,13 @@ def sanitize_filename(name: str) -> str:
     name = re.sub(r"[<>:\"/\\|?*]+", "_", name)
     return name
 
-def safe_json_parse(text: str) -> Any:
-    if not text:
-        return None
-    m = re.search(r"\{[\s\S]*\}$", text.strip())
-    raw = m.group(0) if m else text.strip()
-    try:
-        return json.loads(raw)
-    except Exception:
-        # fallback: attempt to find braces
-        try:
-            f = raw.find("{"); l = raw.rfind("}")
-            if f != -1 and l != -1 and l > f:
-                return json.loads(raw[f:l+1])
-        except Exception:
-            return None
-    return None
-
 # -------------------------
 # TEXT EXTRACTION
 # -------------------------
 def extract_pdf(b: bytes) -> str:
     try:
         r = PyPDF2.PdfReader(BytesIO(b))
-        out = ""
-        for p in r.pages:
-            t = p.extract_text()
-            if t:
-                out += t + "\n"
-        return out
+        return load_document([p.extract_text() for p in r.pages], sep="", page_end="\n").text
     except Exception:
         enc = chardet.detect(b)["encoding"] or "utf-8"
         try:
@@ -117,41 +99,7 @@ def extract_text(filename: str, b: bytes) -> str:
 # SEGMENTATION (paragraph-first, then sentence-chunk)
 # -------------------------
 def segment_text(text: str, min_chars: int = 300) -> List[str]:
-    paras = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    segs = []
-    cur = ""
-    for p in paras:
-        if not cur:
-            cur = p
-        elif len(cur) + len(p) + 2 <= min_chars:
-            cur += "\n\n" + p
-        else:
-            if len(cur) < min_chars:
-                cur += "\n\n" + p
-            else:
-                segs.append(cur)
-                cur = p
-    if cur:
-        segs.append(cur)
-    # split long segments by sentences
-    out = []
-    for s in segs:
-        if len(s) <= 1000:
-            out.append(s)
-        else:
-            sents = re.split(r'(?<=[.!?])\s+', s)
-            chunk = ""
-            for sent in sents:
-                if not chunk:
-                    chunk = sent
-                elif len(chunk) + len(sent) < 900:
-                    chunk += " " + sent
-                else:
-                    out.append(chunk.strip())
-                    chunk = sent
-            if chunk:
-                out.append(chunk.strip())
-    return out
+    return [seg.text for seg in get_document(text).segments(min_chars=min_chars, max_chars=1000)]
 
 # -------------------------
 # LOAD PAST REFERENCE TEXTS (once)
@@ -195,7 +143,8 @@ PAST_TEXTS = load_past_texts()
 # -------------------------
 # PROMPT: per-segment classification with your 7 rules
 # -------------------------
-PLAG_PROMPT_TEMPLATE = """
+# Rules and output format are the same for every segment: sent first, as a cacheable prefix
+PLAG_PROMPT_RULES = static_prefix("plag-rules", """
 You are an academic plagiarism analyst. For the segment below, judge if it is:
  - directly copied (verbatim),
  - paraphrased (same idea but reworded),
@@ -211,7 +160,7 @@ Follow these rules precisely (do NOT ignore):
 6) Output strict JSON only — no extra text.
 
 Return JSON:
-{{
+{
   "segment_text": "...",
   "copied": false,
   "paraphrased": false,
@@ -220,46 +169,46 @@ Return JSON:
   "confidence": 0.0,
   "points_of_plagiarism": [ "which line caused plagiarism and give each line as each segment causes plagiarism", in detail ],
   "matched_files": [
-    {{
+    {
       "filename": "",
       "similarity": 0.0,
       "matched_snippet": ""
-    }}
+    }
   ],
   "citation_suggestion": "", 
   "notes": ""
-}}
+}
 
-PAST_SNIPPETS_PREVIEW:
+""")
+
+PLAG_PROMPT_TEMPLATE = """PAST_SNIPPETS_PREVIEW:
 {past_preview}
 
 SEGMENT:
 {segment}
 """
 
-def build_prompt_for_segment(segment: str, candidate_snippets: List[str]) -> str:
+def build_prompt_for_segment(segment: str, candidate_snippets: List[str]) -> AssembledPrompt:
     preview = "\n\n".join(s[:800] for s in candidate_snippets[:6])
-    return PLAG_PROMPT_TEMPLATE.format(past_preview=preview, segment=segment[:1800])
+    return assemble(PLAG_PROMPT_RULES, PLAG_PROMPT_TEMPLATE.format(past_preview=preview, segment=segment[:1800]))
 
 # -------------------------
 # MODEL CALL
 # -------------------------
-def call_gemini_prompt(prompt: str, timeout_seconds: int = 25) -> Dict[str, Any]:
+def call_gemini_prompt(prompt: AssembledPrompt, timeout_seconds: int = 25) -> Dict[str, Any]:
     """
     Single-call wrapper. We keep this simple; if JSON parse fails, we return conservative defaults.
     """
-    try:    
-        model = genai.GenerativeModel(MODEL_NAME)
-        resp = model.generate_content(prompt)
-        raw = resp.text or ""
-        parsed = safe_json_parse(raw)
-        if parsed and isinstance(parsed, dict):
-            return parsed
+    try:
+        # runs in Pool workers, so the blocking client call (limits are per worker process)
+        result = llm.generate_sync(prompt, model=MODEL_NAME, route="plagiarism", timeout=timeout_seconds, json_output=True)
+        if result.data and isinstance(result.data, dict):
+            return result.data
     except Exception:
         pass
     # conservative fallback
     return {
-        "segment_text": prompt.split("SEGMENT:")[-1].strip()[:1000],
+        "segment_text": prompt.dynamic.split("SEGMENT:")[-1].strip()[:1000],
         "copied": False,
         "paraphrased": False,
         "missing_citation": False,
@@ -321,10 +270,10 @@ def aggregate_results(segment_reports: List[Dict[str, Any]]) -> Dict[str, Any]:
         w = seg_len / total_chars
         if r.get("copied"):
             copied_chars += seg_len
-            copied_sections.append({"segment_index": r.get("segment_index"), "text": r.get("segment_text")[:600], "confidence": r.get("confidence",0.0)})
+            copied_sections.append({"segment_index": r.get("segment_index"), "page": r.get("page"), "line": r.get("line"), "text": r.get("segment_text")[:600], "confidence": r.get("confidence",0.0)})
         if r.get("paraphrased"):
             paraphrased_chars += seg_len
-            paraphrased_sections.append({"segment_index": r.get("segment_index"), "text": r.get("segment_text")[:600], "confidence": r.get("confidence",0.0)})
+            paraphrased_sections.append({"segment_index": r.get("segment_index"), "page": r.get("page"), "line": r.get("line"), "text": r.get("segment_text")[:600], "confidence": r.get("confidence",0.0)})
         # pick best similarity from matched_files if any
         best_sim = 0.0
         for m in r.get("matched_files", []):
@@ -438,7 +387,8 @@ async def check_plagiarism_final(file: UploadFile = File(...)):
                 stored_raw = False
 
         # 2) segment the text
-        segments = segment_text(text, min_chars=350)
+        spans = get_document(text).segments(min_chars=350, max_chars=1000)
+        segments = [seg.text for seg in spans]
         if not segments:
             segments = [text]
 
@@ -448,6 +398,9 @@ async def check_plagiarism_final(file: UploadFile = File(...)):
         args = [(i, segments[i], past_texts) for i in range(len(segments))]
         with Pool(processes=workers) as pool:
             results = pool.map(worker_segment, args)
+        # page/line where each segment starts in the uploaded file
+        for r, seg in zip(results, spans):
+            r.update(seg.location())
 
         # 4) aggregate
         summary = aggregate_results(results)
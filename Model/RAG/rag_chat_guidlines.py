@@ -3,11 +3,19 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import json
+import pickle
+import threading
+import shutil
+import hashlib
 import tempfile
+import faiss
 from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 from langchain_community.vectorstores import FAISS
+from collections import OrderedDict
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAI
 from langchain.prompts import PromptTemplate
@@ -16,13 +24,75 @@ from langchain.document_loaders import PyPDFLoader
 
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Indexes are persisted here keyed by PDF content hash, so every uvicorn worker
+# (and a restarted server) can serve any uploaded guideline
+INDEX_DIR = os.getenv("GUIDELINE_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".faiss_indexes"))
+
+# Per-process LRU sizes: loaded indexes/chains, and embedded questions
+INDEX_CACHE_SIZE = int(os.getenv("GUIDELINE_INDEX_CACHE", "8"))
+QUERY_CACHE_SIZE = int(os.getenv("GUIDELINE_QUERY_CACHE", "1024"))
 
 router = APIRouter()
 
 # -----------------------------
-# In-memory storage for uploaded PDFs and their FAISS indexes
+# Per-process caches
 # -----------------------------
-INDEXES = {}  # key: filename, value: FAISS store
+class LRUCache:
+    """Small thread-safe LRU mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an embedding model and caches query vectors by normalized question."""
+
+    def __init__(self, base, maxsize=QUERY_CACHE_SIZE):
+        self.base = base
+        self.cache = LRUCache(maxsize)
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        # all-MiniLM-L6-v2 is uncased, so case and spacing don't change the vector
+        key = " ".join(text.split()).lower()
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.base.embed_query(key)
+            self.cache.put(key, vector)
+        return vector
+
+
+INDEXES = LRUCache(INDEX_CACHE_SIZE)  # key: content hash, value: FAISS store
+CHAINS = LRUCache(INDEX_CACHE_SIZE)   # key: content hash, value: RetrievalQA chain
+_EMBEDDINGS = None
+_LLM = None
 
 # -----------------------------
 # Helper functions
@@ -45,11 +115,87 @@ def chunk_documents(docs):
             chunks.append(p)
     return chunks
 
+def get_embeddings():
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        _EMBEDDINGS = CachedQueryEmbeddings(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL))
+    return _EMBEDDINGS
+
 def build_index(chunks):
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    store = FAISS.from_documents(chunks, embeddings)
+    store = FAISS.from_documents(chunks, get_embeddings())
+    return store
+
+# -----------------------------
+# On-disk index store
+# -----------------------------
+def content_hash(pdf_bytes):
+    """Key for a PDF's index; includes everything that changes the vectors."""
+    digest = hashlib.sha256(pdf_bytes)
+    digest.update(f"|{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}".encode())
+    return digest.hexdigest()
+
+def _index_path(key):
+    return os.path.join(INDEX_DIR, key)
+
+def _registry_path(filename):
+    # One small file per uploaded filename, replaced atomically, so concurrent
+    # uploads from different workers never clobber each other's entries
+    name_key = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+    return os.path.join(INDEX_DIR, "names", f"{name_key}.json")
+
+def index_exists(key):
+    return os.path.exists(os.path.join(_index_path(key), "index.faiss"))
+
+def save_index(key, store):
+    """Write the index to a temp dir and rename it into place."""
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=INDEX_DIR, prefix=".tmp-")
+    store.save_local(tmp_dir)
+    try:
+        os.rename(tmp_dir, _index_path(key))
+    except OSError:
+        # Another worker saved the same content first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def register_filename(filename, key):
+    path = _registry_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"filename": filename, "hash": key}, f)
+    os.replace(tmp_path, path)
+
+def lookup_filename(filename):
+    try:
+        with open(_registry_path(filename), encoding="utf-8") as f:
+            return json.load(f)["hash"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def load_index(key):
+    """Load a persisted index, memory-mapping the vectors so workers share pages."""
+    store = INDEXES.get(key)
+    if store is not None:
+        return store
+    path = _index_path(key)
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        index = faiss.read_index(os.path.join(path, "index.faiss"), mmap_flag)
+    except RuntimeError:
+        index = faiss.read_index(os.path.join(path, "index.faiss"))
+    # index.pkl is written by save_index above, never taken from uploads
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    store = FAISS(get_embeddings(), index, docstore, index_to_docstore_id)
+    INDEXES.put(key, store)
     return store
 
+def lookup_index_key(filename):
+    key = lookup_filename(filename)
+    if key is None or not index_exists(key):
+        return None
+    return key
+
 QA_PROMPT = PromptTemplate(
     input_variables=["question", "context"],
     template=(
@@ -62,14 +208,21 @@ QA_PROMPT = PromptTemplate(
     )
 )
 
+def get_llm():
+    global _LLM
+    if _LLM is None:
+        GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+        _LLM = GoogleGenerativeAI(
+            model=GEMINI_MODEL,
+            temperature=0,
+            google_api_key=os.getenv("COMMON_GEMINI_KEY") or ""
+        )
+    return _LLM
+
 def make_rag_chain(store):
-    # Set API key from environment
-    os.environ["GOOGLE_API_KEY"] = os.getenv("COMMON_GEMINI_KEY") or ""
-    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    llm = GoogleGenerativeAI(model=GEMINI_MODEL, temperature=0)
     retriever = store.as_retriever(search_kwargs={"k": 5})
     qa = RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=get_llm(),
         chain_type="stuff",
         retriever=retriever,
         return_source_documents=True,
@@ -77,6 +230,14 @@ def make_rag_chain(store):
     )
     return qa
 
+def get_rag_chain(key):
+    """Chain for an index, built once per process and kept in an LRU."""
+    qa = CHAINS.get(key)
+    if qa is None:
+        qa = make_rag_chain(load_index(key))
+        CHAINS.put(key, qa)
+    return qa
+
 # -----------------------------
 # Route 1: Upload PDF and create FAISS index
 # -----------------------------
@@ -87,23 +248,40 @@ async def upload_guidelines(file: UploadFile = File(...)):
         if suffix.lower() != ".pdf":
             return JSONResponse(content={"error": "Only PDF files are allowed"}, status_code=400)
 
+        pdf_bytes = await file.read()
+        key = content_hash(pdf_bytes)
+
+        # Identical PDF already indexed (by any worker): just map the filename to it
+        if index_exists(key):
+            register_filename(file.filename, key)
+            return {
+                "message": f"PDF uploaded and indexed successfully as '{file.filename}'.",
+                "reused_index": True
+            }
+
         # Save PDF temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
+            tmp.write(pdf_bytes)
             tmp_path = tmp.name
 
-        # Load, chunk, build index
-        docs = load_pdf(tmp_path)
-        chunks = chunk_documents(docs)
-        store = build_index(chunks)
-
-        # Save the index in memory keyed by filename
-        INDEXES[file.filename] = store
+        try:
+            # Load, chunk, build index
+            docs = load_pdf(tmp_path)
+            chunks = chunk_documents(docs)
+            store = build_index(chunks)
+        finally:
+            # Cleanup PDF file
+            os.remove(tmp_path)
 
-        # Cleanup PDF file
-        os.remove(tmp_path)
+        # Persist keyed by content hash, then point the filename at it
+        save_index(key, store)
+        register_filename(file.filename, key)
+        INDEXES.put(key, store)
 
-        return {"message": f"PDF uploaded and indexed successfully as '{file.filename}'."}
+        return {
+            "message": f"PDF uploaded and indexed successfully as '{file.filename}'.",
+            "reused_index": False
+        }
 
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
@@ -114,12 +292,12 @@ async def upload_guidelines(file: UploadFile = File(...)):
 @router.post("/ask-guidelines")
 async def ask_guidelines(filename: str = Form(...), question: str = Form(...)):
     try:
-        # Check if the PDF has been uploaded
-        if filename not in INDEXES:
+        # Check if the PDF has been uploaded (by any worker)
+        key = lookup_index_key(filename)
+        if key is None:
             return JSONResponse(content={"error": f"No indexed PDF found for '{filename}'."}, status_code=404)
 
-        store = INDEXES[filename]
-        qa = make_rag_chain(store)
+        qa = get_rag_chain(key)
 
         # Query the LLM
         result = qa({"query": question})
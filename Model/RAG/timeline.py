@@ -14,6 +14,8 @@ from fastapi.responses import JSONResponse
 
 from supabase import create_client, Client
 
+from Common.llm_client import llm
+
 load_dotenv()
 
 # -----------------------------
@@ -149,9 +151,8 @@ DOCUMENT CONTENT:
 # -----------------------------------------------------------
 # GEMINI CALL
 # -----------------------------------------------------------
-def call_gemini(prompt: str) -> Dict[str, Any]:
-    model = genai.GenerativeModel(GEMINI_MODEL)
-    resp = model.generate_content(prompt)
+async def call_gemini(prompt: str) -> Dict[str, Any]:
+    resp = await llm.generate(prompt, model=GEMINI_MODEL, route="timeline")
     raw = resp.text or ""
 
     parsed = safe_json_parse(raw)
@@ -159,8 +160,9 @@ def call_gemini(prompt: str) -> Dict[str, Any]:
         return parsed
 
     # retry clean JSON-only request
-    resp2 = model.generate_content(
-        f"Return ONLY the valid JSON object extracted from this text:\n\n{raw}"
+    resp2 = await llm.generate(
+        f"Return ONLY the valid JSON object extracted from this text:\n\n{raw}",
+        model=GEMINI_MODEL, route="timeline"
     )
     parsed2 = safe_json_parse(resp2.text or "")
     if parsed2:
@@ -224,7 +226,7 @@ async def process_timeline(file: UploadFile = File(...)):
             return JSONResponse({"error": "Could not extract usable text"}, status_code=400)
 
         prompt = build_timeline_prompt(content)
-        timeline_json = call_gemini(prompt)
+        timeline_json = await call_gemini(prompt)
 
         public_url = save_timeline_json(filename, timeline_json)
 
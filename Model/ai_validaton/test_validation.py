@@ -0,0 +1,77 @@
+"""
+Tests for FORM-I field validation (ai_validaton.validation), with Gemini
+replaced by the llm_client stub backend.
+
+Run with: python -m pytest ai_validaton/test_validation.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ai_validaton import validation as v
+from Common.llm_client import StubBackend, llm
+
+LONG = " ".join(["word"] * 40)
+OK_ANSWER = '{"validation_result": "filled_and_ok", "reason": "llm ok"}'
+# Not in GUIDELINE_RULES, so it is always judged by the LLM
+FREE_FIELD = "Budget Justification"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    backend = StubBackend(respond=lambda _prompt: OK_ANSWER)
+    monkeypatch.setattr(llm, "backend", backend)
+    monkeypatch.setattr(v, "model", object())  # "Gemini configured"
+    return backend
+
+
+def fields_sent(backend) -> list:
+    return [prompt.split("FIELD: ")[1].split("\n")[0] for prompt in backend.calls]
+
+
+def validate(values):
+    return asyncio.run(v.validate_field_values(values, {}))
+
+
+def test_rule_results_are_final_by_default(stub, monkeypatch):
+    monkeypatch.setattr(v, "LLM_QUALITATIVE_REVIEW", False)
+    values = {"Methodology": LONG + " analysis", "Project Title": "Coal study", FREE_FIELD: LONG}
+
+    res = validate(values)
+    assert fields_sent(stub) == [FREE_FIELD]
+    assert res["Methodology"] == v.rule_based_check("Methodology", values["Methodology"])
+    assert res[FREE_FIELD]["reason"] == "llm ok"
+
+
+def test_rule_failure_never_calls_llm(stub, monkeypatch):
+    monkeypatch.setattr(v, "LLM_QUALITATIVE_REVIEW", True)
+    values = {
+        "Benefits to Coal Industry": "very beneficial",   # too short
+        "Methodology": LONG,                               # no technique named
+        "Definition of the Issue": "",                     # not filled
+        "Work Plan": LONG,                                 # passes, qualitative
+    }
+
+    res = validate(values)
+    assert fields_sent(stub) == ["Work Plan"]
+    for field in ("Benefits to Coal Industry", "Methodology", "Definition of the Issue"):
+        assert res[field] == v.rule_based_check(field, values[field])
+        assert res[field]["validation_result"] != "filled_and_ok"
+    assert res["Work Plan"]["reason"] == "llm ok"
+
+
+def test_timeout_falls_back_to_deterministic_check(stub, monkeypatch):
+    monkeypatch.setattr(v, "LLM_VALIDATION_TIMEOUT", 0.05)
+    stub.delay = 1.0
+    values = {FREE_FIELD: LONG, "Scope": "short"}
+    excerpts = {FREE_FIELD: "Budget must be itemised. More text.", "Scope": "Scope must be stated."}
+
+    res = asyncio.run(v.validate_field_values(values, excerpts))
+    for field in values:
+        assert res[field] == v.deterministic_llm_fallback(field, values[field], excerpts[field])
@@ -11,6 +11,7 @@ Run:
 import os
 import re
 import json
+import asyncio
 import uuid
 import shutil
 import tempfile
@@ -27,9 +28,14 @@ from io import BytesIO
 from datetime import datetime
 
 from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
+from Common.document_model import SEGMENTER_VERSION, get_document, load_document
+from Common.llm_client import LLMTimeout, llm
+from Common.prompt_cache import AssembledPrompt, assemble, static_prefix
+
 # --- Gemini client (optional) ---
 try:
     import google.generativeai as genai
@@ -49,6 +55,8 @@ load_dotenv()
 GUIDELINES_PDF_PATH = os.getenv("GUIDELINES_PDF_PATH", "/mnt/data/Guidelines.pdf")
 GEMINI_API_KEY = os.getenv("AI_VALIDATION_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Extracting every FORM-I field is one long answer; allow it more than the default LLM_TIMEOUT
+LLM_EXTRACTION_TIMEOUT = float(os.getenv("LLM_EXTRACTION_TIMEOUT", "180"))
 
 # Supabase envs used in extractor (kept as in your provided code)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -216,15 +224,11 @@ def extract_form_data_with_ai(content: str) -> Dict[str, Any]:
     try:
         # Use extractor_model if available, otherwise fallback to deterministic empty structure
         if extractor_model:
-            response = extractor_model.generate_content(extraction_prompt)
-            extracted_json = response.text.strip()
-            # Clean code block markers if present
-            if extracted_json.startswith('```json'):
-                extracted_json = extracted_json[7:]
-            if extracted_json.endswith('```'):
-                extracted_json = extracted_json[:-3]
-            extracted_data = json.loads(extracted_json)
-            return extracted_data
+            result = llm.generate_sync(extraction_prompt, model=GEMINI_MODEL, route="validation-extraction",
+                                       timeout=LLM_EXTRACTION_TIMEOUT, json_output=True)
+            if not isinstance(result.data, dict):
+                raise ValueError("extractor response is not a JSON object")
+            return result.data
         else:
             # If no extractor LLM configured, return empty template
             return {
@@ -583,55 +587,147 @@ def load_guidelines_text(pdf_path: str) -> str:
                     texts.append(p.extract_text() or "")
                 except Exception:
                     texts.append("")
-        return "\n".join(texts)
+        return load_document(texts, sep="\n", skip_empty=False).text
     except Exception as e:
         logger.exception("Failed to read guidelines PDF: %s", e)
         return ""
 
-def build_guideline_excerpts(text: str, fields: List[str], window_sentences: int = 2) -> Dict[str, str]:
+# Guideline keywords per field; the first sentence containing a keyword
+# (earlier keywords win) is the centre of that field's excerpt
+GUIDELINE_KEYWORDS = {
+    "Project Title": ["project title", "title of the project"],
+    "Principal Investigator": ["principal investigator", "project leader", "pi"],
+    "Organization": ["implementing agency", "sub-implementing", "principal implementing"],
+    "Definition of the Issue": ["definition of the issue", "problem definition", "definition"],
+    "Objectives": ["objectives", "objectives of the project"],
+    "Justification for Subject Area": ["justification", "justification for the"],
+    "Benefits to Coal Industry": ["benefit to the industry", "benefits"],
+    "Work Plan": ["work plan", "organization of work", "work elements"],
+    "Methodology": ["methodology", "approach"],
+    "Organization of Work Elements": ["organization of work", "roles", "responsibilities"],
+}
+
+# Pre-split guidelines are cached next to the PDF (or at GUIDELINES_INDEX_PATH)
+GUIDELINES_INDEX_PATH = os.getenv("GUIDELINES_INDEX_PATH")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class GuidelineIndex:
     """
-    Find small excerpts from Guidelines text relevant to each field using keyword search.
-    Returns dict field->excerpt (may be empty).
+    Guideline sentences plus an inverted index token -> sentence ids.
+    Keywords are matched as whole words/phrases ("pi" no longer matches
+    inside "pipeline"); excerpts for a fixed field list are memoised.
     """
-    excerpts = {}
-    if not text:
-        for f in fields:
-            excerpts[f] = ""
-        return excerpts
-
-    # simple sentence splitter
-    sentences = re.split(r'(?<=[\.\?\n])\s+', text)
-    lc = [s.lower() for s in sentences]
-
-    key_map = {
-        "Project Title": ["project title", "title of the project"],
-        "Principal Investigator": ["principal investigator", "project leader", "pi"],
-        "Organization": ["implementing agency", "sub-implementing", "principal implementing"],
-        "Definition of the Issue": ["definition of the issue", "problem definition", "definition"],
-        "Objectives": ["objectives", "objectives of the project"],
-        "Justification for Subject Area": ["justification", "justification for the"],
-        "Benefits to Coal Industry": ["benefit to the industry", "benefits"],
-        "Work Plan": ["work plan", "organization of work", "work elements"],
-        "Methodology": ["methodology", "approach"],
-        "Organization of Work Elements": ["organization of work", "roles", "responsibilities"],
-    }
 
-    for f in fields:
-        keywords = key_map.get(f, [f.lower()])
-        found = False
-        excerpt = ""
-        for kw in keywords:
-            for i, s in enumerate(lc):
-                if kw in s:
+    def __init__(self, sentences: List[str]):
+        self.sentences = sentences
+        self.tokens = [tuple(_TOKEN_RE.findall(s.lower())) for s in sentences]
+        self.postings: Dict[str, List[int]] = {}
+        for sid, toks in enumerate(self.tokens):
+            for tok in set(toks):
+                self.postings.setdefault(tok, []).append(sid)
+        self._excerpts: Dict[tuple, str] = {}
+
+    @classmethod
+    def from_text(cls, text: str) -> "GuidelineIndex":
+        # sentences from the shared document model, also cut at blank lines
+        # so headings and list items stay separate
+        return cls([s.text for s in get_document(text).paragraph_sentences] if text else [])
+
+    def first_sentence(self, keyword: str) -> Optional[int]:
+        """Id of the first sentence containing `keyword` as a phrase, or None."""
+        phrase = tuple(_TOKEN_RE.findall(keyword.lower()))
+        if not phrase:
+            return None
+        lists = sorted((self.postings.get(tok, []) for tok in set(phrase)), key=len)
+        if not lists[0]:
+            return None
+        candidates = set(lists[0]).intersection(*lists[1:])
+        n = len(phrase)
+        for sid in sorted(candidates):
+            toks = self.tokens[sid]
+            if n == 1 or any(toks[i:i + n] == phrase for i in range(len(toks) - n + 1)):
+                return sid
+        return None
+
+    def excerpt(self, field: str, window_sentences: int = 2) -> str:
+        key = (field, window_sentences)
+        if key not in self._excerpts:
+            excerpt = ""
+            for kw in GUIDELINE_KEYWORDS.get(field, [field.lower()]):
+                i = self.first_sentence(kw)
+                if i is not None:
                     start = max(0, i - window_sentences)
-                    end = min(len(sentences), i + window_sentences + 1)
-                    excerpt = " ".join(sentences[start:end]).strip()
-                    found = True
+                    end = min(len(self.sentences), i + window_sentences + 1)
+                    excerpt = " ".join(self.sentences[start:end]).strip()
                     break
-            if found:
-                break
-        excerpts[f] = excerpt
-    return excerpts
+            self._excerpts[key] = excerpt
+        return self._excerpts[key]
+
+    def excerpts(self, fields: List[str], window_sentences: int = 2) -> Dict[str, str]:
+        return {f: self.excerpt(f, window_sentences) for f in fields}
+
+
+def _guidelines_artifact_path(pdf_path: str) -> str:
+    return GUIDELINES_INDEX_PATH or os.path.splitext(pdf_path)[0] + ".sentences.json"
+
+
+def _load_guideline_sentences(pdf_path: str) -> List[str]:
+    """Sentences from the prebuilt artifact if it matches the PDF, else parse the PDF and write one."""
+    artifact = _guidelines_artifact_path(pdf_path)
+    try:
+        stat = os.stat(pdf_path)
+    except OSError:
+        logger.warning("Guidelines PDF not found at %s", pdf_path)
+        return []
+    try:
+        with open(artifact, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if (data.get("size") == stat.st_size and data.get("mtime") == stat.st_mtime
+                and data.get("segmenter") == SEGMENTER_VERSION):
+            return data["sentences"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sentences = GuidelineIndex.from_text(load_guidelines_text(pdf_path)).sentences
+    try:
+        tmp = artifact + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"source": os.path.basename(pdf_path), "size": stat.st_size,
+                       "mtime": stat.st_mtime, "segmenter": SEGMENTER_VERSION,
+                       "sentences": sentences}, fh)
+        os.replace(tmp, artifact)
+        logger.info("Wrote guidelines sentence cache %s (%d sentences)", artifact, len(sentences))
+    except OSError as e:
+        logger.warning("Could not write guidelines sentence cache %s: %s", artifact, e)
+    return sentences
+
+
+_guideline_index: Optional[GuidelineIndex] = None
+_guideline_index_key = None
+
+
+def get_guideline_index(pdf_path: str = GUIDELINES_PDF_PATH) -> GuidelineIndex:
+    """Process-wide index for the guidelines PDF; rebuilt only when the PDF changes."""
+    global _guideline_index, _guideline_index_key
+    try:
+        stat = os.stat(pdf_path)
+        key = (pdf_path, stat.st_size, stat.st_mtime)
+    except OSError:
+        key = (pdf_path, None, None)
+    if _guideline_index is None or key != _guideline_index_key:
+        _guideline_index = GuidelineIndex(_load_guideline_sentences(pdf_path))
+        _guideline_index_key = key
+    return _guideline_index
+
+
+def build_guideline_excerpts(text: str, fields: List[str], window_sentences: int = 2) -> Dict[str, str]:
+    """
+    Find small excerpts from Guidelines text relevant to each field using keyword search.
+    Returns dict field->excerpt (may be empty).
+    """
+    return GuidelineIndex.from_text(text).excerpts(fields, window_sentences)
 
 # ---------- Simple helpers ----------
 def count_words(text: str) -> int:
@@ -711,19 +807,28 @@ def rule_based_check(field_label: str, value: str) -> Dict[str, str]:
     return {"validation_result": "filled_and_ok", "reason": "Field validated by deterministic rule."}
 
 # ---------- LLM-based qualitative judgment ----------
-def ask_gemini_validate(field_label: str, field_value: str, guideline_excerpt: str) -> Dict[str, str]:
-    """Ask Gemini to validate a qualitative field; returns {'validation_result','reason'}"""
-    if not model:
-        # fallback
-        return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
-
-    prompt = f"""
+# Fields with a deterministic rule get the rule's verdict; the rest are judged
+# by Gemini. With LLM_QUALITATIVE_REVIEW=true, these rule fields (whose checks
+# only cover structure: length, keywords) are also sent to Gemini when the
+# rules pass. Rule failures are always final and never reach the LLM.
+LLM_QUALITATIVE_REVIEW = os.getenv("LLM_QUALITATIVE_REVIEW", "false").lower() in ("true", "1", "yes")
+QUALITATIVE_FIELDS = [
+    f.strip() for f in os.getenv(
+        "LLM_VALIDATE_FIELDS",
+        "Definition of the Issue,Objectives,Justification for Subject Area,Benefits to Coal Industry,"
+        "Work Plan,Methodology,Organization of Work Elements"
+    ).split(",") if f.strip()
+]
+LLM_VALIDATION_CONCURRENCY = int(os.getenv("LLM_VALIDATION_CONCURRENCY", "4"))
+LLM_VALIDATION_TIMEOUT = float(os.getenv("LLM_VALIDATION_TIMEOUT", "20"))
+llm.set_route_limit("validation", LLM_VALIDATION_CONCURRENCY)
+
+def build_validation_prompt(field_label: str, field_value: str, guideline_excerpt: str) -> AssembledPrompt:
+    # Instructions and the field's guideline excerpt are the same for every
+    # upload, so they form the (cacheable) prefix; only the value varies
+    static = f"""
 You are a strict validator for FORM-I fields, using only the provided S&T guideline excerpt.
 
-FIELD: {field_label}
-FIELD_VALUE:
-'''{field_value if field_value else ""}'''
-
 GUIDELINE EXCERPT:
 '''{guideline_excerpt if guideline_excerpt else ""}'''
 
@@ -736,29 +841,94 @@ Rules:
 - If field_value is placeholder -> not_following_guidelines
 - If excerpt clearly specifies a condition that field_value violates -> not_following_guidelines (cite the condition)
 - Otherwise conservatively return not_following_guidelines unless excerpt explicitly approves.
+
+FIELD: {field_label}
 """
+    return assemble(static_prefix(f"form1-{field_label}", static), f"""FIELD_VALUE:
+'''{field_value if field_value else ""}'''
+""")
+
+def parse_validation_response(txt: str, field_label: str, field_value: str, guideline_excerpt: str) -> Dict[str, str]:
+    m = re.search(r"\{.*\}", (txt or "").strip(), flags=re.S)
+    if not m:
+        return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
+    parsed = json.loads(m.group(0))
+    vr = parsed.get("validation_result", "").strip()
+    reason = parsed.get("reason", "").strip()
+    if vr not in ("filled_and_ok", "not_filled", "not_following_guidelines"):
+        # normalize
+        low = vr.lower()
+        if low in ("yes","pass","true"): vr = "filled_and_ok"
+        elif low in ("no","fail","false"): vr = "not_following_guidelines"
+        else: vr = "not_following_guidelines"
+    if not reason:
+        reason = "LLM provided no reason."
+    return {"validation_result": vr, "reason": reason}
+
+def ask_gemini_validate(field_label: str, field_value: str, guideline_excerpt: str) -> Dict[str, str]:
+    """Ask Gemini to validate a qualitative field; returns {'validation_result','reason'}"""
+    if not model:
+        # fallback
+        return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
+
+    prompt = build_validation_prompt(field_label, field_value, guideline_excerpt)
     try:
-        resp = model.generate_content(prompt)
-        txt = (resp.text or "").strip()
-        m = re.search(r"\{.*\}", txt, flags=re.S)
-        if not m:
-            return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
-        parsed = json.loads(m.group(0))
-        vr = parsed.get("validation_result", "").strip()
-        reason = parsed.get("reason", "").strip()
-        if vr not in ("filled_and_ok", "not_filled", "not_following_guidelines"):
-            # normalize
-            low = vr.lower()
-            if low in ("yes","pass","true"): vr = "filled_and_ok"
-            elif low in ("no","fail","false"): vr = "not_following_guidelines"
-            else: vr = "not_following_guidelines"
-        if not reason:
-            reason = "LLM provided no reason."
-        return {"validation_result": vr, "reason": reason}
+        result = llm.generate_sync(prompt, model=GEMINI_MODEL, route="validation", timeout=LLM_VALIDATION_TIMEOUT)
+        return parse_validation_response(result.text, field_label, field_value, guideline_excerpt)
     except Exception as e:
         logger.exception("Gemini validation error: %s", e)
         return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
 
+async def ask_gemini_validate_async(
+    field_label: str,
+    field_value: str,
+    guideline_excerpt: str,
+    timeout: Optional[float] = None,
+) -> Dict[str, str]:
+    """ask_gemini_validate without blocking the event loop; falls back deterministically on timeout."""
+    timeout = LLM_VALIDATION_TIMEOUT if timeout is None else timeout
+    if not model:
+        return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
+
+    prompt = build_validation_prompt(field_label, field_value, guideline_excerpt)
+    try:
+        # one retry at most: a slow field falls back rather than holding up the upload
+        result = await llm.generate(prompt, model=GEMINI_MODEL, route="validation", timeout=timeout, retries=1)
+        return parse_validation_response(result.text, field_label, field_value, guideline_excerpt)
+    except LLMTimeout:
+        logger.warning("Gemini validation of '%s' timed out after %.1fs - using fallback", field_label, timeout)
+    except Exception as e:
+        logger.exception("Gemini validation error: %s", e)
+    return deterministic_llm_fallback(field_label, field_value, guideline_excerpt)
+
+async def validate_field_values(values: Dict[str, str], guideline_excerpts: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """
+    Validate every field: deterministic rules first, then Gemini (concurrently,
+    at most LLM_VALIDATION_CONCURRENCY calls in flight) for fields that need it.
+    """
+    results: Dict[str, Dict[str, str]] = {}
+    llm_fields = []
+    for field_label, value in values.items():
+        if field_label in GUIDELINE_RULES:
+            rule_res = rule_based_check(field_label, value)
+            # Rule results are final unless the opt-in qualitative review applies
+            review = (
+                LLM_QUALITATIVE_REVIEW and model and field_label in QUALITATIVE_FIELDS
+                and rule_res.get("validation_result") == "filled_and_ok"
+            )
+            if not review:
+                results[field_label] = rule_res
+                continue
+        llm_fields.append(field_label)
+
+    if llm_fields:
+        llm_results = await asyncio.gather(*[
+            ask_gemini_validate_async(f, values[f] or "", guideline_excerpts.get(f, ""))
+            for f in llm_fields
+        ])
+        results.update(zip(llm_fields, llm_results))
+    return results
+
 def deterministic_llm_fallback(field_label: str, field_value: str, guideline_excerpt: str) -> Dict[str, str]:
     v = (field_value or "").strip()
     if not v:
@@ -889,7 +1059,7 @@ async def validate_form1(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
 
         # Use AI extractor (if configured) to return proposal_data; otherwise, the extractor returns empty keys.
-        proposal_data = extract_form_data_with_ai(extracted_text)
+        proposal_data = await run_in_threadpool(extract_form_data_with_ai, extracted_text)
         json_structure = construct_simple_json_structure(proposal_data)
 
         # Attempt to store in supabase (if configured) - keep behavior same as extractor
@@ -915,8 +1085,7 @@ async def validate_form1(file: UploadFile = File(...)):
         raw_extracted = proposal_data.copy()
 
         # Build guideline excerpts
-        guidelines_text = load_guidelines_text(GUIDELINES_PDF_PATH)
-        guideline_excerpts = build_guideline_excerpts(guidelines_text, VALIDATE_FIELDS, window_sentences=2)
+        guideline_excerpts = get_guideline_index(GUIDELINES_PDF_PATH).excerpts(VALIDATE_FIELDS, window_sentences=2)
 
         # Validate fields
         fields_out = []
@@ -930,6 +1099,7 @@ async def validate_form1(file: UploadFile = File(...)):
             if k not in combined_payload:
                 combined_payload[k] = v
 
+        field_values = {}
         for field_label in VALIDATE_FIELDS:
             # get value using extractor outputs
             value = get_value_from_extracted_payload(json_structure, field_label)
@@ -941,15 +1111,14 @@ async def validate_form1(file: UploadFile = File(...)):
                         break
             if isinstance(value, (list, dict)):
                 value = json.dumps(value)
+            field_values[field_label] = value
 
-            # if deterministic rule exists, apply it first
-            if field_label in GUIDELINE_RULES:
-                rule_res = rule_based_check(field_label, value)
-                res = rule_res
-            else:
-                # use LLM validation for qualitative fields (if available), otherwise fallback
-                excerpt = guideline_excerpts.get(field_label, "")
-                res = ask_gemini_validate(field_label, value or "", excerpt)
+        # Rules first; only fields that pass them and need a qualitative check go to Gemini (concurrently)
+        field_results = await validate_field_values(field_values, guideline_excerpts)
+
+        for field_label in VALIDATE_FIELDS:
+            value = field_values[field_label]
+            res = field_results[field_label]
 
             vr = res.get("validation_result", "not_following_guidelines")
             reason = res.get("reason", "")
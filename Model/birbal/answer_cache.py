@@ -0,0 +1,176 @@
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# ================================================================
+# ------------------ SEMANTIC ANSWER CACHE ------------------------
+# ================================================================
+#
+# Answers are cached per (language, top_k) under the question embedding.
+# A new question is a hit when its embedding is within
+# ANSWER_CACHE_THRESHOLD cosine similarity of a cached one, so rephrasings
+# such as "what is the max project duration?" / "maximum duration of a
+# project?" share one answer. Entries expire after ANSWER_CACHE_TTL
+# seconds, and the whole cache is dropped when the index version changes
+# (vectors added/removed, or an ingest in this process reported changes).
+#
+# The embedding model (all-MiniLM-L6-v2) is English-only: Hindi/Tamil
+# questions that differ in meaning can still score above the threshold.
+# Languages without a threshold in ANSWER_CACHE_LANG_THRESHOLDS (e.g.
+# "hi=0.99,ta=0.99") are therefore only matched on the exact question text.
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_LANG_THRESHOLDS = {
+    lang.strip(): float(value)
+    for lang, _, value in (
+        item.partition("=") for item in os.getenv("ANSWER_CACHE_LANG_THRESHOLDS", "").split(",") if "=" in item
+    )
+}
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+# How often the index version is re-read (describe_index_stats is a network call on Pinecone)
+ANSWER_CACHE_VERSION_CHECK = float(os.getenv("ANSWER_CACHE_VERSION_CHECK", "30"))
+
+_DEVANAGARI_RE = re.compile(r"[ऀ-ॿ]")
+_TAMIL_RE = re.compile(r"[஀-௿]")
+
+
+def detect_language(text: str) -> str:
+    """'hi', 'ta' or 'en', by script (the three languages BIRBAL answers in)."""
+    hindi = len(_DEVANAGARI_RE.findall(text))
+    tamil = len(_TAMIL_RE.findall(text))
+    if not hindi and not tamil:
+        return "en"
+    return "hi" if hindi >= tamil else "ta"
+
+
+def _question_key(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?।.! ")
+
+
+# Bumped by in-process writers (e.g. /ingest) so caches notice content
+# changes that keep the vector count the same
+_index_generation = 0
+
+
+def bump_index_generation():
+    global _index_generation
+    _index_generation += 1
+
+
+def index_version(index) -> str:
+    """Version string for a Pinecone or local index; changes whenever its contents do."""
+    try:
+        stats = index.describe_index_stats()
+        total = stats.get("total_vector_count") if isinstance(stats, dict) else stats.total_vector_count
+        tombstoned = stats.get("tombstoned_count", 0) if isinstance(stats, dict) else 0
+        return f"{_index_generation}:{total}:{tombstoned}"
+    except Exception as e:
+        print(f"⚠️ Could not read index stats for the answer cache: {e}")
+        return f"{_index_generation}:unknown"
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    created_at: float
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        index,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        language_thresholds: Optional[Dict[str, float]] = None,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_SIZE,
+    ):
+        self.index = index
+        self.threshold = threshold
+        # language -> cosine threshold; other languages match the exact question only
+        self.thresholds = {"en": threshold, **(ANSWER_CACHE_LANG_THRESHOLDS if language_thresholds is None else language_thresholds)}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (language, top_k) -> (normalized embedding matrix, entries)
+        self._buckets: Dict[tuple, tuple] = {}
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _size(self) -> int:
+        return sum(len(entries) for _, entries in self._buckets.values())
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def _check_version(self):
+        now = time.monotonic()
+        fresh = now - self._version_checked < ANSWER_CACHE_VERSION_CHECK
+        if fresh and self._version is not None and self._version.startswith(f"{_index_generation}:"):
+            return
+        version = index_version(self.index)
+        self._version_checked = now
+        if version != self._version:
+            if self._version is not None:
+                print(f"♻️ Index changed ({self._version} -> {version}), dropping cached answers")
+                self.stats["invalidations"] += 1
+            self._version = version
+            self.clear()
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-8)
+
+    def lookup(self, language: str, top_k: int, embedding: Sequence[float], question: str) -> Optional[CachedAnswer]:
+        """Cached answer for `question`; runs describe_index_stats now and then, so call it off the event loop."""
+        self._check_version()
+        threshold = self.thresholds.get(language)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get((language, top_k))
+            if bucket is not None:
+                matrix, entries = bucket
+                if threshold is not None:
+                    scores = matrix @ self._normalize(embedding)
+                    best = int(np.argmax(scores))
+                    matched = scores[best] >= threshold
+                else:
+                    key = _question_key(question)
+                    best = next((i for i in range(len(entries) - 1, -1, -1) if _question_key(entries[i].question) == key), None)
+                    matched = best is not None
+                entry = entries[best] if matched else None
+                if entry is not None and now - entry.created_at < self.ttl:
+                    entry.hits += 1
+                    self.stats["hits"] += 1
+                    return entry
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, language: str, top_k: int, embedding: Sequence[float], question: str, answer: str, sources: List[Dict[str, Any]]):
+        vector = self._normalize(embedding)[None, :]
+        now = time.time()
+        with self._lock:
+            matrix, entries = self._buckets.get((language, top_k), (np.empty((0, vector.shape[1]), dtype=np.float32), []))
+            # Expired entries go first, then the oldest ones if still over the limit
+            keep = [i for i, e in enumerate(entries) if now - e.created_at < self.ttl]
+            overflow = self._size() - (len(entries) - len(keep)) + 1 - self.max_entries
+            if overflow > 0:
+                keep = keep[overflow:]
+            matrix = np.vstack([matrix[keep], vector])
+            entries = [entries[i] for i in keep] + [CachedAnswer(question, answer, sources, now)]
+            self._buckets[(language, top_k)] = (matrix, entries)
+
+    def info(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": self._size(), "index_version": self._version, "thresholds": self.thresholds}
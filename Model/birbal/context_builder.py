@@ -0,0 +1,260 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Sequence
+
+import numpy as np
+
+from Common.tokens import estimate_tokens
+
+
+# ================================================================
+# ------------------ RAG PROMPT CONTEXT BUILDER -------------------
+# ================================================================
+#
+# Turns retrieved chunks into a compact prompt context:
+#   1. near-duplicate chunks (overlapping windows, re-ingested copies)
+#      are dropped, keeping the better-scored one
+#   2. chunks from the same source page are merged into one, with the
+#      words repeated at the seam removed
+#   3. if the result is still over the token budget, sentences are
+#      scored against the question and the best ones are kept, in
+#      their original order within each chunk
+# Token counts are estimates (no tokenizer round-trip); Gemini's own
+# count is available afterwards from `response.usage_metadata`.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# Weight of the chunk's retrieval score when ranking its sentences
+CONTEXT_CHUNK_SCORE_WEIGHT = float(os.getenv("CONTEXT_CHUNK_SCORE_WEIGHT", "0.3"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+|\n+")
+_SHINGLE = 4
+_MIN_SENTENCE_CHARS = 25
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _shingles(words: Sequence[str]) -> set:
+    if len(words) < _SHINGLE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of `text`; fragments shorter than a short sentence join the next one."""
+    sentences, pending = [], ""
+    for part in _SENTENCE_RE.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}".strip()
+        if len(pending) >= _MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def _merge_overlap(left: str, right: str, max_words: int = 80) -> str:
+    """
+    Join two chunks from the same page, dropping the words they share at the
+    seam. Retrieval order is not page order, so both seams are tried.
+    """
+    left_words, right_words = left.split(), right.split()
+    for n in range(min(max_words, len(left_words), len(right_words)), 2, -1):
+        if left_words[-n:] == right_words[:n]:
+            return " ".join(left_words + right_words[n:])
+        if right_words[-n:] == left_words[:n]:
+            return " ".join(right_words + left_words[n:])
+    return f"{left} {right}"
+
+
+@dataclass
+class ContextChunk:
+    text: str
+    score: float = 0.0
+    source: Optional[str] = None
+    page: Optional[Any] = None
+    order: int = 0  # retrieval rank
+
+    @property
+    def label(self) -> str:
+        return f"{self.source or 'unknown'} | page {self.page if self.page is not None else 'N/A'}"
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    chunks: List[ContextChunk]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+    def report(self, prompt: str, response=None) -> Dict[str, Any]:
+        """Context stats plus the prompt's token count (Gemini's own count when a response is given)."""
+        stats = dict(self.stats, prompt_tokens_estimate=estimate_tokens(prompt))
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and getattr(usage, "prompt_token_count", None):
+            stats["prompt_tokens"] = usage.prompt_token_count
+        return stats
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+        embed: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+    ):
+        """
+        `embed` (list of texts -> vectors) enables semantic sentence scoring,
+        which also works when the question and documents are in different
+        languages; without it sentences are scored by word overlap.
+        """
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.embed = embed
+
+    # -------------------- dedup / merge --------------------
+
+    def deduplicate(self, chunks: List[ContextChunk]) -> List[ContextChunk]:
+        kept: List[ContextChunk] = []
+        kept_shingles: List[set] = []
+        for chunk in sorted(chunks, key=lambda c: -c.score):
+            shingles = _shingles(_words(chunk.text))
+            if not shingles:
+                continue
+            duplicate = False
+            for other in kept_shingles:
+                overlap = len(shingles & other)
+                # Jaccard for near-copies, containment for a chunk inside a longer one
+                if (overlap / len(shingles | other) >= self.dedup_threshold
+                        or overlap / len(shingles) >= self.dedup_threshold):
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(chunk)
+                kept_shingles.append(shingles)
+        return kept
+
+    @staticmethod
+    def merge_same_page(chunks: List[ContextChunk]) -> List[ContextChunk]:
+        groups: Dict[tuple, List[ContextChunk]] = {}
+        for chunk in chunks:
+            key = (chunk.source, chunk.page) if chunk.source or chunk.page is not None else (id(chunk),)
+            groups.setdefault(key, []).append(chunk)
+
+        merged = []
+        for group in groups.values():
+            group.sort(key=lambda c: c.order)
+            text = group[0].text
+            for chunk in group[1:]:
+                text = _merge_overlap(text, chunk.text)
+            merged.append(ContextChunk(
+                text=text,
+                score=max(c.score for c in group),
+                source=group[0].source,
+                page=group[0].page,
+                order=group[0].order,
+            ))
+        merged.sort(key=lambda c: -c.score)
+        return merged
+
+    # -------------------- sentence selection --------------------
+
+    def _sentence_scores(self, question: str, sentences: List[str], question_embedding=None) -> np.ndarray:
+        if self.embed is not None:
+            if question_embedding is None:
+                vectors = np.asarray(self.embed([question] + sentences), dtype=np.float32)
+                q, s = vectors[0], vectors[1:]
+            else:
+                q = np.asarray(question_embedding, dtype=np.float32)
+                s = np.asarray(self.embed(sentences), dtype=np.float32)
+            s = s / (np.linalg.norm(s, axis=1, keepdims=True) + 1e-8)
+            return s @ (q / (np.linalg.norm(q) + 1e-8))
+
+        # Lexical fallback: IDF-weighted share of the question's words
+        question_words = set(_words(question))
+        sentence_words = [set(_words(s)) for s in sentences]
+        df = {w: sum(w in words for words in sentence_words) for w in question_words}
+        idf = {w: np.log(1 + len(sentences) / (1 + df[w])) for w in question_words}
+        total = sum(idf.values()) or 1.0
+        return np.asarray([sum(idf[w] for w in question_words & words) / total for words in sentence_words])
+
+    def select_sentences(self, question: str, chunks: List[ContextChunk], question_embedding=None) -> List[ContextChunk]:
+        items = []  # (chunk index, sentence position, sentence)
+        for ci, chunk in enumerate(chunks):
+            for si, sentence in enumerate(split_sentences(chunk.text)):
+                items.append((ci, si, sentence))
+        if not items:
+            return []
+
+        scores = self._sentence_scores(question, [s for _, _, s in items], question_embedding)
+        chunk_scores = np.asarray([chunks[ci].score for ci, _, _ in items], dtype=np.float32)
+        ranked = np.argsort(-(scores + CONTEXT_CHUNK_SCORE_WEIGHT * chunk_scores), kind="stable")
+
+        chosen, used = [], 0
+        for i in ranked:
+            cost = estimate_tokens(items[i][2])
+            if used + cost > self.token_budget:
+                continue
+            chosen.append(i)
+            used += cost
+
+        by_chunk: Dict[int, List[tuple]] = {}
+        for i in chosen:
+            ci, si, sentence = items[i]
+            by_chunk.setdefault(ci, []).append((si, sentence))
+        selected = []
+        for ci in sorted(by_chunk):
+            chunk = chunks[ci]
+            text = " ".join(sentence for _, sentence in sorted(by_chunk[ci]))
+            selected.append(ContextChunk(text=text, score=chunk.score, source=chunk.source, page=chunk.page, order=chunk.order))
+        return selected
+
+    # -------------------- entry point --------------------
+
+    def build(self, question: str, chunks: List[ContextChunk], question_embedding=None) -> BuiltContext:
+        tokens_in = sum(estimate_tokens(c.text) for c in chunks)
+        unique = self.deduplicate(chunks)
+        merged = self.merge_same_page(unique)
+
+        if sum(estimate_tokens(c.text) for c in merged) > self.token_budget:
+            final = self.select_sentences(question, merged, question_embedding)
+        else:
+            final = merged
+
+        text = "\n\n".join(f"[DOC {i} | {c.label}]\n{c.text}" for i, c in enumerate(final, start=1))
+        stats = {
+            "chunks_retrieved": len(chunks),
+            "chunks_after_dedup": len(unique),
+            "chunks_used": len(final),
+            "context_tokens_before": tokens_in,
+            "context_tokens": estimate_tokens(text),
+        }
+        return BuiltContext(text=text, chunks=final, stats=stats)
+
+
+def chunks_from_matches(matches: Sequence[Any], text_fields=("chunk_text", "text", "content", "chunk", "page_content")) -> List[ContextChunk]:
+    """ContextChunks from Pinecone/local-index matches; matches without a text field are skipped."""
+    chunks = []
+    for rank, match in enumerate(matches):
+        metadata = (match.get("metadata") if isinstance(match, dict) else getattr(match, "metadata", None)) or {}
+        score = match.get("score") if isinstance(match, dict) else getattr(match, "score", 0.0)
+        text = next((str(metadata[f]) for f in text_fields if metadata.get(f)), "")
+        if len(text.strip()) <= 10:
+            continue
+        chunks.append(ContextChunk(
+            text=text.strip(),
+            score=float(score or 0.0),
+            source=metadata.get("pdf_name") or metadata.get("source"),
+            page=metadata.get("page_num", metadata.get("page")),
+            order=rank,
+        ))
+    return chunks
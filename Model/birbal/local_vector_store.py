@@ -0,0 +1,398 @@
+import os
+import json
+import math
+import atexit
+import sqlite3
+import argparse
+import threading
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+import faiss
+
+
+# ================================================================
+# ------------------ LOCAL (OFFLINE) VECTOR INDEX -----------------
+# ================================================================
+#
+# Drop-in for a Pinecone `Index` object: `upsert`, `query`, `fetch`,
+# `delete` and `describe_index_stats` take the same arguments and return
+# the same shapes (dicts that also allow attribute access, so both
+# `res["matches"]` and `res.matches` work).
+#
+# Vectors live in an HNSW graph (cosine via normalized inner product) in
+# `<path>/index.faiss`; ids, metadata and the raw vectors live in a SQLite
+# sidecar `<path>/meta.sqlite`. SQLite is the source of truth: the FAISS
+# file is rewritten by `save()` and rebuilt from SQLite if it is missing
+# or stale. HNSW cannot delete in place, so overwritten/deleted vectors
+# are tombstoned and skipped at query time until `compact()` rebuilds;
+# that happens automatically once tombstones pass LOCAL_VECTOR_COMPACT_RATIO
+# of the index (and LOCAL_VECTOR_COMPACT_MIN vectors).
+
+HNSW_M = int(os.getenv("LOCAL_VECTOR_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_VECTOR_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("LOCAL_VECTOR_EF_SEARCH", "64"))
+COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.2"))
+COMPACT_MIN = int(os.getenv("LOCAL_VECTOR_COMPACT_MIN", "256"))
+# Most extra candidates a query asks HNSW for up front to skip tombstones
+MAX_OVERFETCH = int(os.getenv("LOCAL_VECTOR_MAX_OVERFETCH", "256"))
+
+
+class Record(dict):
+    """dict with attribute access, mirroring Pinecone response objects."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _compare(value, op: str, target) -> bool:
+    if op == "$eq":
+        return value == target
+    if op == "$ne":
+        return value != target
+    if op == "$in":
+        return value in target
+    if op == "$nin":
+        return value not in target
+    if value is None:
+        return False
+    if op == "$gt":
+        return value > target
+    if op == "$gte":
+        return value >= target
+    if op == "$lt":
+        return value < target
+    if op == "$lte":
+        return value <= target
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq/$ne/$in/$nin/$gt(e)/$lt(e)/$and/$or)."""
+    if not flt:
+        return True
+    for key, condition in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, op, target) for op, target in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str, dim: int = 384):
+        self.path = path
+        self.dim = dim
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._dirty = False
+
+        self.db = sqlite3.connect(os.path.join(path, "meta.sqlite"), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " pos INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL,"
+            " metadata TEXT,"
+            " vector BLOB NOT NULL,"
+            " deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS vectors_live_id ON vectors(id, deleted)")
+        self.db.commit()
+
+        self.index = self._load_index()
+        self._dead = self.db.execute("SELECT COUNT(*) FROM vectors WHERE deleted = 1").fetchone()[0]
+        atexit.register(self.save)
+
+    # ---------------- persistence ----------------
+
+    def _index_file(self) -> str:
+        return os.path.join(self.path, "index.faiss")
+
+    def _new_index(self):
+        index = faiss.IndexHNSWFlat(self.dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    def _load_index(self):
+        rows = self.db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        if os.path.exists(self._index_file()):
+            index = faiss.read_index(self._index_file())
+            if index.ntotal == rows and index.d == self.dim:
+                return index
+        # Missing or stale (e.g. crash before save): rebuild from the sidecar
+        return self._rebuild_from_db()
+
+    def _rebuild_from_db(self):
+        index = self._new_index()
+        cursor = self.db.execute("SELECT vector FROM vectors ORDER BY pos")
+        while True:
+            batch = cursor.fetchmany(4096)
+            if not batch:
+                break
+            index.add(np.vstack([np.frombuffer(v, dtype="float32") for (v,) in batch]))
+        self._dirty = True
+        return index
+
+    def save(self):
+        """Write the HNSW graph to disk (SQLite is committed on every write)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_file = self._index_file() + ".tmp"
+            faiss.write_index(self.index, tmp_file)
+            os.replace(tmp_file, self._index_file())
+            self._dirty = False
+
+    def compact(self):
+        """Drop tombstoned vectors and rebuild the graph."""
+        with self._lock:
+            rows = self.db.execute("SELECT id, metadata, vector FROM vectors WHERE deleted = 0 ORDER BY pos").fetchall()
+            self.db.execute("DELETE FROM vectors")
+            self.db.executemany(
+                "INSERT INTO vectors (pos, id, metadata, vector) VALUES (?, ?, ?, ?)",
+                [(pos, _id, meta, vec) for pos, (_id, meta, vec) in enumerate(rows)],
+            )
+            self.db.commit()
+            self.index = self._rebuild_from_db()
+            self._dead = 0
+            self.save()
+
+    def _maybe_compact(self):
+        total = self.index.ntotal
+        if self._dead >= COMPACT_MIN and self._dead > COMPACT_RATIO * total:
+            print(f"🧹 Compacting local vector store ({self._dead}/{total} tombstoned)")
+            self.compact()
+
+    # ---------------- Pinecone-compatible API ----------------
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = "", **kwargs) -> Record:
+        """Insert or overwrite vectors given as dicts {id, values, metadata} or (id, values[, metadata])."""
+        items = []
+        for v in vectors:
+            if isinstance(v, dict):
+                items.append((str(v["id"]), v["values"], v.get("metadata") or {}))
+            else:
+                items.append((str(v[0]), v[1], v[2] if len(v) > 2 else {}))
+        # Last write wins for ids repeated within one call
+        items = list({_id: (_id, values, meta) for _id, values, meta in items}.values())
+        if not items:
+            return Record(upserted_count=0)
+
+        matrix = _normalize(np.array([values for _, values, _ in items], dtype="float32"))
+        with self._lock:
+            ids = [_id for _id, _, _ in items]
+            self._tombstone(ids)
+            start = self.index.ntotal
+            self.index.add(matrix)
+            self.db.executemany(
+                "INSERT INTO vectors (pos, id, metadata, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (start + i, _id, json.dumps(meta), matrix[i].tobytes())
+                    for i, (_id, _, meta) in enumerate(items)
+                ],
+            )
+            self.db.commit()
+            self._dirty = True
+            self._maybe_compact()
+        return Record(upserted_count=len(items))
+
+    def _tombstone(self, ids: List[str]):
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            cursor = self.db.execute(f"UPDATE vectors SET deleted = 1 WHERE deleted = 0 AND id IN ({marks})", chunk)
+            self._dead += cursor.rowcount
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        include_metadata: bool = True,
+        include_values: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: str = "",
+        **kwargs,
+    ) -> Record:
+        query = _normalize(np.array([vector], dtype="float32"))
+        with self._lock:
+            total = self.index.ntotal
+            if total == 0:
+                return Record(matches=[], namespace=namespace)
+            # Over-fetch to make room for tombstones and filtered-out hits
+            # (in proportion to the tombstoned share, capped), widening
+            # until enough survive or the whole index was searched
+            wanted = top_k * (4 if filter else 1)
+            live_share = max(0.05, 1.0 - self._dead / total)
+            k = min(total, wanted + min(MAX_OVERFETCH, math.ceil(wanted / live_share) - wanted))
+            while True:
+                self.index.hnsw.efSearch = max(HNSW_EF_SEARCH, k)
+                scores, positions = self.index.search(query, k)
+                matches = self._collect(scores[0], positions[0], top_k, filter, include_metadata, include_values)
+                if len(matches) >= top_k or k >= total:
+                    break
+                k = min(total, k * 4)
+        return Record(matches=matches, namespace=namespace)
+
+    def _collect(self, scores, positions, top_k, flt, include_metadata, include_values) -> List[Record]:
+        valid = [(float(s), int(p)) for s, p in zip(scores, positions) if p >= 0]
+        if not valid:
+            return []
+        marks = ",".join("?" * len(valid))
+        rows = {
+            pos: (_id, meta, vec)
+            for pos, _id, meta, vec in self.db.execute(
+                f"SELECT pos, id, metadata, vector FROM vectors WHERE deleted = 0 AND pos IN ({marks})",
+                [p for _, p in valid],
+            )
+        }
+        matches = []
+        for score, pos in valid:
+            if pos not in rows:
+                continue
+            _id, meta, vec = rows[pos]
+            metadata = json.loads(meta) if meta else {}
+            if not matches_filter(metadata, flt):
+                continue
+            match = Record(id=_id, score=score)
+            if include_metadata:
+                match["metadata"] = metadata
+            if include_values:
+                match["values"] = np.frombuffer(vec, dtype="float32").tolist()
+            matches.append(match)
+            if len(matches) >= top_k:
+                break
+        return matches
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs) -> Record:
+        vectors = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = [str(x) for x in ids[i:i + 500]]
+                marks = ",".join("?" * len(chunk))
+                for _id, meta, vec in self.db.execute(
+                    f"SELECT id, metadata, vector FROM vectors WHERE deleted = 0 AND id IN ({marks})", chunk
+                ):
+                    vectors[_id] = Record(
+                        id=_id,
+                        values=np.frombuffer(vec, dtype="float32").tolist(),
+                        metadata=json.loads(meta) if meta else {},
+                    )
+        return Record(vectors=vectors, namespace=namespace)
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: str = "",
+        **kwargs,
+    ) -> Record:
+        with self._lock:
+            if delete_all:
+                self._dead += self.db.execute("UPDATE vectors SET deleted = 1 WHERE deleted = 0").rowcount
+            if ids:
+                self._tombstone([str(x) for x in ids])
+            if filter:
+                doomed = [
+                    pos for pos, meta in self.db.execute("SELECT pos, metadata FROM vectors WHERE deleted = 0")
+                    if matches_filter(json.loads(meta) if meta else {}, filter)
+                ]
+                self.db.executemany("UPDATE vectors SET deleted = 1 WHERE pos = ?", [(p,) for p in doomed])
+                self._dead += len(doomed)
+            self.db.commit()
+            self._maybe_compact()
+        return Record()
+
+    def describe_index_stats(self, **kwargs) -> Record:
+        with self._lock:
+            live = self.db.execute("SELECT COUNT(*) FROM vectors WHERE deleted = 0").fetchone()[0]
+            return Record(
+                dimension=self.dim,
+                total_vector_count=live,
+                index_fullness=0.0,
+                namespaces={"": Record(vector_count=live)},
+                tombstoned_count=self.index.ntotal - live,
+            )
+
+
+# ================================================================
+# ------------------- PINECONE -> LOCAL MIGRATION -----------------
+# ================================================================
+
+def migrate_from_pinecone(
+    api_key: str,
+    index_name: str,
+    out_path: str,
+    namespace: str = "",
+    host: Optional[str] = None,
+    batch_size: int = 100,
+) -> int:
+    """Copy every vector (values + metadata) of a Pinecone index into a local index."""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=api_key)
+    remote = pc.Index(index_name, host=host) if host else pc.Index(index_name)
+    dim = remote.describe_index_stats()["dimension"]
+    local = LocalVectorIndex(out_path, dim=dim)
+
+    copied = 0
+    for id_page in remote.list(namespace=namespace):
+        for i in range(0, len(id_page), batch_size):
+            fetched = remote.fetch(ids=id_page[i:i + batch_size], namespace=namespace)
+            local.upsert(
+                [
+                    {"id": v.id, "values": list(v.values), "metadata": dict(v.metadata or {})}
+                    for v in fetched.vectors.values()
+                ]
+            )
+            copied += len(fetched.vectors)
+        print(f"  migrated {copied} vectors...")
+    local.save()
+    return copied
+
+
+if __name__ == "__main__":
+    # python -m birbal.local_vector_store migrate --out ./vector_store
+    parser = argparse.ArgumentParser("local_vector_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="Export a Pinecone index into a local vector store")
+    migrate.add_argument("--index", default=os.getenv("PINECONE_INDEX_NAME", "coal-rag-index"))
+    migrate.add_argument("--host", default=os.getenv("PINECONE_INDEX_HOST"))
+    migrate.add_argument("--namespace", default="")
+    migrate.add_argument("--out", default=os.getenv("LOCAL_VECTOR_DIR", "vector_store"))
+
+    compact = sub.add_parser("compact", help="Drop tombstoned vectors and rebuild the HNSW graph")
+    compact.add_argument("--path", default=os.getenv("LOCAL_VECTOR_DIR", "vector_store"))
+    compact.add_argument("--dim", type=int, default=384)
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        total = migrate_from_pinecone(
+            os.getenv("PINECONE_API_KEY", ""), args.index, args.out, namespace=args.namespace, host=args.host
+        )
+        print(f"✅ Migrated {total} vectors from Pinecone '{args.index}' to {args.out}")
+    else:
+        store = LocalVectorIndex(args.path, dim=args.dim)
+        store.compact()
+        print(f"✅ Compacted {args.path}: {store.describe_index_stats()['total_vector_count']} live vectors")
@@ -0,0 +1,113 @@
+"""
+Tests for the RAG prompt context builder (birbal.context_builder)
+
+Run with: python -m pytest birbal/test_context_builder.py
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from birbal.context_builder import ContextBuilder, ContextChunk, estimate_tokens, split_sentences
+
+
+def words(start: int, stop: int) -> str:
+    return " ".join(f"w{i}" for i in range(start, stop))
+
+
+# ------------------------- dedup -------------------------
+
+def test_dedup_drops_near_copy_keeping_better_score():
+    text = words(0, 60)
+    near_copy = text.replace("w30", "x30")
+    chunks = [ContextChunk(near_copy, score=0.4, order=1), ContextChunk(text, score=0.9, order=0)]
+
+    kept = ContextBuilder(dedup_threshold=0.8).deduplicate(chunks)
+    assert [c.text for c in kept] == [text]
+
+
+def test_dedup_drops_chunk_contained_in_longer_one():
+    longer = ContextChunk(words(0, 200), score=0.9)
+    inside = ContextChunk(words(50, 80), score=0.5)
+
+    kept = ContextBuilder(dedup_threshold=0.8).deduplicate([inside, longer])
+    # Jaccard alone is ~0.14 here; containment catches it
+    assert kept == [longer]
+
+
+def test_dedup_keeps_distinct_and_partially_overlapping_chunks():
+    a = ContextChunk(words(0, 40), score=0.9)
+    b = ContextChunk(words(30, 70), score=0.8)  # overlapping window, mostly new text
+    c = ContextChunk(words(100, 140), score=0.7)
+
+    assert ContextBuilder(dedup_threshold=0.8).deduplicate([c, b, a]) == [a, b, c]
+
+
+# ------------------------- merge -------------------------
+
+def test_merge_same_page_restores_page_order_and_removes_seam():
+    first = ContextChunk(words(0, 20), score=0.5, source="a.pdf", page=3, order=1)
+    second = ContextChunk(words(15, 35), score=0.9, source="a.pdf", page=3, order=0)
+
+    (merged,) = ContextBuilder.merge_same_page([first, second])
+    # retrieved second-half first, but the text comes back in page order, once
+    assert merged.text == words(0, 35)
+    assert merged.score == 0.9 and merged.order == 0
+    assert (merged.source, merged.page) == ("a.pdf", 3)
+
+
+def test_merge_same_page_groups_by_page_and_sorts_by_score():
+    chunks = [
+        ContextChunk("page one text", score=0.2, source="a.pdf", page=1, order=0),
+        ContextChunk("page two text", score=0.7, source="a.pdf", page=2, order=1),
+        ContextChunk("more of page one", score=0.8, source="a.pdf", page=1, order=2),
+        ContextChunk("other file", score=0.5, source="b.pdf", page=1, order=3),
+    ]
+
+    merged = ContextBuilder.merge_same_page(chunks)
+    assert [(c.source, c.page) for c in merged] == [("a.pdf", 1), ("a.pdf", 2), ("b.pdf", 1)]
+    # no shared words at the seam: joined in retrieval order
+    assert merged[0].text == "page one text more of page one"
+    assert merged[0].order == 0
+
+
+def test_merge_same_page_leaves_unlabelled_chunks_apart():
+    chunks = [ContextChunk("alpha beta gamma", order=0), ContextChunk("delta epsilon zeta", order=1)]
+    assert len(ContextBuilder.merge_same_page(chunks)) == 2
+
+
+# ------------------------- budget -------------------------
+
+VOCAB = "grant proposal budget research team funding milestone risk outcome data".split() + ["अनुदान", "परियोजना"]
+
+
+def random_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(3, 30))).capitalize() + rng.choice(".!?")
+
+
+def test_selected_context_never_exceeds_budget():
+    rng = random.Random(7)
+    for _ in range(200):
+        budget = rng.randint(20, 400)
+        chunks = [
+            ContextChunk(
+                " ".join(random_sentence(rng) for _ in range(rng.randint(1, 12))),
+                score=rng.random(), source=f"doc{rng.randint(0, 3)}.pdf", page=rng.randint(1, 4), order=i,
+            )
+            for i in range(rng.randint(1, 10))
+        ]
+        built = ContextBuilder(token_budget=budget).build("research funding risk", chunks)
+        assert sum(estimate_tokens(c.text) for c in built.chunks) <= budget
+
+
+def test_selected_sentences_keep_their_order_within_a_chunk():
+    sentences = [f"Sentence number {i} talks about topic {i} in detail." for i in range(10)]
+    chunk = ContextChunk(" ".join(sentences), score=1.0, source="a.pdf", page=1)
+
+    built = ContextBuilder(token_budget=45).build("topic 7 and topic 2", [chunk])
+    picked = split_sentences(built.chunks[0].text)
+    assert picked == sorted(picked, key=sentences.index)
+    assert len(picked) < len(sentences)
@@ -0,0 +1,126 @@
+"""
+Tests for the offline FAISS/SQLite vector store (birbal.local_vector_store)
+
+Run with: python -m pytest birbal/test_local_vector_store.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from birbal import local_vector_store
+from birbal.local_vector_store import LocalVectorIndex
+
+DIM = 8
+
+
+def unit(i: int) -> list:
+    """A vector pointing along axis `i` (closest to itself, orthogonal to the others)."""
+    v = np.zeros(DIM, dtype="float32")
+    v[i % DIM] = 1.0
+    return v.tolist()
+
+
+def ids(result) -> list:
+    return [m["id"] for m in result["matches"]]
+
+
+def test_upsert_and_query(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([{"id": f"v{i}", "values": unit(i), "metadata": {"n": i}} for i in range(DIM)])
+
+    res = store.query(unit(3), top_k=2)
+    assert ids(res)[0] == "v3"
+    assert res.matches[0].metadata == {"n": 3}
+    assert store.describe_index_stats()["total_vector_count"] == DIM
+
+
+def test_overwrite_keeps_latest_value(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([("a", unit(0), {"v": 1}), ("b", unit(1), {})])
+    store.upsert([("a", unit(2), {"v": 2})])
+
+    assert ids(store.query(unit(2), top_k=1)) == ["a"]
+    assert store.fetch(["a"]).vectors["a"].metadata == {"v": 2}
+    stats = store.describe_index_stats()
+    assert stats["total_vector_count"] == 2
+    assert stats["tombstoned_count"] == 1
+
+
+def test_filter(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([(f"v{i}", unit(i), {"lang": "hi" if i % 2 else "en", "n": i}) for i in range(DIM)])
+
+    res = store.query(unit(0), top_k=3, filter={"lang": {"$eq": "hi"}})
+    assert len(res.matches) == 3
+    assert all(m.metadata["lang"] == "hi" for m in res.matches)
+    res = store.query(unit(0), top_k=10, filter={"$and": [{"n": {"$gte": 2}}, {"n": {"$lt": 4}}]})
+    assert sorted(ids(res)) == ["v2", "v3"]
+
+
+def test_delete_by_id_filter_and_all(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([(f"v{i}", unit(i), {"n": i}) for i in range(DIM)])
+
+    store.delete(ids=["v0"])
+    assert "v0" not in ids(store.query(unit(0), top_k=DIM))
+    store.delete(filter={"n": {"$in": [1, 2]}})
+    assert store.describe_index_stats()["total_vector_count"] == DIM - 3
+    store.delete(delete_all=True)
+    assert store.query(unit(4), top_k=3).matches == []
+
+
+def test_compact_drops_tombstones(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([(f"v{i}", unit(i), {}) for i in range(DIM)])
+    store.delete(ids=["v1", "v2"])
+    store.compact()
+
+    assert store.index.ntotal == DIM - 2
+    assert store.describe_index_stats()["tombstoned_count"] == 0
+    assert ids(store.query(unit(5), top_k=1)) == ["v5"]
+
+
+def test_auto_compact_after_many_overwrites(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "COMPACT_MIN", 4)
+    monkeypatch.setattr(local_vector_store, "COMPACT_RATIO", 0.3)
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([(f"v{i}", unit(i), {}) for i in range(DIM)])
+    for _ in range(3):
+        store.upsert([(f"v{i}", unit(i), {}) for i in range(4)])
+
+    # tombstones never pile up past the ratio, so queries stay near top_k
+    assert store.describe_index_stats()["tombstoned_count"] <= 0.3 * store.index.ntotal
+    assert store.describe_index_stats()["total_vector_count"] == DIM
+    assert ids(store.query(unit(2), top_k=1)) == ["v2"]
+
+
+def test_reload_from_disk(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([(f"v{i}", unit(i), {"n": i}) for i in range(DIM)])
+    store.delete(ids=["v3"])
+    store.save()
+    store.db.close()
+
+    reopened = LocalVectorIndex(str(tmp_path), dim=DIM)
+    assert reopened.index.ntotal == DIM
+    assert reopened.describe_index_stats()["total_vector_count"] == DIM - 1
+    assert ids(reopened.query(unit(6), top_k=1)) == ["v6"]
+    assert "v3" not in ids(reopened.query(unit(3), top_k=DIM))
+
+
+def test_reload_rebuilds_stale_graph(tmp_path):
+    store = LocalVectorIndex(str(tmp_path), dim=DIM)
+    store.upsert([("a", unit(0), {})])
+    store.save()
+    # written to SQLite but not saved to the FAISS file (e.g. a crash)
+    store.upsert([("b", unit(1), {})])
+    store.db.close()
+
+    reopened = LocalVectorIndex(str(tmp_path), dim=DIM)
+    assert reopened.index.ntotal == 2
+    assert ids(reopened.query(unit(1), top_k=1)) == ["b"]
@@ -1,14 +1,24 @@
 import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterator, AsyncIterator, Literal
 
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 from supabase import create_client, Client
 from pinecone import Pinecone, ServerlessSpec
 
+from birbal.local_vector_store import LocalVectorIndex
+from birbal.context_builder import ContextBuilder, BuiltContext, chunks_from_matches
+from birbal.answer_cache import bump_index_generation
+from Common.llm_client import llm
+from Common.streaming import stream_answer
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from numpy.linalg import norm
@@ -27,10 +37,17 @@ class Settings:
     supabase_url: str = os.getenv("SUPABASE_URL", "")
     supabase_key: str = os.getenv("SUPABASE_KEY", "")
     supabase_chunks_table: str = os.getenv("SUPABASE_CHUNKS_TABLE", "chunks")
+    supabase_order_column: str = os.getenv("SUPABASE_ORDER_COLUMN", "id")
+    ingest_page_size: int = int(os.getenv("INGEST_PAGE_SIZE", "500"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
 
     pinecone_api_key: str = os.getenv("PINECONE_API_KEY", "")
     pinecone_index_name: str = os.getenv("PINECONE_INDEX_NAME", "coal-rag-index")
 
+    # "pinecone" (default) or "local" (on-disk FAISS HNSW, see local_vector_store.py)
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "pinecone")
+    local_vector_dir: str = os.getenv("LOCAL_VECTOR_DIR", "vector_store")
+
     gcp_project: str = os.getenv("GOOGLE_CLOUD_PROJECT", "")
     gemini_location: str = os.getenv("GEMINI_LOCATION", "global")
     gemini_model_id: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
@@ -68,28 +85,18 @@ class SBERTEmbedder:
         if not sentences:
             return []
 
-        sentence_embeddings = np.array(self.model.encode(sentences, show_progress_bar=False))
+        # One batched encode, then all adjacent-sentence similarities at once
+        emb = np.asarray(self.model.encode(sentences, show_progress_bar=False), dtype=np.float32)
+        emb /= norm(emb, axis=1, keepdims=True) + 1e-8
+        adjacent_sim = np.einsum("ij,ij->i", emb[:-1], emb[1:])
+
+        # A new chunk starts wherever the topic shifts...
+        starts = np.concatenate(([0], np.flatnonzero(adjacent_sim < similarity_threshold) + 1, [len(sentences)]))
         chunks = []
-        current_chunk = [sentences[0]]
-        current_vec = sentence_embeddings[0]
-
-        def cos_sim(a, b):
-            return float(np.dot(a, b) / (norm(a) * norm(b) + 1e-8))
-
-        for i in range(1, len(sentences)):
-            sim = cos_sim(current_vec, sentence_embeddings[i])
-            if sim < similarity_threshold or len(current_chunk) >= max_sentences_per_chunk:
-                chunks.routerend(" ".join(current_chunk))
-                current_chunk = [sentences[i]]
-                current_vec = sentence_embeddings[i]
-            else:
-                current_chunk.routerend(sentences[i])
-                current_vec = (current_vec * len(current_chunk) + sentence_embeddings[i]) / (
-                    len(current_chunk) + 1e-8
-                )
-
-        if current_chunk:
-            chunks.routerend(" ".join(current_chunk))
+        for begin, end in zip(starts[:-1], starts[1:]):
+            # ...and long runs are split every max_sentences_per_chunk sentences
+            for i in range(begin, end, max_sentences_per_chunk):
+                chunks.append(" ".join(sentences[i:min(i + max_sentences_per_chunk, end)]))
 
         return chunks
 
@@ -111,6 +118,31 @@ class SupabaseChunkStore:
             query = query.limit(limit)
         return query.execute().data or []
 
+    def iter_chunk_pages(
+        self, page_size: int = 500, limit: int | None = None, order_column: str = "id"
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the table a page at a time (stable order) instead of loading it all."""
+        start = 0
+        while limit is None or start < limit:
+            end = start + page_size - 1
+            if limit is not None:
+                end = min(end, limit - 1)
+            rows = (
+                self.client.table(self.table_name)
+                .select("*")
+                .order(order_column)
+                .range(start, end)
+                .execute()
+                .data
+                or []
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < end - start + 1:
+                return
+            start = end + 1
+
 
 # ================================================================
 # ---------------------- PINECONE VECTOR DB ----------------------
@@ -138,21 +170,45 @@ class PineconeVectorStore:
                 spec=ServerlessSpec(cloud="aws", region="us-east-1"),
             )
 
+    @staticmethod
+    def chunk_to_vector_input(row: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]] | None:
+        """(id, text, metadata) for a Supabase chunk row; None if it has no text."""
+        text = row.get("chunk_text") or row.get("text") or row.get("content")
+        if not text:
+            return None
+
+        vec_id = str(row.get("uid") or row.get("id"))
+        metadata = {
+            "source": row.get("source"),
+            "pdf_name": row.get("pdf_name"),
+            "page_num": row.get("page_num") or row.get("page") or row.get("page_number"),
+            "chunk_text": text,
+        }
+        # Pinecone rejects null metadata values
+        metadata = {k: v for k, v in metadata.items() if v is not None}
+        metadata["content_hash"] = hashlib.sha1(repr(sorted(metadata.items())).encode("utf-8")).hexdigest()
+        return vec_id, text, metadata
+
+    def fetch_content_hashes(self, ids: List[str]) -> Dict[str, str]:
+        """content_hash stored with each already-indexed id (missing ids are omitted)."""
+        hashes = {}
+        for i in range(0, len(ids), 100):
+            res = self.index.fetch(ids=ids[i: i + 100])
+            for _id, vec in res.vectors.items():
+                meta = vec.metadata or {}
+                if meta.get("content_hash"):
+                    hashes[_id] = meta["content_hash"]
+        return hashes
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]]):
+        self.index.upsert(vectors=vectors)
+
     def upsert_chunks(self, chunks: List[Dict[str, Any]], embedder: SBERTEmbedder, batch_size: int = 64):
         vectors_batch = []
         for row in chunks:
-            text = row.get("chunk_text") or row.get("text") or row.get("content")
-            if not text:
-                continue
-
-            vec_id = str(row.get("uid") or row.get("id"))
-            metadata = {
-                "source": row.get("source"),
-                "pdf_name": row.get("pdf_name"),
-                "page_num": row.get("page_num") or row.get("page") or row.get("page_number"),
-                "chunk_text": text,
-            }
-            vectors_batch.routerend((vec_id, text, metadata))
+            item = self.chunk_to_vector_input(row)
+            if item:
+                vectors_batch.append(item)
 
         for i in range(0, len(vectors_batch), batch_size):
             batch = vectors_batch[i: i + batch_size]
@@ -164,7 +220,7 @@ class PineconeVectorStore:
 
             pine_vectors = []
             for _id, emb, meta in zip(ids, embeddings, metadata):
-                pine_vectors.routerend({"id": _id, "values": emb, "metadata": meta})
+                pine_vectors.append({"id": _id, "values": emb, "metadata": meta})
 
             self.index.upsert(vectors=pine_vectors)
 
@@ -177,6 +233,91 @@ class PineconeVectorStore:
         return res.get("matches", [])
 
 
+class LocalVectorStore(PineconeVectorStore):
+    """Same interface as PineconeVectorStore, backed by a local FAISS HNSW index."""
+
+    def __init__(self, path: str, dim: int = 384):
+        self.index_name = path
+        self.dim = dim
+        self.index = LocalVectorIndex(path, dim=dim)
+
+    def upsert_chunks(self, chunks: List[Dict[str, Any]], embedder: SBERTEmbedder, batch_size: int = 64):
+        super().upsert_chunks(chunks, embedder, batch_size)
+        self.index.save()
+
+    def flush(self):
+        self.index.save()
+
+
+def make_vector_store(cfg: Settings) -> PineconeVectorStore:
+    if cfg.vector_backend == "local":
+        return LocalVectorStore(cfg.local_vector_dir)
+    return PineconeVectorStore(cfg.pinecone_api_key, cfg.pinecone_index_name)
+
+
+# ================================================================
+# ------------------- STREAMING INGESTION ------------------------
+# ================================================================
+
+class StreamingIngester:
+    """
+    Page through the Supabase chunks table and index only new/changed chunks.
+
+    Each page's ids are looked up in the vector store and rows whose
+    `content_hash` is unchanged are skipped, so re-ingesting after adding one
+    PDF only embeds that PDF's chunks. Upserts run on a background thread
+    while the next batch is being embedded.
+    """
+
+    def __init__(self, source: SupabaseChunkStore, store: PineconeVectorStore, embedder: SBERTEmbedder,
+                 page_size: int = 500, batch_size: int = 64, order_column: str = "id"):
+        self.source = source
+        self.store = store
+        self.embedder = embedder
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.order_column = order_column
+
+    def run(self, limit: int | None = None) -> Dict[str, Any]:
+        stats = {"fetched": 0, "skipped_unchanged": 0, "embedded": 0, "upserted": 0}
+        started = time.perf_counter()
+        pending = []
+
+        with ThreadPoolExecutor(max_workers=1) as upserter:
+            for rows in self.source.iter_chunk_pages(self.page_size, limit, self.order_column):
+                stats["fetched"] += len(rows)
+                items = [item for item in map(self.store.chunk_to_vector_input, rows) if item]
+                existing = self.store.fetch_content_hashes([_id for _id, _, _ in items])
+                changed = [item for item in items if existing.get(item[0]) != item[2]["content_hash"]]
+                stats["skipped_unchanged"] += len(items) - len(changed)
+
+                for i in range(0, len(changed), self.batch_size):
+                    batch = changed[i: i + self.batch_size]
+                    embeddings = self.embedder.embed_texts([text for _, text, _ in batch])
+                    stats["embedded"] += len(batch)
+                    vectors = [
+                        {"id": _id, "values": emb, "metadata": meta}
+                        for (_id, _, meta), emb in zip(batch, embeddings)
+                    ]
+                    # Keep at most one upsert in flight behind the embedder
+                    if pending:
+                        pending.pop(0).result()
+                    pending.append(upserter.submit(self.store.upsert_vectors, vectors))
+                    stats["upserted"] += len(vectors)
+
+            for future in pending:
+                future.result()
+
+        if hasattr(self.store, "flush"):
+            self.store.flush()
+
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 2)
+        stats["chunks_per_second"] = round(stats["fetched"] / elapsed, 1) if elapsed else 0.0
+        stats["embedded_per_second"] = round(stats["embedded"] / elapsed, 1) if elapsed else 0.0
+        return stats
+
+
 # ================================================================
 # ---------------------- GEMINI RAG MODEL ------------------------
 # ================================================================
@@ -188,16 +329,10 @@ class GeminiRAGModel:
             raise ValueError("COMMON_GEMINI_KEY missing in environment")
 
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_id)
-
-    def build_prompt(self, question: str, contexts: List[Dict[str, Any]]) -> str:
-        blocks = []
-        for i, m in enumerate(contexts, start=1):
-            meta = m.get("metadata", {})
-            blocks.routerend(
-                f"[DOC {i} | {meta.get('pdf_name')} | page {meta.get('page_num')}]\n{meta.get('chunk_text')}\n"
-            )
-        context_str = "\n".join(blocks)
+        self.model_id = model_id
+
+    def build_prompt(self, question: str, context: BuiltContext) -> str:
+        context_str = context.text
 
         return f"""
 You answer questions ONLY using the retrieved PDF chunks below.
@@ -211,10 +346,14 @@ QUESTION:
 Give a clear answer using only the above context.
 """.strip()
 
-    def generate_answer(self, question: str, contexts: List[Dict[str, Any]]) -> str:
-        prompt = self.build_prompt(question, contexts)
-        response = self.model.generate_content(prompt)
-        return response.text
+    def generate_answer(self, question: str, context: BuiltContext) -> Tuple[str, Dict[str, Any]]:
+        """Answer text and the context/prompt token stats."""
+        prompt = self.build_prompt(question, context)
+        result = llm.generate_sync(prompt, model=self.model_id, route="birbal")
+        return result.text, context.report(prompt, result.response)
+
+    def stream_answer(self, question: str, context: BuiltContext) -> AsyncIterator[str]:
+        return llm.stream(self.build_prompt(question, context), model=self.model_id, route="birbal")
 
 
 # ================================================================
@@ -223,21 +362,35 @@ Give a clear answer using only the above context.
 
 class RAGChatbot:
     def __init__(self, cfg: Settings):
+        self.cfg = cfg
         self.embedder = SBERTEmbedder(cfg.sbert_model_name)
         self.supabase_store = SupabaseChunkStore(cfg.supabase_url, cfg.supabase_key, cfg.supabase_chunks_table)
-        self.vector_store = PineconeVectorStore(cfg.pinecone_api_key, cfg.pinecone_index_name)
+        self.vector_store = make_vector_store(cfg)
         self.llm = GeminiRAGModel(cfg.gcp_project, cfg.gemini_location, cfg.gemini_model_id)
+        # Dedup/merge retrieved chunks and trim them to CONTEXT_TOKEN_BUDGET
+        self.context_builder = ContextBuilder(embed=self.embedder.embed_texts)
+
+    def ingest_supabase_chunks_to_pinecone(self, limit: int | None = None) -> Dict[str, Any]:
+        ingester = StreamingIngester(
+            self.supabase_store,
+            self.vector_store,
+            self.embedder,
+            page_size=self.cfg.ingest_page_size,
+            batch_size=self.cfg.ingest_batch_size,
+            order_column=self.cfg.supabase_order_column,
+        )
+        return ingester.run(limit)
 
-    def ingest_supabase_chunks_to_pinecone(self, limit: int | None = None):
-        chunks = self.supabase_store.fetch_chunks(limit)
-        self.vector_store.upsert_chunks(chunks, self.embedder)
-        return len(chunks)
-
-    def answer_question(self, question: str, top_k: int = 8):
+    def retrieve(self, question: str, top_k: int = 8) -> Tuple[List[Dict[str, Any]], BuiltContext]:
+        """Retrieved matches and the prompt context built from them."""
         emb = self.embedder.embed_query(question)
         matches = self.vector_store.query(emb, top_k=top_k)
-        answer = self.llm.generate_answer(question, matches)
-        return answer, matches
+        return matches, self.context_builder.build(question, chunks_from_matches(matches), emb)
+
+    def answer_question(self, question: str, top_k: int = 8):
+        matches, context = self.retrieve(question, top_k)
+        answer, stats = self.llm.generate_answer(question, context)
+        return answer, matches, stats
 
 
 # ================================================================
@@ -257,18 +410,50 @@ class AskRequest(BaseModel):
 class AskResponse(BaseModel):
     answer: str
     retrieved: List[Dict[str, Any]]
+    context_stats: Dict[str, Any] = {}
 
 
 @router.post("/ingest")
 def ingest(limit: int | None = None):
-    count = chatbot.ingest_supabase_chunks_to_pinecone(limit)
-    return {"message": f"Ingestion completed for {count} chunks."}
+    stats = chatbot.ingest_supabase_chunks_to_pinecone(limit)
+    if stats["embedded"]:
+        # Cached chat answers may now be out of date
+        bump_index_generation()
+    return {
+        "message": f"Ingestion completed for {stats['fetched']} chunks "
+                   f"({stats['embedded']} new or changed, {stats['skipped_unchanged']} unchanged).",
+        "stats": stats,
+    }
 
 
 @router.post("/ask", response_model=AskResponse)
 def ask(req: AskRequest):
-    answer, retrieved = chatbot.answer_question(req.question, req.top_k)
-    return AskResponse(answer=answer, retrieved=retrieved)
+    answer, retrieved, stats = chatbot.answer_question(req.question, req.top_k)
+    return AskResponse(answer=answer, retrieved=retrieved, context_stats=stats)
+
+
+def match_to_dict(match) -> Dict[str, Any]:
+    return {
+        "id": match.get("id"),
+        "score": float(match.get("score") or 0.0),
+        "metadata": dict(match.get("metadata") or {}),
+    }
+
+
+@router.post("/ask/stream")
+async def ask_stream(
+    req: AskRequest,
+    request: Request,
+    fmt: Literal["sse", "ndjson"] = Query("sse", alias="format"),
+):
+    """/ask with the retrieved chunks sent first and the answer streamed as it is generated."""
+    retrieved, context = await run_in_threadpool(chatbot.retrieve, req.question, req.top_k)
+    sources = [match_to_dict(m) for m in retrieved]
+    prompt_stats = context.report(chatbot.llm.build_prompt(req.question, context))
+    return stream_answer(
+        request, sources, chatbot.llm.stream_answer(req.question, context), fmt,
+        done={"context_stats": prompt_stats}
+    )
 
 
 @router.get("/")
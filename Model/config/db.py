@@ -3,10 +3,23 @@ import sys
 from pymongo import MongoClient
 import dotenv
 dotenv.load_dotenv()
+
+# Connection settings shared by the sync (pymongo) and async (Motor) clients
+MONGO_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI")
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+}
+
+_motor_client = None
+
 def connect_db():
     try:
-        mongo_uri = os.getenv("MONGODB_URI")
-        client = MongoClient(mongo_uri)
+        mongo_uri = MONGO_URI
+        client = MongoClient(mongo_uri, **MONGO_POOL_OPTIONS)
         # Test the connection
         client.admin.command('ping')
         print(f"MongoDB Connected: {client.address[0]}:{client.address[1]}")
@@ -15,6 +28,16 @@ def connect_db():
         print(f"Database connection error: {error}")
         sys.exit(1)
 
+def get_motor_client():
+    """Process-wide async client (lazily created; Motor connects on first use)."""
+    global _motor_client
+    if _motor_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        if not MONGO_URI:
+            raise ValueError("MONGO_URI or MONGODB_URI not found in environment variables")
+        _motor_client = AsyncIOMotorClient(MONGO_URI, **MONGO_POOL_OPTIONS)
+    return _motor_client
+
 # Example usage
 if __name__ == "__main__":
     db_client = connect_db()
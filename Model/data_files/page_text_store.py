@@ -0,0 +1,146 @@
+import os
+import json
+import mmap
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import PyPDF2
+
+
+# ================================================================
+# Per-page text store for source PDFs
+# ================================================================
+#
+# Each PDF is extracted once into two files next to each other:
+#   <name>.pages.bin   UTF-8 text of every page, concatenated
+#   <name>.pages.json  {"source", "size", "mtime", "offsets": [...]}
+# where page N (1-based) is bin[offsets[N-1]:offsets[N]]. The .bin file is
+# memory-mapped, so a lookup is two array reads and one slice, with no PDF
+# parsing. Stores are rebuilt automatically when the PDF changes.
+
+PAGE_TEXT_DIR = os.getenv(
+    "PAGE_TEXT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".page_text")
+)
+
+
+def pdf_version(pdf_path: str) -> Tuple[int, float]:
+    """(size, mtime) of a PDF; a store is stale once this changes."""
+    stat = os.stat(pdf_path)
+    return stat.st_size, stat.st_mtime
+
+
+def extract_pages(pdf_path: str) -> List[str]:
+    """Text of every page (same extraction the source viewer has always used)."""
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+class PageTextStore:
+    def __init__(self, pdf_path: str, store_dir: str = PAGE_TEXT_DIR):
+        self.pdf_path = pdf_path
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        self.bin_path = os.path.join(store_dir, f"{name}.pages.bin")
+        self.meta_path = os.path.join(store_dir, f"{name}.pages.json")
+        self._mmap: Optional[mmap.mmap] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.version: Optional[Tuple[int, float]] = None  # PDF (size, mtime) the store was built from
+
+    def _is_fresh(self) -> bool:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            stat = os.stat(self.pdf_path)
+        except (OSError, ValueError):
+            return False
+        return (
+            meta.get("size") == stat.st_size
+            and meta.get("mtime") == stat.st_mtime
+            and os.path.exists(self.bin_path)
+        )
+
+    def is_current(self) -> bool:
+        """True while the PDF on disk is still the one this opened store was built from."""
+        try:
+            return self.version == pdf_version(self.pdf_path)
+        except OSError:
+            return False
+
+    def build(self) -> int:
+        """Extract the PDF and (atomically) write the store; returns the page count."""
+        pages = [text.encode("utf-8") for text in extract_pages(self.pdf_path)]
+        offsets = [0]
+        for data in pages:
+            offsets.append(offsets[-1] + len(data))
+
+        store_dir = os.path.dirname(self.bin_path)
+        os.makedirs(store_dir, exist_ok=True)
+        if not os.path.exists(os.path.join(store_dir, ".gitignore")):
+            # Generated files; keep them out of version control
+            with open(os.path.join(store_dir, ".gitignore"), "w") as f:
+                f.write("*\n")
+        stat = os.stat(self.pdf_path)
+        tmp_bin, tmp_meta = self.bin_path + ".tmp", self.meta_path + ".tmp"
+        with open(tmp_bin, "wb") as f:
+            for data in pages:
+                f.write(data)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": os.path.basename(self.pdf_path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "offsets": offsets,
+            }, f)
+        os.replace(tmp_bin, self.bin_path)
+        os.replace(tmp_meta, self.meta_path)
+        return len(pages)
+
+    def open(self) -> "PageTextStore":
+        """Build if missing/stale, then map the text file into memory."""
+        if not self._is_fresh():
+            self.build()
+        with open(self.meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.offsets = np.asarray(meta["offsets"], dtype=np.int64)
+        self.version = (meta["size"], meta["mtime"])
+        if self.offsets[-1] > 0:
+            with open(self.bin_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    @property
+    def total_pages(self) -> int:
+        return len(self.offsets) - 1
+
+    def page(self, number: int) -> Optional[str]:
+        """Text of 1-based page `number`, or None if out of range."""
+        if number < 1 or number > self.total_pages:
+            return None
+        start, end = int(self.offsets[number - 1]), int(self.offsets[number])
+        if start == end:
+            return ""
+        return self._mmap[start:end].decode("utf-8")
+
+
+_stores: Dict[str, PageTextStore] = {}
+
+
+def get_page_store(pdf_path: str) -> PageTextStore:
+    """Opened store for a PDF (one per path per process, reopened when the PDF changes)."""
+    store = _stores.get(pdf_path)
+    if store is None or not store.is_current():
+        store = PageTextStore(pdf_path).open()
+        _stores[pdf_path] = store
+    return store
+
+
+if __name__ == "__main__":
+    # Build-time extraction: python data_files/page_text_store.py data_files/*.pdf
+    parser = argparse.ArgumentParser("page_text_store")
+    parser.add_argument("pdfs", nargs="+", help="PDF files to pre-extract")
+    args = parser.parse_args()
+    for path in args.pdfs:
+        count = PageTextStore(path).build()
+        print(f"✅ {os.path.basename(path)}: {count} pages")
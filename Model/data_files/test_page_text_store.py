@@ -0,0 +1,53 @@
+"""
+Tests for the per-page source text store (data_files.page_text_store)
+
+Run with: python -m pytest data_files/test_page_text_store.py
+"""
+
+import io
+import os
+import sys
+from pathlib import Path
+
+from reportlab.pdfgen import canvas
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data_files import page_text_store
+from data_files.page_text_store import PageTextStore, get_page_store
+
+
+def write_pdf(path, pages):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+    path.write_bytes(buffer.getvalue())
+
+
+def test_pages_round_trip(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    write_pdf(pdf_path, ["First page", "Second page"])
+    store = PageTextStore(str(pdf_path), store_dir=str(tmp_path / "store")).open()
+
+    assert store.total_pages == 2
+    assert "Second page" in store.page(2)
+    assert store.page(0) is None and store.page(3) is None
+
+
+def test_get_page_store_reopens_changed_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(PageTextStore.__init__, "__defaults__", (str(tmp_path / "store"),))
+    monkeypatch.setattr(page_text_store, "_stores", {})
+    pdf_path = tmp_path / "doc.pdf"
+    write_pdf(pdf_path, ["Old text"])
+    assert "Old text" in get_page_store(str(pdf_path)).page(1)
+
+    write_pdf(pdf_path, ["New text", "Added page"])
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    store = get_page_store(str(pdf_path))
+    assert store.total_pages == 2
+    assert "New text" in store.page(1)
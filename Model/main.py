@@ -32,6 +32,8 @@ from data_files import file_storage
 from Common.ai_validator import ai_detector_pipeline
 from ai_validaton import validation
 from Report import report_gen
+from Common.llm_client import llm_metrics
+from Common.prompt_cache import prompt_cache_stats
 app = FastAPI()
 
 # Allow CORS for frontend
@@ -69,6 +71,13 @@ app.include_router(embeddings.router)
 app.include_router(proposal_chat.router)
 app.include_router(source_fetcher.router)
 # app.include_router(online_checker.app)
+
+
+@app.get("/llm/metrics")
+async def llm_usage_metrics():
+    """Per-route LLM latency/retries/tokens and per-prefix prompt cache usage (this process)."""
+    return {"routes": llm_metrics(), "prompt_cache": prompt_cache_stats()}
+
 # -----------------------------
 # Run FastAPI directly with Python
 # -----------------------------
@@ -6,43 +6,35 @@ from typing import List, Dict, Optional
 from fastapi import APIRouter, UploadFile, File
 from fastapi.responses import JSONResponse
 
-try:
-    import easyocr
-except Exception:
-    easyocr = None
-
 from PIL import Image
 import numpy as np
 import cv2
 
-router = APIRouter()
-
-# Cache reader to avoid reinitialization cost
-_OCR_READER = None
-
+# Shared with the /non-ocr converter so only one OCR framework is loaded per process
+from non_ocr.engine import get_ocr_engine, ocr_engine_tag
+from non_ocr.ocr_cache import bytes_cache_key, get_ocr_cache
 
-def get_easyocr_reader():
-    global _OCR_READER
-    if _OCR_READER is not None:
-        return _OCR_READER
-    if easyocr is None:
-        return None
-    try:
-        _OCR_READER = easyocr.Reader(["en"], gpu=False)
-    except Exception:
-        _OCR_READER = None
-    return _OCR_READER
+router = APIRouter()
 
 
 def run_ocr_on_bytes(file_bytes: bytes) -> str:
-    """Run OCR on raw image bytes using EasyOCR and return extracted text.
+    """Run OCR on raw image bytes with the shared OCR engine and return extracted text.
 
-    Returns plain text with newline-separated lines. If `easyocr` is not installed,
-    raises an informative RuntimeError.
+    Returns plain text with newline-separated lines. If no OCR backend is installed,
+    raises an informative RuntimeError. Results are cached on disk by the hash of
+    the uploaded bytes, so re-uploaded images skip recognition.
     """
-    reader = get_easyocr_reader()
-    if reader is None:
-        raise RuntimeError("`easyocr` is not installed or failed to initialize. Install it with `pip install easyocr`.")
+    cache = get_ocr_cache()
+    cache_key = None
+    if cache.enabled:
+        cache_key = bytes_cache_key(file_bytes, ocr_engine_tag(), "lines")
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    engine = get_ocr_engine()
+    if engine is None:
+        raise RuntimeError("No OCR engine is available. Install `easyocr` or `paddleocr` and set OCR_BACKEND.")
 
     # Load image into numpy array
     img_arr = np.frombuffer(file_bytes, np.uint8)
@@ -54,18 +46,20 @@ def run_ocr_on_bytes(file_bytes: bytes) -> str:
         except Exception as e:
             raise RuntimeError(f"Unable to read image bytes: {e}")
 
-    # EasyOCR expects RGB image in numpy array
+    # OCR engines expect RGB image in numpy array
     img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
     # Run text detection/recognition
     try:
-        results = reader.readtext(img_rgb, detail=0, paragraph=False)
+        results = engine.recognize(img_rgb)
     except Exception as e:
-        raise RuntimeError(f"EasyOCR failed: {e}")
+        raise RuntimeError(f"OCR ({engine.name}) failed: {e}")
 
-    # results is list of strings
-    lines = [r.strip() for r in results if r and r.strip()]
-    return "\n".join(lines)
+    lines = [r["text"].strip() for r in results if r["text"] and r["text"].strip()]
+    text = "\n".join(lines)
+    if cache_key:
+        cache.put(cache_key, text)
+    return text
 
 
 def parse_text_to_project_plan(text: str) -> Dict:
@@ -191,7 +185,7 @@ async def process_non_ocr(file: UploadFile = File(...)):
     """
     try:
         content = await file.read()
-        # Run easyocr on bytes; will raise if easyocr not installed
+        # Run OCR on bytes; will raise if no OCR backend is installed
         text = run_ocr_on_bytes(content)
         plan = parse_text_to_project_plan(text)
         return JSONResponse(content=plan)
@@ -220,7 +214,7 @@ if __name__ == "__main__":
     try:
         text = run_ocr_on_bytes(b)
     except RuntimeError:
-        # if easyocr not available, try reading as plain text
+        # if no OCR backend is available, try reading as plain text
         try:
             text = b.decode("utf-8", errors="ignore")
         except Exception:
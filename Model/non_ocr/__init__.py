@@ -5,15 +5,35 @@ This module provides functionality to convert scanned/non-OCR PDFs into searchab
 """
 
 from .converter import (
+    classify_pdf_pages,
     convert_pdf_to_ocr,
+    convert_pdf_to_ocr_file,
+    convert_pdf_to_ocr_selective,
+    get_ocr_pool,
     is_pdf_ocr,
+    iter_ocr_results,
+    iter_pdf_page_images,
+    plan_adaptive_pages,
+    plan_page_dpi,
     process_image_to_ocr_pdf,
     router
 )
+from .batch import run_batch
+from .engine import get_ocr_engine
 
 __all__ = [
+    'classify_pdf_pages',
     'convert_pdf_to_ocr',
+    'convert_pdf_to_ocr_file',
+    'convert_pdf_to_ocr_selective',
+    'get_ocr_engine',
+    'get_ocr_pool',
     'is_pdf_ocr',
+    'iter_ocr_results',
+    'iter_pdf_page_images',
+    'plan_adaptive_pages',
+    'plan_page_dpi',
     'process_image_to_ocr_pdf',
-    'router'
+    'router',
+    'run_batch'
 ]
@@ -0,0 +1,198 @@
+"""
+Batch PDF to OCR Conversion
+
+Converts a directory (or glob) of scanned PDFs/images into searchable OCR PDFs.
+Each worker process initializes the OCR engine once and keeps it warm for every file
+it handles. Existing outputs are skipped so interrupted backfills can resume,
+and one JSON line per file is appended to a manifest.
+"""
+
+import os
+import glob
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional
+
+try:
+    from .converter import convert_pdf_to_ocr_file, process_image_to_ocr_pdf
+    from .engine import get_ocr_engine
+except ImportError:
+    from converter import convert_pdf_to_ocr_file, process_image_to_ocr_pdf
+    from engine import get_ocr_engine
+
+
+PDF_EXTENSIONS = {'.pdf'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+MANIFEST_NAME = 'ocr_manifest.jsonl'
+
+
+def collect_inputs(source: str) -> List[Path]:
+    """
+    Resolve a directory or glob pattern to the list of convertible files.
+
+    Args:
+        source: Directory (top level only) or glob pattern (`**` is recursive)
+
+    Returns:
+        Sorted list of PDF/image paths; previous `*_ocr.pdf` outputs are excluded
+    """
+    if os.path.isdir(source):
+        candidates = [str(p) for p in Path(source).iterdir()]
+    else:
+        candidates = glob.glob(source, recursive=True)
+
+    files = []
+    for candidate in candidates:
+        path = Path(candidate)
+        if not path.is_file() or path.stem.endswith('_ocr'):
+            continue
+        if path.suffix.lower() in PDF_EXTENSIONS | IMAGE_EXTENSIONS:
+            files.append(path)
+    return sorted(files)
+
+
+def _source_root(source: str) -> Path:
+    """Directory part of `source` before the first glob wildcard."""
+    if os.path.isdir(source):
+        return Path(source)
+    parts = []
+    for part in Path(source).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path('.')
+
+
+def output_path_for(input_path: Path, output_dir: Optional[Path] = None) -> Path:
+    """Return the OCR PDF path for an input (same naming as the single-file CLI)."""
+    return (output_dir or input_path.parent) / f"{input_path.stem}_ocr.pdf"
+
+
+def convert_file(
+    input_path: str,
+    output_path: str,
+    dpi: int = 300,
+    selective: bool = False,
+    adaptive: bool = False,
+    crop: bool = False
+) -> dict:
+    """
+    Convert one file and return its manifest entry. Never raises.
+
+    Output is written to a `.part` file and renamed on success, so a crash
+    mid-file never leaves an output that a resumed run would skip.
+    """
+    started = time.perf_counter()
+    entry = {'input': input_path, 'output': output_path}
+    partial_path = output_path + '.part'
+    try:
+        with open(input_path, 'rb') as f:
+            file_bytes = f.read()
+
+        if Path(input_path).suffix.lower() in PDF_EXTENSIONS:
+            metadata = convert_pdf_to_ocr_file(
+                file_bytes,
+                partial_path,
+                dpi=dpi,
+                selective=selective,
+                adaptive=adaptive,
+                crop=crop
+            )
+        else:
+            pdf_bytes, metadata = process_image_to_ocr_pdf(file_bytes, os.path.basename(input_path))
+            with open(partial_path, 'wb') as f:
+                f.write(pdf_bytes)
+
+        os.replace(partial_path, output_path)
+        entry.update({
+            'status': metadata['status'],
+            'pages': metadata.get('pages_total', metadata['pages_processed']),
+            'pages_ocrd': metadata['pages_processed'],
+            'text_length': metadata['text_length']
+        })
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        entry.update({'status': 'error', 'error': str(e)})
+
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    entry['worker_pid'] = os.getpid()
+    return entry
+
+
+def run_batch(
+    source: str,
+    output_dir: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+    workers: int = 0,
+    dpi: int = 300,
+    selective: bool = False,
+    adaptive: bool = False,
+    crop: bool = False,
+    on_result: Optional[Callable[[dict, int, int], None]] = None
+) -> dict:
+    """
+    Convert every file matched by `source`, resuming past existing outputs.
+
+    Args:
+        source: Directory or glob pattern
+        output_dir: Where OCR PDFs go (default: next to each input)
+        manifest_path: JSONL manifest (default: <output_dir or source dir>/ocr_manifest.jsonl)
+        workers: Files converted concurrently, one warm OCR engine per process
+            (0 or 1 = sequentially in this process)
+        dpi, selective, adaptive, crop: Passed through to the converter
+        on_result: Optional callback(entry, done, total) after each file
+
+    Returns:
+        Summary with counts per status, total pages and elapsed time
+    """
+    inputs = collect_inputs(source)
+    out_dir = Path(output_dir) if output_dir else None
+    if out_dir:
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    if manifest_path is None:
+        manifest_path = str((out_dir or _source_root(source)) / MANIFEST_NAME)
+
+    options = {'dpi': dpi, 'selective': selective, 'adaptive': adaptive, 'crop': crop}
+    summary = {'files': len(inputs), 'pages': 0, 'manifest': manifest_path}
+    started = time.perf_counter()
+    done = 0
+
+    with open(manifest_path, 'a', encoding='utf-8') as manifest:
+        def record(entry):
+            nonlocal done
+            done += 1
+            summary[entry['status']] = summary.get(entry['status'], 0) + 1
+            summary['pages'] += entry.get('pages', 0)
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            if on_result:
+                on_result(entry, done, len(inputs))
+
+        pending = []
+        for input_path in inputs:
+            output_path = output_path_for(input_path, out_dir)
+            if output_path.exists():
+                record({'input': str(input_path), 'output': str(output_path), 'status': 'skipped', 'seconds': 0.0})
+            else:
+                pending.append((str(input_path), str(output_path)))
+
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=get_ocr_engine
+            ) as executor:
+                futures = [executor.submit(convert_file, i, o, **options) for i, o in pending]
+                for future in as_completed(futures):
+                    record(future.result())
+        else:
+            for input_path, output_path in pending:
+                record(convert_file(input_path, output_path, **options))
+
+    summary['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return summary
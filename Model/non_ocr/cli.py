@@ -7,26 +7,76 @@ import argparse
 from pathlib import Path
 
 from converter import convert_pdf_to_ocr, is_pdf_ocr, process_image_to_ocr_pdf
+from batch import run_batch
 
 
-def progress_callback(current, total):
-    """Display progress bar."""
+def progress_callback(current, total, stats=None):
+    """Display progress bar (with throughput when OCR runs on a worker pool)."""
     percent = (current / total) * 100
     bar_length = 50
     filled = int(bar_length * current / total)
     bar = '█' * filled + '░' * (bar_length - filled)
-    print(f'\r  Progress: [{bar}] {percent:.1f}% ({current}/{total})', end='', flush=True)
+    rate = ''
+    if stats:
+        rate = (f" {stats['pages_per_second']:.2f} pages/s,"
+                f" {stats['pages_per_second_per_worker']:.2f}/worker")
+    print(f'\r  Progress: [{bar}] {percent:.1f}% ({current}/{total}){rate}', end='', flush=True)
     if current == total:
         print()  # New line when complete
 
 
+def batch_progress(entry, done, total):
+    """Print one line per finished file in batch mode."""
+    status = entry['status']
+    icon = {'success': '✓', 'already_ocr': '✓', 'skipped': '↷'}.get(status, '✗')
+    if status == 'skipped':
+        detail = 'output exists'
+    else:
+        detail = entry.get('error') or f"{entry.get('pages', 0)} pages, {entry['seconds']}s"
+    print(f"  [{done}/{total}] {icon} {Path(entry['input']).name}: {status} ({detail})")
+
+
+def main_batch(args):
+    """Convert every file in a directory or glob, skipping finished outputs."""
+    print(f"\n{'='*60}")
+    print(f"Batch converting to OCR PDF")
+    print(f"{'='*60}")
+    print(f"Input:   {args.input}")
+    print(f"Output:  {args.output_dir or 'next to each input'}")
+    print(f"Workers: {args.workers or 'in-process'} (files in parallel)")
+    print(f"{'='*60}\n")
+    
+    summary = run_batch(
+        args.input,
+        output_dir=args.output_dir,
+        manifest_path=args.manifest,
+        workers=args.workers,
+        dpi=args.dpi,
+        selective=args.selective,
+        adaptive=args.adaptive_dpi,
+        crop=args.crop,
+        on_result=batch_progress
+    )
+    
+    print(f"\n{'='*60}")
+    print(f"  Files:     {summary['files']}")
+    for status in ('success', 'already_ocr', 'skipped', 'error'):
+        if summary.get(status):
+            print(f"  {status + ':':<10} {summary[status]}")
+    print(f"  Pages:     {summary['pages']}")
+    print(f"  Elapsed:   {summary['elapsed_seconds']}s")
+    print(f"  Manifest:  {summary['manifest']}")
+    print(f"{'='*60}\n")
+    sys.exit(1 if summary.get('error') else 0)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert non-OCR PDFs to searchable OCR PDFs'
     )
     parser.add_argument(
         'input',
-        help='Input PDF or image file'
+        help='Input PDF or image file, or a directory/glob for batch mode'
     )
     parser.add_argument(
         '-o', '--output',
@@ -39,6 +89,38 @@ def main():
         default=300,
         help='DPI for PDF to image conversion (default: 300)'
     )
+    parser.add_argument(
+        '--adaptive-dpi',
+        action='store_true',
+        help='Choose the DPI per page from a low-DPI text probe (--dpi becomes the maximum)'
+    )
+    parser.add_argument(
+        '--crop',
+        action='store_true',
+        help='With --adaptive-dpi, only recognize the detected text region'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='OCR worker processes, each with its own OCR engine (default: 0 = in-process); '
+             'in batch mode, files converted in parallel'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default=None,
+        help='Batch mode: directory for OCR PDFs (default: next to each input)'
+    )
+    parser.add_argument(
+        '--manifest',
+        default=None,
+        help='Batch mode: JSONL manifest path (default: ocr_manifest.jsonl in the output/input directory)'
+    )
+    parser.add_argument(
+        '--selective',
+        action='store_true',
+        help='Only OCR pages without a text layer (for mixed typed/scanned PDFs)'
+    )
     parser.add_argument(
         '--check-only',
         action='store_true',
@@ -47,6 +129,15 @@ def main():
     
     args = parser.parse_args()
     
+    # Directories and glob patterns run in batch mode
+    if Path(args.input).is_dir() or any(c in args.input for c in '*?['):
+        # Single-file options would otherwise be silently ignored
+        if args.output:
+            parser.error("-o/--output names a single file; use --output-dir in batch mode")
+        if args.check_only:
+            parser.error("--check-only works on a single PDF, not a directory or glob")
+        main_batch(args)
+    
     # Read input file
     input_path = Path(args.input)
     
@@ -91,7 +182,9 @@ def main():
     print(f"{'='*60}")
     print(f"Input:  {input_path}")
     print(f"Output: {output_path}")
-    print(f"DPI:    {args.dpi}")
+    print(f"DPI:    {'adaptive, max ' if args.adaptive_dpi else ''}{args.dpi}")
+    print(f"Mode:   {'selective' if args.selective else 'full'}")
+    print(f"Workers: {args.workers or 'in-process'}")
     print(f"{'='*60}\n")
     
     try:
@@ -99,7 +192,11 @@ def main():
             ocr_pdf, metadata = convert_pdf_to_ocr(
                 file_bytes,
                 dpi=args.dpi,
-                progress_callback=progress_callback
+                progress_callback=progress_callback,
+                selective=args.selective,
+                workers=args.workers,
+                adaptive=args.adaptive_dpi,
+                crop=args.crop
             )
         elif file_ext in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp']:
             ocr_pdf, metadata = process_image_to_ocr_pdf(
@@ -121,6 +218,8 @@ def main():
         print(f"  Pages:          {metadata['pages_processed']}")
         print(f"  Text extracted: {metadata['text_length']} characters")
         print(f"  Output file:    {output_path}")
+        for page in metadata.get('pages', []):
+            print(f"    Page {page['page']:>4}: {page['dpi']} DPI, {page['ocr_seconds']}s")
         print(f"{'='*60}\n")
     
     except Exception as e:
@@ -7,10 +7,21 @@ Supports both PDF and image inputs.
 
 import os
 import io
-from typing import Optional, Tuple, List
+import math
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, Optional, Tuple, List, Union
 from pathlib import Path
 
 import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
 from PIL import Image
 import numpy as np
 from reportlab.pdfgen import canvas
@@ -18,6 +29,7 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, JSONResponse
 
 try:
@@ -27,31 +39,29 @@ except ImportError:
     convert_from_path = None
 
 try:
-    from paddleocr import PaddleOCR
-    _paddle_ocr = None
+    from .engine import get_ocr_engine, ocr_engine_tag
+    from .ocr_cache import get_ocr_cache, image_cache_key
 except ImportError:
-    PaddleOCR = None
-    _paddle_ocr = None
+    from engine import get_ocr_engine, ocr_engine_tag
+    from ocr_cache import get_ocr_cache, image_cache_key
 
 
 router = APIRouter(prefix="/non-ocr", tags=["Non-OCR Converter"])
 
+# Pages rasterized per pdf2image call; bounds peak bitmap memory
+RENDER_BATCH_SIZE = int(os.getenv("NON_OCR_RENDER_BATCH", "4"))
 
-# ============================================================================
-# OCR ENGINE INITIALIZATION
-# ============================================================================
+# OCR worker processes for PDF conversion (0 = OCR in the request process)
+OCR_WORKERS = int(os.getenv("NON_OCR_WORKERS", "0"))
 
-def get_paddle_ocr():
-    """Lazy initialize PaddleOCR to save memory."""
-    global _paddle_ocr
-    if _paddle_ocr is None and PaddleOCR is not None:
-        try:
-            _paddle_ocr = PaddleOCR(use_angle_cls=True, lang='en', show_log=False)
-            print("✓ PaddleOCR initialized successfully")
-        except Exception as e:
-            print(f"✗ Failed to initialize PaddleOCR: {e}")
-            _paddle_ocr = False
-    return _paddle_ocr if _paddle_ocr is not False else None
+# Adaptive DPI: detection probe resolution, DPI floor, and the text line height
+# (in pixels) the recognizer works best at
+ADAPTIVE_PROBE_DPI = int(os.getenv("NON_OCR_PROBE_DPI", "72"))
+ADAPTIVE_MIN_DPI = int(os.getenv("NON_OCR_MIN_DPI", "120"))
+ADAPTIVE_TARGET_LINE_PX = int(os.getenv("NON_OCR_TARGET_LINE_PX", "40"))
+
+# Identifies the configured OCR backend, version and settings in cache keys
+OCR_ENGINE_TAG = ocr_engine_tag()
 
 
 # ============================================================================
@@ -86,68 +96,362 @@ def is_pdf_ocr(file_bytes: bytes, threshold: int = 50) -> Tuple[bool, str]:
         return False, ""
 
 
+def classify_pdf_pages(file_bytes: bytes, threshold: int = 20) -> List[Tuple[bool, str]]:
+    """
+    Check each page of a PDF for a usable text layer.
+    
+    Args:
+        file_bytes: PDF file content as bytes
+        threshold: Minimum character count for a page to count as native text
+    
+    Returns:
+        List of (has_text, extracted_text) tuples, one per page, in page order
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    pages = []
+    
+    for page in reader.pages:
+        try:
+            page_text = page.extract_text() or ""
+        except Exception:
+            page_text = ""
+        pages.append((len(page_text.strip()) >= threshold, page_text))
+    
+    return pages
+
+
 # ============================================================================
 # OCR PROCESSING
 # ============================================================================
 
-def run_ocr_on_image(image: Image.Image) -> List[dict]:
+def _crop_pixels(image: Image.Image, crop_box) -> Tuple[Image.Image, int, int]:
+    """Crop `image` to a fractional box; returns the crop and its pixel offset."""
+    if not crop_box:
+        return image, 0, 0
+    width, height = image.size
+    left, top, right, bottom = crop_box
+    offset_x, offset_y = int(left * width), int(top * height)
+    return image.crop((offset_x, offset_y, int(right * width), int(bottom * height))), offset_x, offset_y
+
+
+def run_ocr_on_images(
+    images: List[Image.Image],
+    crop_boxes: Optional[List[Optional[Tuple[float, float, float, float]]]] = None
+) -> List[List[dict]]:
+    """
+    Run OCR on several PIL Images, recognizing cache misses in one engine batch.
+    
+    Args:
+        images: PIL Image objects
+        crop_boxes: Optional per-image (left, top, right, bottom) regions to
+            recognize, as fractions of the image size. Bounding boxes are
+            still returned in full-image coordinates.
+    
+    Returns:
+        One list of OCR results (text, confidence, bbox) per image
+    
+    Results are cached on disk by image content, so a page seen before is
+    returned without loading or running the OCR engine.
+    """
+    crop_boxes = crop_boxes or [None] * len(images)
+    cache = get_ocr_cache()
+    results: List[Optional[List[dict]]] = [None] * len(images)
+    cache_keys = [None] * len(images)
+    if cache.enabled:
+        for i, (image, crop_box) in enumerate(zip(images, crop_boxes)):
+            cache_keys[i] = image_cache_key(image, OCR_ENGINE_TAG, crop_box)
+            results[i] = cache.get(cache_keys[i])
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        engine = get_ocr_engine()
+        if engine is None:
+            raise RuntimeError(
+                "No OCR engine is available. "
+                "Install with: pip install paddlepaddle paddleocr (or pip install easyocr)"
+            )
+        
+        crops = [_crop_pixels(images[i], crop_boxes[i]) for i in missing]
+        recognized = engine.recognize_batch([np.array(crop) for crop, _, _ in crops])
+        
+        for i, (_, offset_x, offset_y), ocr_results in zip(missing, crops, recognized):
+            for r in ocr_results:
+                r['bbox'] = [[x + offset_x, y + offset_y] for x, y in r['bbox']]
+            results[i] = ocr_results
+            if cache_keys[i]:
+                cache.put(cache_keys[i], ocr_results)
+    
+    return results
+
+
+def run_ocr_on_image(
+    image: Image.Image,
+    crop_box: Optional[Tuple[float, float, float, float]] = None
+) -> List[dict]:
     """
     Run OCR on a PIL Image and return structured results with bounding boxes.
     
     Args:
         image: PIL Image object
+        crop_box: Optional region to recognize (see `run_ocr_on_images`)
     
     Returns:
         List of OCR results with text and coordinates
     """
-    ocr = get_paddle_ocr()
-    if ocr is None:
+    return run_ocr_on_images([image], [crop_box])[0]
+
+
+def extract_text_from_ocr_results(ocr_results: List[dict]) -> str:
+    """Extract plain text from OCR results."""
+    return "\n".join([r['text'] for r in ocr_results if r['text'].strip()])
+
+
+def _timed_ocr(image: Image.Image, crop_box=None) -> Tuple[List[dict], float]:
+    started = time.perf_counter()
+    ocr_results = run_ocr_on_image(image, crop_box)
+    return ocr_results, time.perf_counter() - started
+
+
+# ============================================================================
+# ADAPTIVE RASTERIZATION
+# ============================================================================
+
+def detect_text_boxes(image: Image.Image) -> List[List[List[float]]]:
+    """Run text detection only (no recognition) and return line boxes."""
+    engine = get_ocr_engine()
+    if engine is None:
         raise RuntimeError(
-            "PaddleOCR is not available. "
-            "Install with: pip install paddlepaddle paddleocr"
+            "No OCR engine is available. "
+            "Install with: pip install paddlepaddle paddleocr (or pip install easyocr)"
         )
+    return engine.detect(np.array(image))
+
+
+def plan_page_dpi(
+    boxes: List[List[List[float]]],
+    image_size: Tuple[int, int],
+    probe_dpi: int,
+    max_dpi: int,
+    crop: bool = False
+) -> dict:
+    """
+    Pick the rendering DPI for a page from the text lines found at `probe_dpi`.
+    
+    Line height is taken from the lower quartile of the detected boxes (so small
+    print is not lost) and converted to points; the page is then rendered at
+    the lowest DPI that makes such a line `ADAPTIVE_TARGET_LINE_PX` pixels tall,
+    clamped to [`ADAPTIVE_MIN_DPI`, `max_dpi`].
+    
+    Returns:
+        Dict with `dpi`, `line_height_pt` and, with `crop`, `crop_box` as
+        fractions of the page covering every detected line plus a margin
+    """
+    if not boxes:
+        # Nothing detected: blank or image-only page, render it cheaply
+        return {'dpi': min(ADAPTIVE_MIN_DPI, max_dpi), 'line_height_pt': None}
     
-    # Convert PIL Image to numpy array
-    img_array = np.array(image)
+    heights = [max(p[1] for p in box) - min(p[1] for p in box) for box in boxes]
+    line_height_pt = max(float(np.percentile(heights, 25)), 1.0) * 72.0 / probe_dpi
     
-    # Run OCR with detailed results
-    result = ocr.ocr(img_array, cls=True)
+    dpi = ADAPTIVE_TARGET_LINE_PX * 72.0 / line_height_pt
+    dpi = int(min(max(math.ceil(dpi / 10.0) * 10, ADAPTIVE_MIN_DPI), max_dpi))
+    plan = {'dpi': dpi, 'line_height_pt': round(line_height_pt, 2)}
     
-    # Parse results
-    ocr_results = []
-    if result and result[0]:
-        for line in result[0]:
-            if line and len(line) >= 2:
-                # line[0] contains bounding box coordinates
-                # line[1] contains (text, confidence)
-                bbox = line[0]
-                text_info = line[1]
-                
-                ocr_results.append({
-                    'text': text_info[0],
-                    'confidence': text_info[1],
-                    'bbox': bbox
-                })
+    if crop:
+        width, height = image_size
+        margin = 0.02
+        plan['crop_box'] = (
+            max(0.0, min(p[0] for box in boxes for p in box) / width - margin),
+            max(0.0, min(p[1] for box in boxes for p in box) / height - margin),
+            min(1.0, max(p[0] for box in boxes for p in box) / width + margin),
+            min(1.0, max(p[1] for box in boxes for p in box) / height + margin),
+        )
     
-    return ocr_results
+    return plan
 
 
-def extract_text_from_ocr_results(ocr_results: List[dict]) -> str:
-    """Extract plain text from OCR results."""
-    return "\n".join([r['text'] for r in ocr_results if r['text'].strip()])
+def plan_adaptive_pages(
+    file_bytes: bytes,
+    page_numbers: List[int],
+    max_dpi: int = 300,
+    crop: bool = False,
+    batch_size: int = RENDER_BATCH_SIZE
+) -> dict:
+    """
+    Fast low-DPI detection pass choosing a rendering DPI for every page.
+    
+    Returns:
+        {page_number: plan} as produced by `plan_page_dpi`, plus `probe_seconds`
+    """
+    plans = {}
+    for page_number, image in iter_pdf_page_images(
+        file_bytes,
+        dpi=ADAPTIVE_PROBE_DPI,
+        page_numbers=page_numbers,
+        batch_size=batch_size
+    ):
+        started = time.perf_counter()
+        boxes = detect_text_boxes(image)
+        plans[page_number] = plan_page_dpi(boxes, image.size, ADAPTIVE_PROBE_DPI, max_dpi, crop=crop)
+        plans[page_number]['probe_seconds'] = round(time.perf_counter() - started, 3)
+    return plans
+
+
+# ============================================================================
+# OCR WORKER POOL
+# ============================================================================
+
+class OCRWorkerPool:
+    """
+    Pool of OCR worker processes, each holding a warm OCR engine.
+    
+    Every worker initializes its own engine once via `get_ocr_engine` and then
+    runs `run_ocr_on_image` on the page images it receives. Results come back
+    in submission order.
+    """
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        # spawn: PaddlePaddle/torch are not fork-safe once initialized in the parent
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=get_ocr_engine
+        )
+    
+    def imap(
+        self,
+        pages: Iterable[Tuple[int, Image.Image]],
+        crop_boxes: Optional[dict] = None
+    ) -> Iterator[Tuple[int, Image.Image, List[dict], float]]:
+        """
+        OCR (page_number, image) pairs in parallel, yielding results in page order.
+        
+        At most two pages per worker are in flight, so a lazy page iterator
+        is only consumed as fast as the workers can keep up.
+        
+        If a worker dies (e.g. OOM-killed on a huge page) the pool is broken:
+        it is discarded so the next request starts a fresh one, and
+        BrokenProcessPool is raised for this one.
+        """
+        window = self.workers * 2
+        crop_boxes = crop_boxes or {}
+        in_flight = deque()
+        
+        try:
+            for page_number, image in pages:
+                future = self._executor.submit(_timed_ocr, image, crop_boxes.get(page_number))
+                in_flight.append((page_number, image, future))
+                if len(in_flight) >= window:
+                    page_number, image, future = in_flight.popleft()
+                    yield (page_number, image) + future.result()
+            
+            while in_flight:
+                page_number, image, future = in_flight.popleft()
+                yield (page_number, image) + future.result()
+        except BrokenProcessPool:
+            print("✗ OCR worker died; restarting the pool on the next request")
+            _discard_ocr_pool(self)
+            raise
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_ocr_pool: Optional[OCRWorkerPool] = None
+_ocr_pool_lock = threading.Lock()  # requests call get_ocr_pool from threadpool threads
+
+
+def get_ocr_pool(workers: int) -> OCRWorkerPool:
+    """Return the shared OCR worker pool, (re)creating it for `workers` processes."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None and _ocr_pool.workers != workers:
+            _ocr_pool.shutdown()
+            _ocr_pool = None
+        if _ocr_pool is None:
+            _ocr_pool = OCRWorkerPool(workers)
+            print(f"✓ OCR worker pool started ({workers} processes)")
+        return _ocr_pool
+
+
+def _discard_ocr_pool(pool: OCRWorkerPool) -> None:
+    """Shut down a broken pool and forget it, unless it was already replaced."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    pool.shutdown()
+
+
+@atexit.register
+def _shutdown_ocr_pool():
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown()
+
+
+def iter_ocr_results(
+    pages: Iterable[Tuple[int, Image.Image]],
+    workers: int = 0,
+    crop_boxes: Optional[dict] = None,
+    batch_size: int = RENDER_BATCH_SIZE
+) -> Iterator[Tuple[int, Image.Image, List[dict], float]]:
+    """
+    Run OCR over (page_number, image) pairs, in-process or on the worker pool.
+    
+    Args:
+        pages: Page images in page order
+        workers: Number of OCR worker processes; 0 or 1 runs in-process
+        crop_boxes: Optional {page_number: crop_box} regions to recognize
+            (see `run_ocr_on_images`)
+        batch_size: In-process only: pages handed to the engine per batch
+    
+    Yields:
+        (page_number, image, ocr_results, ocr_seconds) tuples in page order;
+        for batched pages `ocr_seconds` is the batch time split evenly
+    """
+    if workers > 1:
+        yield from get_ocr_pool(workers).imap(pages, crop_boxes)
+        return
+    crop_boxes = crop_boxes or {}
+    batch = []
+    
+    def flush():
+        started = time.perf_counter()
+        results = run_ocr_on_images(
+            [image for _, image in batch],
+            [crop_boxes.get(page_number) for page_number, _ in batch]
+        )
+        seconds = (time.perf_counter() - started) / len(batch)
+        for (page_number, image), ocr_results in zip(batch, results):
+            yield page_number, image, ocr_results, seconds
+        batch.clear()
+    
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= max(batch_size, 1):
+            yield from flush()
+    if batch:
+        yield from flush()
 
 
 # ============================================================================
 # PDF CREATION WITH OCR LAYER
 # ============================================================================
 
-def create_searchable_pdf(image: Image.Image, ocr_results: List[dict]) -> bytes:
+def create_searchable_pdf(
+    image: Image.Image,
+    ocr_results: List[dict],
+    page_size: Optional[Tuple[float, float]] = None
+) -> bytes:
     """
     Create a searchable PDF with image background and invisible text layer.
     
     Args:
         image: PIL Image of the page
         ocr_results: OCR results with text and bounding boxes
+        page_size: Optional (width, height) in points; defaults to the image size.
+            Used to keep re-rendered pages at their original page size.
     
     Returns:
         PDF bytes
@@ -158,12 +462,17 @@ def create_searchable_pdf(image: Image.Image, ocr_results: List[dict]) -> bytes:
     # Get image dimensions
     img_width, img_height = image.size
     
-    # Create PDF with image size
-    pdf = canvas.Canvas(buffer, pagesize=(img_width, img_height))
+    # Page size defaults to one point per pixel
+    page_width, page_height = page_size or (img_width, img_height)
+    scale_x = page_width / img_width
+    scale_y = page_height / img_height
+    
+    # Create PDF with page size
+    pdf = canvas.Canvas(buffer, pagesize=(page_width, page_height))
     
     # Draw the image as background
     img_reader = ImageReader(image)
-    pdf.drawImage(img_reader, 0, 0, width=img_width, height=img_height)
+    pdf.drawImage(img_reader, 0, 0, width=page_width, height=page_height)
     
     # Add invisible text layer
     pdf.setFillColorRGB(0, 0, 0, alpha=0)  # Invisible text
@@ -174,12 +483,12 @@ def create_searchable_pdf(image: Image.Image, ocr_results: List[dict]) -> bytes:
         
         # Calculate position (PDF coordinates start from bottom-left)
         # bbox format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-        x = min([p[0] for p in bbox])
-        y = img_height - max([p[1] for p in bbox])  # Flip Y coordinate
+        x = min([p[0] for p in bbox]) * scale_x
+        y = (img_height - max([p[1] for p in bbox])) * scale_y  # Flip Y coordinate
         
         # Calculate text size based on bounding box
-        bbox_width = max([p[0] for p in bbox]) - min([p[0] for p in bbox])
-        bbox_height = max([p[1] for p in bbox]) - min([p[1] for p in bbox])
+        bbox_width = (max([p[0] for p in bbox]) - min([p[0] for p in bbox])) * scale_x
+        bbox_height = (max([p[1] for p in bbox]) - min([p[1] for p in bbox])) * scale_y
         
         # Estimate font size
         font_size = max(8, min(bbox_height * 0.8, 72))
@@ -220,25 +529,237 @@ def merge_pdf_pages(pdf_pages: List[bytes]) -> bytes:
     return output_buffer.read()
 
 
+class IncrementalPdfWriter:
+    """
+    Collect output pages on disk instead of holding them in memory.
+    
+    Each page is spooled to its own small PDF as soon as it is produced.
+    `write()` then streams the pages into the output one at a time: each
+    page's objects are renumbered and written straight to the file, so only
+    one page file is open and one page's objects are in memory at any point,
+    however long the document is.
+    """
+    
+    def __init__(self):
+        self._dir = tempfile.mkdtemp(prefix="non_ocr_")
+        self._paths: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self._paths)
+    
+    def _next_path(self) -> str:
+        return os.path.join(self._dir, f"page_{len(self._paths):06d}.pdf")
+    
+    def add_pdf_bytes(self, page_pdf: bytes) -> None:
+        """Append a single-page PDF produced by `create_searchable_pdf`."""
+        path = self._next_path()
+        with open(path, 'wb') as f:
+            f.write(page_pdf)
+        self._paths.append(path)
+    
+    def add_page(self, page) -> None:
+        """Append an existing PyPDF2 page unchanged."""
+        single = PyPDF2.PdfWriter()
+        single.add_page(page)
+        path = self._next_path()
+        with open(path, 'wb') as f:
+            single.write(f)
+        self._paths.append(path)
+    
+    def write(self, output_path: str) -> None:
+        """Write the spooled pages, in order, to `output_path`."""
+        with open(output_path, 'wb') as out:
+            _StreamingPdfAssembler(out).write_pages(self._paths)
+    
+    def close(self) -> None:
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class _StreamingPdfAssembler:
+    """
+    Minimal PDF writer for `IncrementalPdfWriter.write`: copies each page
+    (and the objects it references) from its own file into `out`, then
+    writes the page tree, catalog and cross-reference table at the end.
+    """
+    
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    
+    def __init__(self, out):
+        self._out = out
+        self._offsets: Dict[int, int] = {}
+        self._next_id = 3
+    
+    def _new_id(self) -> int:
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+    
+    def _remap(self, obj, ids: Dict[tuple, int], pending: deque):
+        """Point the references inside `obj` at new object numbers, queueing unseen targets."""
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in ids:
+                ids[key] = self._new_id()
+                pending.append((ids[key], obj))
+            return IndirectObject(ids[key], 0, None)
+        if isinstance(obj, DictionaryObject):
+            for key, value in list(dict.items(obj)):
+                dict.__setitem__(obj, key, self._remap(value, ids, pending))
+        elif isinstance(obj, ArrayObject):
+            for i, value in enumerate(list.__iter__(obj)):
+                list.__setitem__(obj, i, self._remap(value, ids, pending))
+        return obj
+    
+    def _write_object(self, obj_id: int, obj) -> None:
+        self._offsets[obj_id] = self._out.tell()
+        self._out.write(f"{obj_id} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self._out, None)
+        self._out.write(b"\nendobj\n")
+    
+    def _copy_page(self, path: str) -> int:
+        with open(path, 'rb') as f:
+            page = PyPDF2.PdfReader(f).pages[0]
+            page_id = self._new_id()
+            ids: Dict[tuple, int] = {}
+            # back-references to the page (e.g. annotation /P) and its old
+            # page tree resolve to the copies instead of pulling in the source tree
+            if page.indirect_reference is not None:
+                ids[(page.indirect_reference.idnum, page.indirect_reference.generation)] = page_id
+            parent = dict.get(page, NameObject("/Parent"))
+            if isinstance(parent, IndirectObject):
+                ids[(parent.idnum, parent.generation)] = self.PAGES_ID
+            pending: deque = deque()
+            self._remap(page, ids, pending)
+            page[NameObject("/Parent")] = IndirectObject(self.PAGES_ID, 0, None)
+            self._write_object(page_id, page)
+            while pending:
+                obj_id, ref = pending.popleft()
+                self._write_object(obj_id, self._remap(ref.get_object(), ids, pending))
+        return page_id
+    
+    def write_pages(self, paths: Iterable[str]) -> None:
+        self._out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        kids = ArrayObject(IndirectObject(self._copy_page(p), 0, None) for p in paths)
+        self._write_object(self.PAGES_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(kids)),
+        }))
+        self._write_object(self.CATALOG_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self.PAGES_ID, 0, None),
+        }))
+        xref_offset = self._out.tell()
+        size = self._next_id
+        self._out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode("ascii"))
+        for obj_id in range(1, size):
+            self._out.write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        self._out.write(
+            f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        )
+
+
+# ============================================================================
+# PAGE RENDERING
+# ============================================================================
+
+def iter_pdf_page_images(
+    file_bytes: bytes,
+    dpi: Union[int, Dict[int, int]] = 300,
+    page_numbers: Optional[List[int]] = None,
+    batch_size: int = RENDER_BATCH_SIZE
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Rasterize PDF pages a few at a time.
+    
+    Pages are rendered in runs of at most `batch_size` consecutive pages using
+    pdf2image's `first_page`/`last_page`, so only one run of bitmaps is alive
+    at a time regardless of document length.
+    
+    Args:
+        file_bytes: PDF file content as bytes
+        dpi: Rendering resolution, or {page_number: dpi} for per-page resolution
+        page_numbers: 1-based pages to render (default: all pages)
+        batch_size: Maximum number of pages rendered per pdf2image call
+    
+    Yields:
+        (page_number, image) tuples in page order
+    """
+    if page_numbers is None:
+        total_pages = len(PyPDF2.PdfReader(io.BytesIO(file_bytes)).pages)
+        page_numbers = list(range(1, total_pages + 1))
+    
+    page_dpi = dpi.get if isinstance(dpi, dict) else (lambda page: dpi)
+    batch_size = max(1, batch_size)
+    pages = sorted(page_numbers)
+    i = 0
+    
+    while i < len(pages):
+        # Extend the run while pages stay consecutive and share a DPI
+        first = last = pages[i]
+        i += 1
+        while (i < len(pages) and pages[i] == last + 1 and last - first + 1 < batch_size
+               and page_dpi(pages[i]) == page_dpi(first)):
+            last = pages[i]
+            i += 1
+        
+        images = convert_from_bytes(file_bytes, dpi=page_dpi(first), first_page=first, last_page=last)
+        for offset, image in enumerate(images):
+            yield first + offset, image
+        del images
+
+
 # ============================================================================
 # MAIN CONVERSION FUNCTION
 # ============================================================================
 
-def convert_pdf_to_ocr(
+def _throughput_stats(pages_done: int, started: float, workers: int) -> dict:
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    pages_per_second = pages_done / elapsed
+    return {
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 2),
+        'pages_per_second': round(pages_per_second, 3),
+        'pages_per_second_per_worker': round(pages_per_second / workers, 3)
+    }
+
+
+def convert_pdf_to_ocr_file(
     file_bytes: bytes,
+    output_path: str,
     dpi: int = 300,
-    progress_callback=None
-) -> Tuple[bytes, dict]:
+    progress_callback=None,
+    selective: bool = False,
+    batch_size: int = RENDER_BATCH_SIZE,
+    workers: int = 0,
+    adaptive: bool = False,
+    crop: bool = False
+) -> dict:
     """
-    Convert a non-OCR PDF to a searchable OCR PDF.
+    Convert a PDF to a searchable OCR PDF written to `output_path`.
+    
+    Pages are rendered `batch_size` at a time, OCR'd and spooled to disk one by
+    one, so peak memory stays bounded regardless of page count.
     
     Args:
         file_bytes: Input PDF as bytes
+        output_path: Where to write the searchable PDF
         dpi: Resolution for PDF to image conversion
         progress_callback: Optional callback function for progress updates
+        selective: Only OCR pages without a usable text layer and copy
+            native pages through unchanged (for mixed typed/scanned PDFs)
+        batch_size: Number of pages rasterized per pdf2image call
+        workers: Number of OCR worker processes; 0 or 1 OCRs pages in-process.
+            With a pool, `progress_callback(current, total, stats)` also
+            receives throughput stats (pages/s overall and per worker).
+        adaptive: Probe each page at low DPI and render it at the lowest DPI
+            (up to `dpi`) that keeps text lines legible to the recognizer
+        crop: With `adaptive`, only recognize the region containing the
+            detected text lines
     
     Returns:
-        Tuple of (ocr_pdf_bytes, metadata)
+        Conversion metadata
     """
     if convert_from_bytes is None:
         raise RuntimeError(
@@ -246,63 +767,196 @@ def convert_pdf_to_ocr(
             "Install with: pip install pdf2image"
         )
     
-    # Check if PDF already has OCR
-    is_ocr, existing_text = is_pdf_ocr(file_bytes)
-    if is_ocr:
+    if selective:
+        pages = classify_pdf_pages(file_bytes)
+        ocr_pages = [i for i, (has_text, _) in enumerate(pages, 1) if not has_text]
+        already_ocr = not ocr_pages
+        existing_text = "\n\n".join(text for _, text in pages)
+    else:
+        # Check if PDF already has OCR
+        already_ocr, existing_text = is_pdf_ocr(file_bytes)
+    
+    if already_ocr:
         print("⚠️  PDF already has OCR text. Returning original.")
-        return file_bytes, {
+        with open(output_path, 'wb') as f:
+            f.write(file_bytes)
+        return {
             'status': 'already_ocr',
             'pages_processed': 0,
+            'pages_total': len(pages) if selective else len(PyPDF2.PdfReader(io.BytesIO(file_bytes)).pages),
             'text_length': len(existing_text)
         }
     
-    print(f"🔄 Converting non-OCR PDF to searchable PDF (DPI: {dpi})...")
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    total_pages = len(reader.pages)
+    if not selective:
+        pages = [(False, "")] * total_pages
+        ocr_pages = list(range(1, total_pages + 1))
     
-    # Convert PDF to images
-    images = convert_from_bytes(file_bytes, dpi=dpi)
-    total_pages = len(images)
+    mode = "Selective OCR" if selective else "Converting non-OCR PDF to searchable PDF"
+    print(f"🔄 {mode}: {len(ocr_pages)}/{total_pages} pages (DPI: {'adaptive, max ' if adaptive else ''}{dpi})...")
     
-    print(f"📄 Processing {total_pages} pages...")
+    page_dpi = dpi
+    crop_boxes = None
+    plans = {}
+    if adaptive:
+        plans = plan_adaptive_pages(file_bytes, ocr_pages, max_dpi=dpi, crop=crop, batch_size=batch_size)
+        page_dpi = {page: plan['dpi'] for page, plan in plans.items()}
+        crop_boxes = {page: plan['crop_box'] for page, plan in plans.items() if plan.get('crop_box')}
     
-    # Process each page
-    pdf_pages = []
+    images = iter_pdf_page_images(file_bytes, dpi=page_dpi, page_numbers=ocr_pages, batch_size=batch_size)
+    results = iter_ocr_results(images, workers=workers, crop_boxes=crop_boxes, batch_size=batch_size)
+    writer = IncrementalPdfWriter()
     all_text = []
+    page_reports = []
+    done = 0
+    started = time.perf_counter()
     
-    for i, image in enumerate(images, 1):
-        if progress_callback:
-            progress_callback(i, total_pages)
-        
-        print(f"  Page {i}/{total_pages}: Running OCR...")
-        
-        # Run OCR
-        ocr_results = run_ocr_on_image(image)
-        
-        # Extract text
-        page_text = extract_text_from_ocr_results(ocr_results)
-        all_text.append(page_text)
-        
-        print(f"  Page {i}/{total_pages}: Creating searchable PDF...")
-        
-        # Create searchable PDF page
-        page_pdf = create_searchable_pdf(image, ocr_results)
-        pdf_pages.append(page_pdf)
+    try:
+        for i, (has_text, page_text) in enumerate(pages, 1):
+            if has_text:
+                # Native page: copy through unchanged
+                writer.add_page(reader.pages[i - 1])
+                all_text.append(page_text)
+                continue
+            
+            page_number, image, ocr_results, ocr_seconds = next(results)
+            done += 1
+            if progress_callback:
+                if workers > 1:
+                    progress_callback(done, len(ocr_pages), _throughput_stats(done, started, workers))
+                else:
+                    progress_callback(done, len(ocr_pages))
+            
+            plan = plans.get(page_number, {})
+            page_reports.append({
+                'page': page_number,
+                'dpi': plan.get('dpi', dpi),
+                'line_height_pt': plan.get('line_height_pt'),
+                'cropped': bool(plan.get('crop_box')),
+                'ocr_seconds': round(ocr_seconds + plan.get('probe_seconds', 0.0), 3)
+            })
+            
+            print(f"  Page {page_number}/{total_pages}: OCR done at {page_reports[-1]['dpi']} DPI "
+                  f"in {page_reports[-1]['ocr_seconds']}s ({len(ocr_results)} lines)")
+            all_text.append(extract_text_from_ocr_results(ocr_results))
+            
+            # Selective/adaptive modes keep the original page size so pages stay uniform
+            page_size = None
+            if selective or adaptive:
+                page = reader.pages[i - 1]
+                page_size = (float(page.mediabox.width), float(page.mediabox.height))
+                # Poppler renders /Rotate 90/270 pages already turned
+                if page.rotation % 180 == 90:
+                    page_size = page_size[::-1]
+            
+            writer.add_pdf_bytes(create_searchable_pdf(image, ocr_results, page_size=page_size))
+            del image
+            
+            print(f"  ✓ Page {page_number}/{total_pages} complete")
         
-        print(f"  ✓ Page {i}/{total_pages} complete")
-    
-    # Merge all pages
-    print("📑 Merging pages...")
-    final_pdf = merge_pdf_pages(pdf_pages)
+        print("📑 Merging pages...")
+        writer.write(output_path)
+    finally:
+        writer.close()
     
     metadata = {
         'status': 'success',
-        'pages_processed': total_pages,
+        'pages_processed': len(ocr_pages),
         'text_length': len("\n\n".join(all_text)),
-        'dpi': dpi
+        'dpi': dpi,
+        'pages': page_reports
     }
+    if adaptive:
+        metadata['dpi_mode'] = 'adaptive'
+    if workers > 1:
+        metadata.update(_throughput_stats(done, started, workers))
+    if selective:
+        metadata['pages_total'] = total_pages
+        metadata['ocr_pages'] = ocr_pages
     
     print("✓ Conversion complete!")
     
-    return final_pdf, metadata
+    return metadata
+
+
+def convert_pdf_to_ocr(
+    file_bytes: bytes,
+    dpi: int = 300,
+    progress_callback=None,
+    selective: bool = False,
+    workers: int = 0,
+    adaptive: bool = False,
+    crop: bool = False
+) -> Tuple[bytes, dict]:
+    """
+    Convert a non-OCR PDF to a searchable OCR PDF.
+    
+    Args:
+        file_bytes: Input PDF as bytes
+        dpi: Resolution for PDF to image conversion
+        progress_callback: Optional callback function for progress updates
+        selective: Only OCR pages without a usable text layer and copy
+            native pages through unchanged (for mixed typed/scanned PDFs)
+        workers: Number of OCR worker processes (0 = in-process)
+        adaptive: Choose the rendering DPI per page (up to `dpi`)
+        crop: With `adaptive`, only recognize the detected text region
+    
+    Returns:
+        Tuple of (ocr_pdf_bytes, metadata)
+    """
+    fd, output_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    
+    try:
+        metadata = convert_pdf_to_ocr_file(
+            file_bytes,
+            output_path,
+            dpi=dpi,
+            progress_callback=progress_callback,
+            selective=selective,
+            workers=workers,
+            adaptive=adaptive,
+            crop=crop
+        )
+        with open(output_path, 'rb') as f:
+            return f.read(), metadata
+    finally:
+        os.remove(output_path)
+
+
+def convert_pdf_to_ocr_selective(
+    file_bytes: bytes,
+    dpi: int = 300,
+    progress_callback=None
+) -> Tuple[bytes, dict]:
+    """
+    OCR only the pages of a PDF that have no usable text layer.
+    
+    Native pages are copied through unchanged; scanned pages are rasterized,
+    OCR'd and replaced by a searchable page of the same size. Page order is
+    preserved in both the output PDF and the combined text.
+    """
+    return convert_pdf_to_ocr(
+        file_bytes,
+        dpi=dpi,
+        progress_callback=progress_callback,
+        selective=True
+    )
+
+
+def iter_file_chunks(path: str, chunk_size: int = 64 * 1024, remove: bool = True) -> Iterator[bytes]:
+    """Stream a file in chunks, deleting it afterwards (for `StreamingResponse`)."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if remove and os.path.exists(path):
+            os.remove(path)
 
 
 def process_image_to_ocr_pdf(
@@ -354,13 +1008,19 @@ def process_image_to_ocr_pdf(
 @router.post("/convert-to-ocr")
 async def convert_to_ocr_endpoint(
     file: UploadFile = File(...),
-    dpi: int = 300
+    dpi: int = 300,
+    selective: bool = False,
+    adaptive_dpi: bool = False,
+    crop: bool = False
 ):
     """
     Convert a non-OCR PDF or image to a searchable OCR PDF.
     
     **Supports:**
     - Non-OCR PDFs (scanned documents)
+    - Mixed PDFs with `selective=true` (only pages without text are OCR'd)
+    - `adaptive_dpi=true` picks the DPI per page (up to `dpi`); `crop=true`
+      also restricts recognition to the detected text region
     - Image files (PNG, JPG, JPEG, TIFF, BMP)
     
     **Returns:**
@@ -378,13 +1038,30 @@ async def convert_to_ocr_endpoint(
         
         # Process based on file type
         if file_ext == 'pdf':
-            # Convert PDF
-            ocr_pdf, metadata = convert_pdf_to_ocr(file_bytes, dpi=dpi)
+            # Convert PDF page by page into a spooled file, then stream it back
+            fd, output_path = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+            try:
+                metadata = await run_in_threadpool(
+                    convert_pdf_to_ocr_file,
+                    file_bytes,
+                    output_path,
+                    dpi=dpi,
+                    selective=selective,
+                    workers=OCR_WORKERS,
+                    adaptive=adaptive_dpi,
+                    crop=crop
+                )
+            except Exception:
+                os.remove(output_path)
+                raise
+            body = iter_file_chunks(output_path)
             output_filename = filename.replace('.pdf', '_ocr.pdf')
         
         elif file_ext in ['png', 'jpg', 'jpeg', 'tiff', 'bmp']:
             # Convert image
             ocr_pdf, metadata = process_image_to_ocr_pdf(file_bytes, filename)
+            body = io.BytesIO(ocr_pdf)
             output_filename = filename.rsplit('.', 1)[0] + '_ocr.pdf'
         
         else:
@@ -397,7 +1074,7 @@ async def convert_to_ocr_endpoint(
         
         # Return PDF as downloadable file
         return StreamingResponse(
-            io.BytesIO(ocr_pdf),
+            body,
             media_type="application/pdf",
             headers={
                 'Content-Disposition': f'attachment; filename="{output_filename}"',
@@ -442,10 +1119,12 @@ async def check_ocr_status_endpoint(file: UploadFile = File(...)):
 @router.get("/health")
 async def health_check():
     """Check if OCR service is available."""
-    ocr = get_paddle_ocr()
+    engine = get_ocr_engine()
     
     return JSONResponse({
-        'status': 'healthy' if ocr else 'ocr_unavailable',
-        'ocr_engine': 'PaddleOCR' if ocr else None,
+        'status': 'healthy' if engine else 'ocr_unavailable',
+        'ocr_engine': engine.info() if engine else None,
+        'ocr_workers': OCR_WORKERS,
+        'ocr_cache': get_ocr_cache().stats(),
         'pdf2image_available': convert_from_bytes is not None
     })
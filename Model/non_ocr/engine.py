@@ -0,0 +1,220 @@
+"""
+OCR Engine
+
+One OCR engine per process, shared by the OCR PDF converter and the
+project-plan image endpoint. The backend is chosen with `OCR_BACKEND`
+(`paddle`, `easyocr` or `auto`), so a deployment only ever loads one OCR
+framework. Backends are imported lazily; load time and resident memory are
+recorded when the engine is created.
+
+All backends return results in the same shape:
+    [{'text': str, 'confidence': float, 'bbox': [[x, y], [x, y], [x, y], [x, y]]}, ...]
+"""
+
+import os
+import time
+import importlib.util
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .ocr_cache import engine_tag
+except ImportError:
+    from ocr_cache import engine_tag
+
+
+# Backend selection: 'paddle', 'easyocr' or 'auto' (first one installed)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+OCR_LANG = os.getenv("OCR_LANG", "en")
+# Text lines (paddle) or images (easyocr) recognized per forward pass
+OCR_REC_BATCH = int(os.getenv("OCR_REC_BATCH", "8"))
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return 0.0
+
+
+def _quad(box) -> List[List[float]]:
+    return [[float(x), float(y)] for x, y in box]
+
+
+class OCREngine:
+    """Base class for OCR backends."""
+
+    name = None
+    package = None
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+        self.load_seconds = 0.0
+        self.rss_mb = 0.0
+
+    @classmethod
+    def tag(cls, lang: str = OCR_LANG) -> str:
+        """Cache key component identifying backend, version and settings."""
+        return engine_tag(cls.package, lang)
+
+    def recognize(self, image: np.ndarray) -> List[dict]:
+        """Detect and recognize text lines in one image."""
+        raise NotImplementedError
+
+    def recognize_batch(self, images: Sequence[np.ndarray]) -> List[List[dict]]:
+        """Recognize several images; backends override this to share forward passes."""
+        return [self.recognize(image) for image in images]
+
+    def detect(self, image: np.ndarray) -> List[List[List[float]]]:
+        """Detect text line boxes only (no recognition)."""
+        raise NotImplementedError
+
+    def info(self) -> dict:
+        return {
+            'backend': self.name,
+            'lang': self.lang,
+            'load_seconds': round(self.load_seconds, 2),
+            'rss_mb': round(self.rss_mb, 1)
+        }
+
+
+class PaddleOCREngine(OCREngine):
+    """PaddleOCR backend (angle classification on)."""
+
+    name = 'paddle'
+    package = 'paddleocr'
+
+    def __init__(self, lang: str = OCR_LANG):
+        super().__init__(lang)
+        from paddleocr import PaddleOCR
+        self._ocr = PaddleOCR(
+            use_angle_cls=True,
+            lang=lang,
+            show_log=False,
+            rec_batch_num=OCR_REC_BATCH
+        )
+
+    @classmethod
+    def tag(cls, lang: str = OCR_LANG) -> str:
+        return engine_tag(cls.package, lang, "angle_cls")
+
+    def recognize(self, image: np.ndarray) -> List[dict]:
+        result = self._ocr.ocr(image, cls=True)
+        ocr_results = []
+        if result and result[0]:
+            for line in result[0]:
+                if line and len(line) >= 2:
+                    # line[0] is the box, line[1] is (text, confidence)
+                    ocr_results.append({
+                        'text': line[1][0],
+                        'confidence': float(line[1][1]),
+                        'bbox': _quad(line[0])
+                    })
+        return ocr_results
+
+    def detect(self, image: np.ndarray) -> List[List[List[float]]]:
+        result = self._ocr.ocr(image, det=True, rec=False, cls=False)
+        return [_quad(box) for box in result[0]] if result and result[0] else []
+
+
+class EasyOCREngine(OCREngine):
+    """EasyOCR backend (CPU)."""
+
+    name = 'easyocr'
+    package = 'easyocr'
+
+    def __init__(self, lang: str = OCR_LANG):
+        super().__init__(lang)
+        import easyocr
+        self._reader = easyocr.Reader([lang], gpu=False)
+
+    def recognize(self, image: np.ndarray) -> List[dict]:
+        return [
+            {'text': text, 'confidence': float(confidence), 'bbox': _quad(box)}
+            for box, text, confidence in self._reader.readtext(image, detail=1, paragraph=False)
+        ]
+
+    def recognize_batch(self, images: Sequence[np.ndarray]) -> List[List[dict]]:
+        # readtext_batched needs equally sized inputs, which pages rendered at
+        # one DPI are; anything else falls back to one call per image
+        if len(images) < 2 or len({image.shape for image in images}) != 1:
+            return super().recognize_batch(images)
+        height, width = images[0].shape[:2]
+        batched = self._reader.readtext_batched(
+            list(images), n_width=width, n_height=height,
+            batch_size=OCR_REC_BATCH, detail=1, paragraph=False
+        )
+        return [
+            [{'text': text, 'confidence': float(confidence), 'bbox': _quad(box)}
+             for box, text, confidence in result]
+            for result in batched
+        ]
+
+    def detect(self, image: np.ndarray) -> List[List[List[float]]]:
+        horizontal, free = self._reader.detect(image)
+        boxes = [
+            [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            for x_min, x_max, y_min, y_max in horizontal[0]
+        ]
+        return [_quad(box) for box in boxes] + [_quad(box) for box in free[0]]
+
+
+BACKENDS = {
+    'paddle': PaddleOCREngine,
+    'easyocr': EasyOCREngine
+}
+
+
+def resolve_backend(backend: str = OCR_BACKEND) -> Optional[type]:
+    """Return the engine class for `backend` without loading it (None if unavailable)."""
+    if backend == 'auto':
+        for engine_cls in BACKENDS.values():
+            if importlib.util.find_spec(engine_cls.package) is not None:
+                return engine_cls
+        return None
+    engine_cls = BACKENDS.get(backend)
+    if engine_cls is None:
+        raise ValueError(f"Unknown OCR_BACKEND '{backend}', expected one of: auto, {', '.join(BACKENDS)}")
+    return engine_cls
+
+
+def ocr_engine_tag() -> str:
+    """Cache tag for the configured engine, available before the engine is loaded."""
+    engine_cls = resolve_backend()
+    return engine_cls.tag() if engine_cls else "none"
+
+
+_ocr_engine = None
+
+
+def get_ocr_engine() -> Optional[OCREngine]:
+    """Lazily create the process-wide OCR engine; None if no backend can load."""
+    global _ocr_engine
+    if _ocr_engine is None:
+        engine_cls = resolve_backend()
+        if engine_cls is None:
+            print("✗ No OCR backend installed (pip install paddlepaddle paddleocr, or easyocr)")
+            _ocr_engine = False
+        else:
+            rss_before = _rss_mb()
+            started = time.perf_counter()
+            try:
+                _ocr_engine = engine_cls()
+                _ocr_engine.load_seconds = time.perf_counter() - started
+                _ocr_engine.rss_mb = _rss_mb() - rss_before
+                print(f"✓ OCR engine '{engine_cls.name}' initialized in "
+                      f"{_ocr_engine.load_seconds:.1f}s (+{_ocr_engine.rss_mb:.0f} MB RSS)")
+            except Exception as e:
+                print(f"✗ Failed to initialize OCR engine '{engine_cls.name}': {e}")
+                _ocr_engine = False
+    return _ocr_engine if _ocr_engine is not False else None
@@ -0,0 +1,171 @@
+"""
+OCR Result Cache
+
+Content-addressed, size-bounded on-disk cache of OCR results. Entries are keyed
+by a hash of the decoded image pixels (mode, size and raw bytes) plus the OCR
+engine name/version and settings, so re-uploading the same scan skips
+recognition entirely while an engine upgrade never serves stale results.
+
+Each entry is a small JSON file; reads refresh its mtime and writes evict the
+least recently used entries once the directory exceeds its size budget. The
+directory may be shared by several worker processes: each one tracks the total
+size from its own writes and re-scans the directory every
+OCR_CACHE_RESCAN_SECONDS to pick up the others'.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
+from importlib import metadata
+from typing import Any, Optional
+
+from PIL import Image
+
+
+# Cache location and size budget (0 disables caching)
+OCR_CACHE_DIR = os.getenv("NON_OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "non_ocr_cache"))
+OCR_CACHE_MAX_MB = int(os.getenv("NON_OCR_CACHE_MB", "512"))
+OCR_CACHE_RESCAN_SECONDS = float(os.getenv("NON_OCR_CACHE_RESCAN_SECONDS", "60"))
+
+
+def engine_tag(package: str, *settings: Any) -> str:
+    """Return an engine identifier like 'paddleocr-2.7.3-en-True' for cache keys."""
+    try:
+        version = metadata.version(package)
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return "-".join([package, version] + [str(s) for s in settings])
+
+
+def image_cache_key(image: Image.Image, engine: str, *extra: Any) -> str:
+    """Hash decoded image pixels with the engine tag and any call options."""
+    digest = hashlib.sha256()
+    digest.update(f"{engine}|{image.mode}|{image.size}|{extra}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def bytes_cache_key(data: bytes, engine: str, *extra: Any) -> str:
+    """Hash raw file bytes with the engine tag and any call options."""
+    digest = hashlib.sha256()
+    digest.update(f"{engine}|{extra}".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """Directory of JSON-encoded OCR results with LRU eviction by total size."""
+
+    def __init__(self, directory: str = OCR_CACHE_DIR, max_mb: int = OCR_CACHE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.enabled = max_mb > 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+        self._scanned_at = 0.0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value, evicting old entries if over budget."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp_path)
+            try:
+                size -= os.path.getsize(path)  # overwriting an entry only adds the difference
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._size is None or time.monotonic() - self._scanned_at > OCR_CACHE_RESCAN_SECONDS:
+                # Other processes sharing the directory write to it too
+                self._size = self._scan_size()
+                self._scanned_at = time.monotonic()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Delete least recently used entries until the total is at most 80% of the budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.8)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+        self._scanned_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'max_mb': self.max_bytes // (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+_ocr_cache: Optional[OCRCache] = None
+
+
+def get_ocr_cache() -> OCRCache:
+    """Return the process-wide OCR cache."""
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = OCRCache()
+    return _ocr_cache
@@ -10,6 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from non_ocr.converter import (
+    classify_pdf_pages,
     is_pdf_ocr,
     convert_pdf_to_ocr,
     process_image_to_ocr_pdf
@@ -132,10 +133,48 @@ def test_pdf_ocr_detection():
         return False
 
 
+def test_mixed_pdf_page_classification():
+    """Test per-page text layer detection used by selective OCR."""
+    print("\n" + "=" * 70)
+    print("TEST 3: Mixed PDF Page Classification")
+    print("=" * 70)
+    
+    try:
+        from reportlab.pdfgen import canvas
+        import io
+        
+        # Page 1 typed, page 2 blank (stands in for a scanned annexure), page 3 typed
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer)
+        pdf.drawString(100, 750, "FORM-I: Project proposal typed page one")
+        pdf.showPage()
+        pdf.showPage()
+        pdf.drawString(100, 750, "FORM-I: Project proposal typed page three")
+        pdf.save()
+        
+        pages = classify_pdf_pages(buffer.getvalue())
+        flags = [has_text for has_text, _ in pages]
+        
+        print(f"\n✓ Pages classified: {flags}")
+        
+        if flags == [True, False, True]:
+            print("\n✓ TEST PASSED - only the blank page needs OCR")
+            return True
+        else:
+            print("\n✗ TEST FAILED - Expected [True, False, True]")
+            return False
+    
+    except Exception as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def test_api_availability():
     """Test if API endpoints are available."""
     print("\n" + "=" * 70)
-    print("TEST 3: API Availability Check")
+    print("TEST 4: API Availability Check")
     print("=" * 70)
     
     try:
@@ -158,6 +197,171 @@ def test_api_availability():
         return False
 
 
+def test_incremental_writer_many_pages():
+    """Spooled pages are written out one file at a time, even past the open-file limit."""
+    print("\n" + "=" * 70)
+    print("TEST 5: Incremental PDF Writer (many pages, low fd limit)")
+    print("=" * 70)
+    
+    import io
+    import os
+    import resource
+    import tempfile
+    import PyPDF2
+    from reportlab.pdfgen import canvas
+    from non_ocr.converter import IncrementalPdfWriter
+    
+    def page_pdf(i):
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer)
+        pdf.drawString(100, 750, f"Spooled page {i}")
+        pdf.save()
+        return buffer.getvalue()
+    
+    pages = 400
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    writer = IncrementalPdfWriter()
+    output_path = tempfile.mktemp(suffix=".pdf")
+    try:
+        # Far fewer descriptors than pages: a merge holding every page file open fails here
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(64, soft), hard))
+        for i in range(pages):
+            if i % 2:
+                writer.add_pdf_bytes(page_pdf(i))
+            else:
+                writer.add_page(PyPDF2.PdfReader(io.BytesIO(page_pdf(i))).pages[0])
+        writer.write(output_path)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        writer.close()
+    
+    reader = PyPDF2.PdfReader(output_path, strict=True)
+    assert len(reader.pages) == pages
+    for i in (0, 1, pages // 2, pages - 1):
+        assert f"Spooled page {i}" in reader.pages[i].extract_text()
+    os.remove(output_path)
+    print(f"\n✓ {pages} pages written in order")
+    print("\n✓ TEST PASSED")
+
+
+def test_ocr_pool_recovers_from_dead_worker():
+    """A killed OCR worker fails only the request it broke; the next one gets a fresh pool."""
+    print("\n" + "=" * 70)
+    print("TEST 6: OCR Worker Pool Recovery")
+    print("=" * 70)
+    
+    import os
+    import signal
+    import time
+    from concurrent.futures.process import BrokenProcessPool
+    from non_ocr import converter
+    
+    pages = [(1, create_test_image()), (2, create_test_image())]
+    
+    def pool_answers():
+        try:
+            return [r[0] for r in converter.iter_ocr_results(pages, workers=2)] == [1, 2]
+        except BrokenProcessPool:
+            raise
+        except RuntimeError as e:
+            # no OCR backend installed: the worker still ran and answered
+            return "No OCR engine" in str(e)
+    
+    pool = converter.get_ocr_pool(2)
+    try:
+        assert pool_answers()
+        
+        # e.g. the kernel OOM-killing a worker on a huge page
+        os.kill(next(iter(pool._executor._processes)), signal.SIGKILL)
+        deadline = time.time() + 10
+        while not pool._executor._broken and time.time() < deadline:
+            time.sleep(0.05)
+        
+        try:
+            pool_answers()
+            raise AssertionError("broken pool was used without error")
+        except BrokenProcessPool:
+            pass
+        
+        assert pool_answers()
+        assert converter.get_ocr_pool(2) is not pool
+    finally:
+        converter._shutdown_ocr_pool()
+        converter._ocr_pool = None
+    print("\n✓ TEST PASSED")
+
+
+def test_selective_rotated_scan():
+    """A scanned /Rotate 90 page keeps its displayed (landscape) shape after selective OCR."""
+    print("\n" + "=" * 70)
+    print("TEST 7: Selective OCR of a Rotated Scanned Page")
+    print("=" * 70)
+    
+    import io
+    import PyPDF2
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+    
+    # Landscape annexure scanned sideways: stored portrait, shown upright via /Rotate 90
+    scan = Image.new('RGB', (1100, 850), color='white')
+    ImageDraw.Draw(scan).text((80, 380), "ANNEXURE II BUDGET TABLE", fill='black',
+                              font=ImageFont.load_default(size=48))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(612, 792))
+    pdf.drawString(100, 750, "FORM-I: Project proposal typed page one")
+    pdf.showPage()
+    pdf.drawImage(ImageReader(scan.rotate(90, expand=True)), 0, 0, width=612, height=792)
+    pdf.showPage()
+    pdf.save()
+    reader = PyPDF2.PdfReader(io.BytesIO(buffer.getvalue()))
+    writer = PyPDF2.PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.pages[1].rotate(90)
+    source = io.BytesIO()
+    writer.write(source)
+    
+    output, metadata = convert_pdf_to_ocr(source.getvalue(), dpi=150, selective=True)
+    assert metadata['pages_processed'] == 1
+    
+    page = PyPDF2.PdfReader(io.BytesIO(output)).pages[1]
+    size = (round(float(page.mediabox.width)), round(float(page.mediabox.height)))
+    print(f"\n✓ OCR page size {size}, rotation {page.rotation}")
+    assert size == (792, 612) and page.rotation % 360 == 0
+    assert "ANNEXURE" in page.extract_text().upper()
+    print("\n✓ TEST PASSED")
+
+
+def test_ocr_cache_size_accounting():
+    """Overwrites are not double-counted, and writes from another process are picked up."""
+    print("\n" + "=" * 70)
+    print("TEST 8: OCR Cache Size Accounting")
+    print("=" * 70)
+    
+    import shutil
+    import tempfile
+    from non_ocr import ocr_cache
+    
+    directory = tempfile.mkdtemp()
+    rescan = ocr_cache.OCR_CACHE_RESCAN_SECONDS
+    try:
+        cache = ocr_cache.OCRCache(directory, max_mb=1)
+        for i in range(5):
+            cache.put("ab" * 32, [{'text': "line " * (i + 1)}])
+        assert cache._size == cache._scan_size()
+        
+        # A second worker process sharing the directory
+        ocr_cache.OCRCache(directory, max_mb=1).put("cd" * 32, [{'text': "other worker"}])
+        ocr_cache.OCR_CACHE_RESCAN_SECONDS = 0
+        cache.put("ef" * 32, [{'text': "after rescan"}])
+        assert cache._size == cache._scan_size()
+        print(f"\n✓ Tracked size {cache._size} bytes matches the directory")
+    finally:
+        ocr_cache.OCR_CACHE_RESCAN_SECONDS = rescan
+        shutil.rmtree(directory)
+    print("\n✓ TEST PASSED")
+
+
 def print_summary(results):
     """Print test summary."""
     print("\n" + "=" * 70)
@@ -189,7 +393,12 @@ if __name__ == "__main__":
     print("\nThis will test:")
     print("  1. Image to OCR PDF conversion")
     print("  2. PDF OCR detection")
-    print("  3. API availability")
+    print("  3. Mixed PDF page classification")
+    print("  4. API availability")
+    print("  5. Incremental PDF writer")
+    print("  6. OCR worker pool recovery")
+    print("  7. Selective OCR of a rotated scanned page")
+    print("  8. OCR cache size accounting")
     print("\n" + "=" * 70)
     
     results = []
@@ -197,7 +406,16 @@ if __name__ == "__main__":
     # Run tests
     results.append(test_image_to_ocr_pdf())
     results.append(test_pdf_ocr_detection())
+    results.append(test_mixed_pdf_page_classification())
     results.append(test_api_availability())
+    for test in (test_incremental_writer_many_pages, test_ocr_pool_recovers_from_dead_worker,
+                 test_selective_rotated_scan, test_ocr_cache_size_accounting):
+        try:
+            test()
+            results.append(True)
+        except Exception as e:
+            print(f"\n✗ TEST FAILED: {e}")
+            results.append(False)
     
     # Print summary
     print_summary(results)
@@ -1,18 +1,142 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import os
 
 router = APIRouter()
 
 model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
 
+# Micro-batching: wait up to EMBED_BATCH_WAIT_MS after the first queued text
+# for others to arrive, then encode up to EMBED_MAX_BATCH texts in one pass
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_MAX_TEXTS_PER_REQUEST = int(os.getenv("EMBED_MAX_TEXTS_PER_REQUEST", "256"))
+
 class EmbeddingRequest(BaseModel):
-    text: str
+    text: Optional[str] = None
+    texts: Optional[List[str]] = None  # batch shape: one embedding per text, same order
+
+class EmbeddingBatcher:
+    """
+    Collects texts from concurrent requests and encodes them together on a
+    single worker thread, so the event loop never blocks on the model and the
+    model sees real batches instead of batch-size-1 forward passes. Recently
+    seen texts are served from an LRU without touching the model.
+    """
+
+    def __init__(self, encoder, max_batch: int, wait_ms: float, cache_size: int):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.stats = {"texts": 0, "cache_hits": 0, "batches": 0, "encoded": 0}
+
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        vector = self.cache.get(text)
+        if vector is not None:
+            self.cache.move_to_end(text)
+        return vector
+
+    def _cache_put(self, text: str, vector: List[float]):
+        self.cache[text] = vector
+        self.cache.move_to_end(text)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.stats["texts"] += len(texts)
+        results: List[Optional[List[float]]] = [self._cache_get(t) for t in texts]
+        self.stats["cache_hits"] += sum(r is not None for r in results)
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            self._ensure_worker()
+            loop = asyncio.get_running_loop()
+            futures = []
+            for i in missing:
+                future = loop.create_future()
+                self.queue.put_nowait((texts[i], future))
+                futures.append(future)
+            for i, vector in zip(missing, await asyncio.gather(*futures)):
+                results[i] = vector
+        return results
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything that queued up while the previous batch was encoding
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor,
+                    lambda: self.encoder.encode(unique, batch_size=len(unique), show_progress_bar=False)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["encoded"] += len(unique)
+            by_text = {}
+            for text, vector in zip(unique, vectors):
+                by_text[text] = vector.tolist()
+                self._cache_put(text, by_text[text])
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+batcher = EmbeddingBatcher(model, EMBED_MAX_BATCH, EMBED_BATCH_WAIT_MS, EMBED_CACHE_SIZE)
 
 @router.post("/embeddings")
 async def create_embedding(request: EmbeddingRequest):
+    if request.texts is not None:
+        if len(request.texts) > EMBED_MAX_TEXTS_PER_REQUEST:
+            raise HTTPException(status_code=400, detail=f"At most {EMBED_MAX_TEXTS_PER_REQUEST} texts per request")
+        texts = request.texts
+    elif request.text is not None:
+        texts = [request.text]
+    else:
+        raise HTTPException(status_code=400, detail="Provide 'text' or 'texts'")
     try:
-        embedding = model.encode(request.text).tolist()
-        return {"embedding": embedding}
+        embeddings = await batcher.embed(texts)
+        if request.texts is not None:
+            return {"embeddings": embeddings}
+        return {"embedding": embeddings[0]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/embeddings/stats")
+async def embedding_stats():
+    return {**batcher.stats, "cache_size": len(batcher.cache)}
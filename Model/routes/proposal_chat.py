@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 import os
+import asyncio
+import hashlib
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from fastapi.concurrency import run_in_threadpool
+from pymongo import UpdateOne, ASCENDING, DESCENDING
+from bson import Binary, ObjectId
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import google.generativeai as genai
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 import json
 
 load_dotenv()
@@ -15,16 +21,35 @@ router = APIRouter()
 # Initialize models
 embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-llm = genai.GenerativeModel('gemini-1.5-flash')
+CHAT_MODEL = 'gemini-1.5-flash'
 
-# MongoDB connection - try both MONGO_URI and MONGODB_URI
-MONGO_URI = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI")
-if not MONGO_URI:
-    raise ValueError("MONGO_URI or MONGODB_URI not found in environment variables")
+from config.db import get_motor_client
+from Common.llm_client import llm
+from Common.streaming import static_tokens, stream_answer
 
-client = MongoClient(MONGO_URI)
+# MongoDB connection (async, pool settings shared with config/db.py)
+client = get_motor_client()
 db = client['test']  # Database name from your URL
 proposals_collection = db['proposals']  # Collection name
+# Sidecar collection: one float32 embedding per proposal, keyed by the proposal _id
+embeddings_collection = db['proposal_embeddings']
+
+# /proposals/{user_id} page size cap
+MAX_PAGE_SIZE = int(os.getenv("PROPOSALS_MAX_PAGE_SIZE", "100"))
+# Stale proposals embedded inline per search; the rest is left to the background backfill
+SYNC_INLINE_LIMIT = int(os.getenv("PROPOSALS_SYNC_INLINE_LIMIT", "32"))
+# Searches without user_id/proposal_id only consider the most recent proposals
+UNSCOPED_SEARCH_LIMIT = int(os.getenv("PROPOSALS_UNSCOPED_SEARCH_LIMIT", "500"))
+
+# Fields read by extract_proposal_text (plus what the catch-up pass needs)
+CHAT_PROJECTION = {
+    'proposalCode': 1, 'proposalInfo': 1, 'status': 1, 'processedForms': 1,
+    'collaborators': 1, 'deliverables': 1, 'timeline': 1, 'userId': 1, 'updatedAt': 1,
+}
+# Fields returned by the proposal list (no processedForms blobs)
+SUMMARY_PROJECTION = {
+    'proposalCode': 1, 'proposalInfo': 1, 'status': 1, 'userId': 1, 'createdAt': 1, 'updatedAt': 1,
+}
 
 class ProposalChatRequest(BaseModel):
     question: str
@@ -84,8 +109,146 @@ def extract_proposal_text(proposal: Dict[str, Any]) -> str:
     
     return "\n".join(text_parts)
 
-def search_proposals(question: str, user_id: Optional[str] = None, proposal_id: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+# ============================================================================
+# PROPOSAL EMBEDDINGS
+# ============================================================================
+
+def _encode_normalized(texts: List[str]) -> np.ndarray:
+    vectors = np.asarray(embedding_model.encode(texts, show_progress_bar=False), dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+
+async def refresh_proposal_embeddings(proposals: List[Dict[str, Any]]) -> int:
+    """Embed proposals whose text changed since their stored embedding; returns how many were (re)computed."""
+    if not proposals:
+        return 0
+    texts = {p['_id']: extract_proposal_text(p) for p in proposals}
+    hashes = {_id: hashlib.sha1(text.encode('utf-8')).hexdigest() for _id, text in texts.items()}
+    stored = {
+        doc['_id']: doc.get('textHash')
+        async for doc in embeddings_collection.find({'_id': {'$in': list(texts)}}, {'textHash': 1})
+    }
+    changed = [p for p in proposals if stored.get(p['_id']) != hashes[p['_id']]]
+    if not changed:
+        return 0
+    
+    vectors = await run_in_threadpool(_encode_normalized, [texts[p['_id']] for p in changed])
+    now = datetime.now(timezone.utc)
+    await embeddings_collection.bulk_write([
+        UpdateOne(
+            {'_id': p['_id']},
+            {'$set': {
+                'userId': p.get('userId'),
+                'embedding': Binary(vector.tobytes()),
+                'textHash': hashes[p['_id']],
+                'sourceUpdatedAt': p.get('updatedAt'),
+                'updatedAt': now,
+            }},
+            upsert=True,
+        )
+        for p, vector in zip(changed, vectors)
+    ], ordered=False)
+    return len(changed)
+
+async def _stale_ids(current: Dict[Any, Any]) -> List[Any]:
+    """Ids from {proposal _id: updatedAt} that have no embedding or were modified after it."""
+    stored = {
+        doc['_id']: doc.get('sourceUpdatedAt')
+        async for doc in embeddings_collection.find({'_id': {'$in': list(current)}}, {'sourceUpdatedAt': 1})
+    }
+    return [
+        _id for _id, updated in current.items()
+        if _id not in stored or (updated is not None and updated != stored[_id])
+    ]
+
+async def _embed_ids(ids: List[Any], batch_size: int = 64):
+    for i in range(0, len(ids), batch_size):
+        await refresh_proposal_embeddings(
+            await proposals_collection.find({'_id': {'$in': ids[i:i + batch_size]}}, CHAT_PROJECTION).to_list(length=None)
+        )
+
+async def sync_proposal_embeddings(query: Dict[str, Any], limit: Optional[int] = None) -> List[Any]:
+    """
+    Return the ids of proposals matching `query` (the newest `limit` if given),
+    embedding up to SYNC_INLINE_LIMIT stale ones inline and scheduling the
+    background backfill for any left over.
+    """
+    cursor = proposals_collection.find(query, {'updatedAt': 1})
+    if limit:
+        cursor = cursor.sort('_id', DESCENDING).limit(limit)
+    current = {doc['_id']: doc.get('updatedAt') async for doc in cursor}
+    if not current:
+        return []
+    stale = await _stale_ids(current)
+    await _embed_ids(stale[:SYNC_INLINE_LIMIT])
+    if len(stale) > SYNC_INLINE_LIMIT:
+        schedule_backfill()
+    return list(current)
+
+async def backfill_proposal_embeddings(page_size: int = 256):
+    """Embed every stale proposal, newest first, one page of ids at a time."""
+    last_id = None
+    embedded = 0
+    try:
+        while True:
+            query = {'_id': {'$lt': last_id}} if last_id is not None else {}
+            page = {
+                doc['_id']: doc.get('updatedAt')
+                async for doc in proposals_collection.find(query, {'updatedAt': 1}).sort('_id', DESCENDING).limit(page_size)
+            }
+            if not page:
+                break
+            stale = await _stale_ids(page)
+            await _embed_ids(stale)
+            embedded += len(stale)
+            last_id = list(page)[-1]
+        if embedded:
+            print(f"✅ Backfilled {embedded} proposal embeddings")
+    except Exception as e:
+        print(f"Proposal embedding backfill stopped: {e}")
+
+_backfill_task = None
+
+def schedule_backfill():
+    """Start the backfill unless one is already running."""
+    global _backfill_task
+    if _backfill_task is None or _backfill_task.done():
+        _backfill_task = asyncio.get_running_loop().create_task(backfill_proposal_embeddings())
+
+async def watch_proposal_changes():
+    """Keep embeddings fresh from the proposals change stream (needs a replica set, e.g. Atlas)."""
+    try:
+        async with proposals_collection.watch(full_document='updateLookup') as stream:
+            async for change in stream:
+                op = change.get('operationType')
+                if op in ('insert', 'update', 'replace') and change.get('fullDocument'):
+                    await refresh_proposal_embeddings([change['fullDocument']])
+                elif op == 'delete':
+                    await embeddings_collection.delete_one({'_id': change['documentKey']['_id']})
+    except Exception as e:
+        # Standalone servers have no change streams; search falls back to sync_proposal_embeddings
+        print(f"Proposal change stream stopped: {e}")
+
+_ready = False
+_watcher_task = None
+
+async def ensure_proposal_store():
+    """Create indexes, start the change-stream watcher and the embedding backfill once per process."""
+    global _ready, _watcher_task
+    if _ready:
+        return
+    _ready = True
+    try:
+        await proposals_collection.create_index([('userId', ASCENDING), ('_id', DESCENDING)])
+        await proposals_collection.create_index([('userId', ASCENDING), ('status', ASCENDING), ('_id', DESCENDING)])
+        await embeddings_collection.create_index([('userId', ASCENDING)])
+    except Exception as e:
+        print(f"Could not create proposal indexes: {e}")
+    _watcher_task = asyncio.get_running_loop().create_task(watch_proposal_changes())
+    schedule_backfill()
+
+async def search_proposals(question: str, user_id: Optional[str] = None, proposal_id: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
     """Search proposals in MongoDB based on question relevance"""
+    await ensure_proposal_store()
     
     # Build query
     query = {}
@@ -94,80 +257,70 @@ def search_proposals(question: str, user_id: Optional[str] = None, proposal_id:
     if proposal_id:
         query['_id'] = proposal_id
     
-    # Get proposals from MongoDB
-    proposals = list(proposals_collection.find(query).limit(20))
+    # Catch up on proposals written while no watcher was running; unscoped
+    # questions are bounded to the newest proposals instead of the whole collection
+    proposal_ids = await sync_proposal_embeddings(query, limit=None if query else UNSCOPED_SEARCH_LIMIT)
+    if not proposal_ids:
+        return []
+    
+    # Load precomputed embeddings only (no proposal bodies)
+    ids, vectors = [], []
+    async for doc in embeddings_collection.find({'_id': {'$in': proposal_ids}}, {'embedding': 1}):
+        ids.append(doc['_id'])
+        vectors.append(np.frombuffer(doc['embedding'], dtype=np.float32))
     
-    if not proposals:
+    if not ids:
         return []
     
-    # Generate embedding for question
-    question_embedding = embedding_model.encode(question).tolist()
+    # One vectorized cosine top-k (stored vectors are already unit length)
+    question_embedding = (await run_in_threadpool(_encode_normalized, [question]))[0]
+    scores = np.vstack(vectors) @ question_embedding
+    k = min(limit, len(ids))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    
+    # Fetch full documents only for the winners
+    top_ids = [ids[i] for i in top]
+    proposals = {
+        p['_id']: p
+        async for p in proposals_collection.find({'_id': {'$in': top_ids}}, CHAT_PROJECTION)
+    }
     
-    # Score each proposal by relevance
     scored_proposals = []
-    for proposal in proposals:
-        # Extract text from proposal
-        proposal_text = extract_proposal_text(proposal)
-        
-        # Generate embedding for proposal
-        proposal_embedding = embedding_model.encode(proposal_text).tolist()
-        
-        # Calculate cosine similarity
-        dot_product = sum(q * p for q, p in zip(question_embedding, proposal_embedding))
-        mag_q = sum(q * q for q in question_embedding) ** 0.5
-        mag_p = sum(p * p for p in proposal_embedding) ** 0.5
-        similarity = dot_product / (mag_q * mag_p) if (mag_q * mag_p) > 0 else 0
-        
+    for i in top:
+        proposal = proposals.get(ids[i])
+        if proposal is None:
+            continue
         scored_proposals.append({
             'proposal': proposal,
-            'text': proposal_text,
-            'score': similarity
+            'text': extract_proposal_text(proposal),
+            'score': float(scores[i])
         })
-    
-    # Sort by score and return top results
-    scored_proposals.sort(key=lambda x: x['score'], reverse=True)
-    return scored_proposals[:limit]
+    return scored_proposals
 
-@router.post("/chat-proposals")
-async def chat_about_proposals(request: ProposalChatRequest):
-    """Chat about user proposals stored in MongoDB"""
-    try:
-        # Search relevant proposals
-        relevant_proposals = search_proposals(
-            request.question,
-            user_id=request.user_id,
-            proposal_id=request.proposal_id,
-            limit=5
-        )
-        
-        if not relevant_proposals:
-            return {
-                "answer": "I couldn't find any proposals matching your query. Please make sure you have submitted proposals or try asking about a specific aspect.",
-                "proposals": []
-            }
-        
-        # Build context from top proposals
-        context_parts = []
-        proposal_info = []
-        
-        for item in relevant_proposals:
-            proposal = item['proposal']
-            score = item['score']
-            text = item['text']
-            
-            context_parts.append(f"--- Proposal: {proposal.get('proposalCode', 'Unknown')} (Relevance: {score:.2f}) ---\n{text}\n")
-            
-            proposal_info.append({
-                'proposalCode': proposal.get('proposalCode', 'Unknown'),
-                'title': proposal.get('proposalInfo', {}).get('title', 'Untitled'),
-                'status': proposal.get('status', 'Unknown'),
-                'relevance': round(score, 4)
-            })
+def build_proposal_context(relevant_proposals: List[Dict[str, Any]]):
+    """Prompt context and response summaries for the proposals found by search_proposals."""
+    context_parts = []
+    proposal_info = []
+    
+    for item in relevant_proposals:
+        proposal = item['proposal']
+        score = item['score']
+        text = item['text']
         
-        context = "\n\n".join(context_parts)
+        context_parts.append(f"--- Proposal: {proposal.get('proposalCode', 'Unknown')} (Relevance: {score:.2f}) ---\n{text}\n")
         
-        # Generate prompt
-        prompt = f"""You are BIRBAL (बिरबल | பிர்பால்), an intelligent multilingual AI assistant helping users understand their research proposals submitted to NaCCER.
+        proposal_info.append({
+            'proposalCode': proposal.get('proposalCode', 'Unknown'),
+            'title': proposal.get('proposalInfo', {}).get('title', 'Untitled'),
+            'status': proposal.get('status', 'Unknown'),
+            'relevance': round(score, 4)
+        })
+    
+    return "\n\n".join(context_parts), proposal_info
+
+def build_chat_prompt(question: str, context: str) -> str:
+    return f"""You are BIRBAL (बिरबल | பிர்பால்), an intelligent multilingual AI assistant helping users understand their research proposals submitted to NaCCER.
 
 You can respond in three languages:
 - Hindi (हिंदी) - if the user asks in Hindi
@@ -180,7 +333,7 @@ You have access to the following proposal(s) submitted by the user:
 
 {context}
 
-User Question: {request.question}
+User Question: {question}
 
 Instructions:
 1. IMPORTANT: Respond in the SAME language as the question
@@ -193,19 +346,49 @@ Instructions:
 
 Answer (in the user's question language):"""
 
+def is_quota_error(e: Exception) -> bool:
+    return "quota" in str(e).lower() or "429" in str(e)
+
+def fallback_answer(relevant_proposals: List[Dict[str, Any]]) -> str:
+    # Fallback if Gemini quota exceeded
+    answer = f"I found {len(relevant_proposals)} relevant proposal(s):\n\n"
+    for item in relevant_proposals[:3]:
+        p = item['proposal']
+        answer += f"• {p.get('proposalCode', 'Unknown')}: {p.get('proposalInfo', {}).get('title', 'Untitled')}\n"
+        answer += f"  Status: {p.get('status', 'Unknown')}, Budget: ₹{p.get('proposalInfo', {}).get('totalBudget', 'N/A')}\n\n"
+    answer += "\n(Note: AI generation temporarily unavailable - showing raw data)"
+    return answer
+
+NO_PROPOSALS_ANSWER = "I couldn't find any proposals matching your query. Please make sure you have submitted proposals or try asking about a specific aspect."
+
+@router.post("/chat-proposals")
+async def chat_about_proposals(request: ProposalChatRequest):
+    """Chat about user proposals stored in MongoDB"""
+    try:
+        # Search relevant proposals
+        relevant_proposals = await search_proposals(
+            request.question,
+            user_id=request.user_id,
+            proposal_id=request.proposal_id,
+            limit=5
+        )
+        
+        if not relevant_proposals:
+            return {
+                "answer": NO_PROPOSALS_ANSWER,
+                "proposals": []
+            }
+        
+        # Build context from top proposals
+        context, proposal_info = build_proposal_context(relevant_proposals)
+        prompt = build_chat_prompt(request.question, context)
+
         # Generate response
         try:
-            response = llm.generate_content(prompt)
-            answer = response.text
+            answer = (await llm.generate(prompt, model=CHAT_MODEL, route="proposal-chat")).text
         except Exception as e:
-            if "quota" in str(e).lower() or "429" in str(e):
-                # Fallback if Gemini quota exceeded
-                answer = f"I found {len(relevant_proposals)} relevant proposal(s):\n\n"
-                for item in relevant_proposals[:3]:
-                    p = item['proposal']
-                    answer += f"• {p.get('proposalCode', 'Unknown')}: {p.get('proposalInfo', {}).get('title', 'Untitled')}\n"
-                    answer += f"  Status: {p.get('status', 'Unknown')}, Budget: ₹{p.get('proposalInfo', {}).get('totalBudget', 'N/A')}\n\n"
-                answer += "\n(Note: AI generation temporarily unavailable - showing raw data)"
+            if is_quota_error(e):
+                answer = fallback_answer(relevant_proposals)
             else:
                 raise
         
@@ -218,11 +401,76 @@ Answer (in the user's question language):"""
         print(f"Error in chat_about_proposals: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _tokens_with_fallback(prompt: str, relevant_proposals: List[Dict[str, Any]]):
+    """Gemini tokens; falls back to the raw proposal summary if the quota is hit before any text."""
+    started = False
+    tokens = llm.stream(prompt, model=CHAT_MODEL, route="proposal-chat")
+    try:
+        async for text in tokens:
+            started = True
+            yield text
+    except Exception as e:
+        if started or not is_quota_error(e):
+            raise
+        yield fallback_answer(relevant_proposals)
+    finally:
+        await tokens.aclose()
+
+@router.post("/chat-proposals/stream")
+async def chat_about_proposals_stream(
+    request: ProposalChatRequest,
+    http_request: Request,
+    fmt: Literal["sse", "ndjson"] = Query("sse", alias="format")
+):
+    """/chat-proposals with the matched proposals sent first and the answer streamed as it is generated."""
+    try:
+        relevant_proposals = await search_proposals(
+            request.question,
+            user_id=request.user_id,
+            proposal_id=request.proposal_id,
+            limit=5
+        )
+    except Exception as e:
+        print(f"Error in chat_about_proposals_stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not relevant_proposals:
+        return stream_answer(http_request, [], static_tokens([NO_PROPOSALS_ANSWER]), fmt)
+
+    context, proposal_info = build_proposal_context(relevant_proposals)
+    tokens = _tokens_with_fallback(build_chat_prompt(request.question, context), relevant_proposals)
+    return stream_answer(http_request, proposal_info, tokens, fmt)
+
 @router.get("/proposals/{user_id}")
-async def get_user_proposals(user_id: str):
-    """Get all proposals for a specific user"""
+async def get_user_proposals(
+    user_id: str,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    full: bool = False
+):
+    """
+    Get a user's proposals, newest first, one page at a time.
+    
+    Pass the returned `next_cursor` as `cursor` to get the next page
+    (`null` when there are no more). `limit` is capped at PROPOSALS_MAX_PAGE_SIZE.
+    Summary fields only unless `full=true`.
+    """
+    await ensure_proposal_store()
+    query: Dict[str, Any] = {'userId': user_id}
+    if status:
+        query['status'] = status
+    if cursor:
+        query['_id'] = {'$lt': ObjectId(cursor) if ObjectId.is_valid(cursor) else cursor}
+    page_size = max(1, min(limit, MAX_PAGE_SIZE))
+    
     try:
-        proposals = list(proposals_collection.find({'userId': user_id}))
+        proposals = await proposals_collection.find(
+            query, None if full else SUMMARY_PROJECTION
+        ).sort('_id', DESCENDING).limit(page_size + 1).to_list(length=page_size + 1)
+        
+        has_more = len(proposals) > page_size
+        proposals = proposals[:page_size]
         
         # Convert ObjectId to string for JSON serialization
         for proposal in proposals:
@@ -231,7 +479,8 @@ async def get_user_proposals(user_id: str):
         
         return {
             "count": len(proposals),
-            "proposals": proposals
+            "proposals": proposals,
+            "next_cursor": proposals[-1]['_id'] if has_more else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,71 +1,74 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Literal
 import os
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from sentence_transformers import SentenceTransformer
 import google.generativeai as genai
 
+from birbal.local_vector_store import LocalVectorIndex
+from birbal.context_builder import ContextBuilder, chunks_from_matches
+from birbal.answer_cache import SemanticAnswerCache, detect_language
+from Common.llm_client import llm
+from Common.streaming import static_tokens, stream_answer
+
 load_dotenv()
 
 router = APIRouter()
 
 # Initialize models and clients
 embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index("coal-rag-index", host=os.getenv("PINECONE_INDEX_HOST"))
+if os.getenv("VECTOR_BACKEND", "pinecone") == "local":
+    # Offline: same query API, served from the on-disk index built by
+    # `python -m birbal.local_vector_store migrate`
+    index = LocalVectorIndex(os.getenv("LOCAL_VECTOR_DIR", "vector_store"))
+else:
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index("coal-rag-index", host=os.getenv("PINECONE_INDEX_HOST"))
 
 # Configure Gemini - use stable model instead of experimental
 genai.configure(api_key=os.getenv("COMMON_GEMINI_KEY"))
-llm = genai.GenerativeModel('gemini-2.5-flash-lite')
+RAG_MODEL = 'gemini-2.5-flash-lite'
+
+# Dedups/merges retrieved chunks and trims them to CONTEXT_TOKEN_BUDGET
+context_builder = ContextBuilder(embed=lambda texts: embedding_model.encode(texts, show_progress_bar=False))
+
+# Repeated/rephrased questions are answered from here (invalidated when the index changes)
+answer_cache = SemanticAnswerCache(index)
 
 class ChatRequest(BaseModel):
     question: str
     top_k: int = 10
 
-@router.post("/chat")
-async def chat_with_rag(request: ChatRequest):
-    try:
-        # Generate embedding for the question
-        question_embedding = embedding_model.encode(request.question).tolist()
-        
-        # Query Pinecone
-        results = index.query(
-            vector=question_embedding,
-            top_k=request.top_k,
-            include_metadata=True
-        )
-        
-        # Extract context from results - check all possible text fields
-        context_parts = []
-        for match in results.matches:
-            metadata = match.metadata or {}
-            # Try multiple field names
-            text = (metadata.get('text') or 
-                   metadata.get('content') or 
-                   metadata.get('chunk') or 
-                   metadata.get('page_content') or 
-                   str(metadata) if metadata else '')
-            if text and len(str(text).strip()) > 10:  # Only add non-empty text
-                context_parts.append(str(text))
-        
-        if not context_parts:
-            # Return matches info for debugging
-            debug_info = f"Found {len(results.matches)} matches but no text content. Metadata keys: {list(results.matches[0].metadata.keys()) if results.matches and results.matches[0].metadata else 'none'}"
-            return {
-                "answer": f"I found relevant documents but couldn't extract the text content. {debug_info}",
-                "sources": [],
-                "debug": debug_info
-            }
-        
-        context = "\n\n".join(context_parts)
-        
-        # Generate prompt for Gemini
-        prompt = f"""You are BIRBAL (बिरबल | பிர்பால்), an intelligent multilingual AI assistant specialized in coal research and S&T guidelines for NaCCER (National Centre for Coal Excellence and Research).
+def embed_question(question: str):
+    return embedding_model.encode(question).tolist()
+
+def retrieve_context(question: str, top_k: int, question_embedding):
+    """Query the index and build the prompt context; returns (matches, context)."""
+    # Query Pinecone
+    results = index.query(
+        vector=question_embedding,
+        top_k=top_k,
+        include_metadata=True
+    )
+
+    # Keep only matches with a text field, drop near-duplicates, merge
+    # same-page chunks and fit the rest to the token budget
+    context = context_builder.build(question, chunks_from_matches(results.matches), question_embedding)
+    return results.matches, context
+
+def no_context_debug(matches) -> str:
+    return f"Found {len(matches)} matches but no text content. Metadata keys: {list(matches[0].metadata.keys()) if matches and matches[0].metadata else 'none'}"
+
+def build_prompt(question: str, context: str) -> str:
+    # Generate prompt for Gemini
+    return f"""You are BIRBAL (बिरबल | பிர்பால்), an intelligent multilingual AI assistant specialized in coal research and S&T guidelines for NaCCER (National Centre for Coal Excellence and Research).
 
 You can respond in three languages:
 - Hindi (हिंदी) - if the user asks in Hindi
-- Tamil (தமிழ்) - if the user asks in Tamil  
+- Tamil (தமிழ்) - if the user asks in Tamil
 - English - if the user asks in English
 
 Detect the user's question language and respond in THE SAME LANGUAGE. If the question is in Hindi, respond completely in Hindi. If in Tamil, respond in Tamil. If in English, respond in English.
@@ -73,7 +76,7 @@ Detect the user's question language and respond in THE SAME LANGUAGE. If the que
 Context from knowledge base:
 {context}
 
-User Question: {request.question}
+User Question: {question}
 
 Instructions:
 1. IMPORTANT: Respond in the SAME language as the question
@@ -85,25 +88,102 @@ Instructions:
 
 Answer (in the user's question language):"""
 
+def format_sources(matches):
+    # Prepare sources
+    sources = []
+    for i, match in enumerate(matches[:5]):
+        metadata = match.metadata or {}
+        sources.append({
+            "score": float(match.score),
+            "source": metadata.get('source', f'Document {i+1}'),
+            "page": metadata.get('page', 'N/A')
+        })
+    return sources
+
+@router.post("/chat")
+async def chat_with_rag(request: ChatRequest):
+    try:
+        # Generate embedding for the question
+        question_embedding = await run_in_threadpool(embed_question, request.question)
+        language = detect_language(request.question)
+        cached = await run_in_threadpool(answer_cache.lookup, language, request.top_k, question_embedding, request.question)
+        if cached:
+            return {
+                "answer": cached.answer,
+                "sources": cached.sources,
+                "cached": True
+            }
+
+        matches, context = await run_in_threadpool(retrieve_context, request.question, request.top_k, question_embedding)
+
+        if not context.chunks:
+            # Return matches info for debugging
+            debug_info = no_context_debug(matches)
+            return {
+                "answer": f"I found relevant documents but couldn't extract the text content. {debug_info}",
+                "sources": [],
+                "debug": debug_info
+            }
+
         # Get response from Gemini
-        response = llm.generate_content(prompt)
-        answer = response.text
-        
-        # Prepare sources
-        sources = []
-        for i, match in enumerate(results.matches[:5]):
-            metadata = match.metadata or {}
-            sources.append({
-                "score": float(match.score),
-                "source": metadata.get('source', f'Document {i+1}'),
-                "page": metadata.get('page', 'N/A')
-            })
-        
+        prompt = build_prompt(request.question, context.text)
+        result = await llm.generate(prompt, model=RAG_MODEL, route="rag-chat")
+        answer = result.text
+        sources = format_sources(matches)
+        answer_cache.store(language, request.top_k, question_embedding, request.question, answer, sources)
+
         return {
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "context_stats": context.report(prompt, result.response)
         }
-        
+
     except Exception as e:
         print(f"Error in chat_with_rag: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_with_rag_stream(
+    request: ChatRequest,
+    http_request: Request,
+    fmt: Literal["sse", "ndjson"] = Query("sse", alias="format")
+):
+    """Like /chat, but sends the sources first and then streams the answer as Gemini generates it."""
+    try:
+        question_embedding = await run_in_threadpool(embed_question, request.question)
+        language = detect_language(request.question)
+        cached = await run_in_threadpool(answer_cache.lookup, language, request.top_k, question_embedding, request.question)
+        if cached:
+            return stream_answer(http_request, cached.sources, static_tokens([cached.answer]), fmt, done={"cached": True})
+        matches, context = await run_in_threadpool(retrieve_context, request.question, request.top_k, question_embedding)
+    except Exception as e:
+        print(f"Error in chat_with_rag_stream: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not context.chunks:
+        answer = f"I found relevant documents but couldn't extract the text content. {no_context_debug(matches)}"
+        return stream_answer(http_request, [], static_tokens([answer]), fmt)
+
+    prompt = build_prompt(request.question, context.text)
+    sources = format_sources(matches)
+
+    async def tokens():
+        # Cache the answer only if it was streamed to the end
+        parts = []
+        stream = llm.stream(prompt, model=RAG_MODEL, route="rag-chat")
+        try:
+            async for text in stream:
+                parts.append(text)
+                yield text
+        finally:
+            await stream.aclose()
+        answer_cache.store(language, request.top_k, question_embedding, request.question, "".join(parts), sources)
+
+    return stream_answer(
+        http_request, sources, tokens(), fmt,
+        done={"context_stats": context.report(prompt)}
+    )
+
+@router.get("/chat/cache")
+async def answer_cache_stats():
+    return answer_cache.info()
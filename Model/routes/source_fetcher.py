@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import PyPDF2
+from functools import lru_cache
 import os
 
+from data_files.page_text_store import get_page_store, pdf_version
+
 router = APIRouter()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,38 +14,45 @@ PDF_MAPPING = {
     "guidelines": os.path.join(BASE_DIR, "data_files", "Thrust_Areas_2020.pdf"),
 }
 
+# Recently viewed pages kept decoded in memory
+PAGE_CACHE_SIZE = int(os.getenv("SOURCE_PAGE_CACHE_SIZE", "512"))
+
 class FetchTextRequest(BaseModel):
     source: str
     page: int
 
+def _load_stores():
+    """Pre-extract every mapped PDF into its page store (once, at startup)."""
+    for source, pdf_path in PDF_MAPPING.items():
+        if os.path.exists(pdf_path):
+            try:
+                store = get_page_store(pdf_path)
+                print(f"Page text store ready: {source} ({store.total_pages} pages)")
+            except Exception as e:
+                print(f"Could not build page text store for '{source}': {e}")
+
+_load_stores()
+
+def get_source_page(source: str, page: int) -> dict:
+    pdf_path = PDF_MAPPING.get(source)
+    if not pdf_path or not os.path.exists(pdf_path):
+        return {"text": f"Source document '{source}' not found at {pdf_path}"}
+    # The PDF's (size, mtime) is part of the key, so a replaced PDF misses the cache
+    return _read_page(pdf_path, pdf_version(pdf_path), page)
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
+def _read_page(pdf_path: str, version: tuple, page: int) -> dict:
+    store = get_page_store(pdf_path)
+    text = store.page(page)
+    if text is None:
+        return {"text": f"Page {page} not found in document (total pages: {store.total_pages})"}
+    return {"text": text}
+
 @router.post("/fetch-source-text")
 async def fetch_source_text(request: FetchTextRequest):
     try:
-        pdf_path = PDF_MAPPING.get(request.source)
-        
-        print(f"Fetching source: {request.source}, page: {request.page}")
-        print(f"PDF path: {pdf_path}")
-        print(f"File exists: {os.path.exists(pdf_path) if pdf_path else False}")
-        
-        if not pdf_path or not os.path.exists(pdf_path):
-            return {"text": f"Source document '{request.source}' not found at {pdf_path}"}
-        
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            total_pages = len(reader.pages)
-            
-            print(f"Total pages in PDF: {total_pages}")
-            
-            if request.page < 1 or request.page > total_pages:
-                return {"text": f"Page {request.page} not found in document (total pages: {total_pages})"}
-            
-            page_text = reader.pages[request.page - 1].extract_text()
-            
-            print(f"Extracted text length: {len(page_text)}")
-            
-            return {"text": page_text}
+        return get_source_page(request.source, request.page)
     
     except Exception as e:
         print(f"Error in fetch_source_text: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-        raise HTTPException(status_code=500, detail=str(e))